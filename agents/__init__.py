@@ -2,4 +2,5 @@
 from .base_agent import BaseAgent
 from .planner_agent import PlannerAgent
 from .executor_agent import ExecutorAgent
-from .analyzer_agent import AnalyzerAgent
\ No newline at end of file
+from .analyzer_agent import AnalyzerAgent
+from .events import AgentEvent
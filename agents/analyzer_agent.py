@@ -3,17 +3,30 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from .base_agent import BaseAgent
+from .events import AgentEvent, EventCallback
 
 
 class AnalyzerAgent(BaseAgent):
-    async def analyze(self, result_queue: asyncio.Queue) -> List[Dict[str, Any]]:
+    async def analyze(
+        self, result_queue: asyncio.Queue, on_event: Optional[EventCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """Drain ``result_queue`` and return the results in step order.
+
+        Progress events are passed to ``on_event``.
+        """
         results: List[Dict[str, Any]] = []
         while True:
             item = await result_queue.get()
             if item is None:
                 break
+            if isinstance(item, AgentEvent):
+                if on_event is not None:
+                    await on_event(item)
+                continue
             results.append(item)
+        # Parallel steps finish out of order; the sort is stable for ties.
+        results.sort(key=lambda item: item.get("step", 0))
         return results
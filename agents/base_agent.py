@@ -2,31 +2,86 @@
 
 from __future__ import annotations
 
-from typing import Any, Awaitable, Callable, Optional
+import inspect
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Union
 
-LLMCallable = Callable[[str], Awaitable[Any]]
+LLMCallable = Callable[[str], Union[Awaitable[Any], AsyncIterator[Any]]]
+TokenCallback = Callable[[str], Awaitable[None]]
+
+
+def _field(obj: Any, name: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _response_text(result: Any) -> str:
+    """Extract the text of a complete (non-streaming) LLM response."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, dict):
+        if "choices" in result and result["choices"]:
+            message = result["choices"][0].get("message", {})
+            content = message.get("content")
+            if content is not None:
+                return content
+        if "text" in result:
+            return str(result["text"])
+    return str(result)
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Extract the text delta from one streamed chunk.
+
+    Accepts plain strings, OpenAI-style ``choices[0].delta.content`` chunks
+    (as dicts or objects) and ``{"text": ...}`` dicts.
+    """
+    if isinstance(chunk, str):
+        return chunk
+    choices = _field(chunk, "choices")
+    if choices:
+        delta = _field(choices[0], "delta") or _field(choices[0], "message")
+        content = _field(delta, "content") if delta is not None else None
+        return content or ""
+    text = _field(chunk, "text")
+    return "" if text is None else str(text)
 
 
 class BaseAgent:
-    """Provide a tiny abstraction around an asynchronous LLM callable."""
+    """Provide a tiny abstraction around an asynchronous LLM callable.
+
+    The LLM may be a coroutine function returning a complete response or a
+    function returning an async iterator of chunks.
+    """
 
     def __init__(self, llm: Optional[LLMCallable] = None) -> None:
         self.llm = llm
 
-    async def call_llm(self, prompt: str) -> str:
-        """Invoke the configured LLM and normalise the response to a string."""
+    async def stream_llm(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the LLM response as text deltas as soon as they arrive."""
         if self.llm is None:
-            return "error: llm unavailable"
-
-        result = await self.llm(prompt)
-        if isinstance(result, str):
-            return result
-        if isinstance(result, dict):
-            if "choices" in result and result["choices"]:
-                message = result["choices"][0].get("message", {})
-                content = message.get("content")
-                if content is not None:
-                    return content
-            if "text" in result:
-                return str(result["text"])
-        return str(result)
+            yield "error: llm unavailable"
+            return
+
+        result = self.llm(prompt)
+        if inspect.isawaitable(result):
+            result = await result
+        if hasattr(result, "__aiter__"):
+            async for chunk in result:
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+            return
+        yield _response_text(result)
+
+    async def call_llm(self, prompt: str, on_token: Optional[TokenCallback] = None) -> str:
+        """Invoke the configured LLM and normalise the response to a string.
+
+        ``on_token`` is awaited with each delta of a streaming response.
+        """
+        parts = []
+        async for delta in self.stream_llm(prompt):
+            parts.append(delta)
+            if on_token is not None:
+                await on_token(delta)
+        return "".join(parts)
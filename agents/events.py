@@ -0,0 +1,35 @@
+"""Structured events emitted while the agent pipeline runs."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+PLAN_CREATED = "plan_created"
+STEP_STARTED = "step_started"
+TOOL_CALL = "tool_call"
+TOOL_RESULT = "tool_result"
+TOKEN = "token"
+FINAL = "final"
+
+
+@dataclass
+class AgentEvent:
+    """One progress update; ``step`` is set for events tied to a plan step."""
+
+    type: str
+    data: Any = None
+    step: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"type": self.type, "data": self.data}
+        if self.step is not None:
+            payload["step"] = self.step
+        return payload
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, default=str)
+
+
+EventCallback = Callable[[AgentEvent], Awaitable[None]]
@@ -3,33 +3,153 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import inspect
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from .base_agent import BaseAgent, LLMCallable
+from .events import STEP_STARTED, TOKEN, TOOL_CALL, TOOL_RESULT, AgentEvent
 from tool_manager import ToolManager
 
+if TYPE_CHECKING:  # pragma: no cover
+    from plan_checkpoint import PlanCheckpoint
+
+
+def _accepts(func: Any, name: str) -> bool:
+    # Only an explicit parameter counts: ``**kwargs`` tools often treat extra
+    # keywords as data (e.g. entity attributes).
+    try:
+        return name in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
 
 class ExecutorAgent(BaseAgent):
-    def __init__(self, tool_manager: Optional[ToolManager] = None, llm: Optional[LLMCallable] = None) -> None:
+    """Run steps from ``plan_queue`` and report on ``result_queue``.
+
+    Steps form a DAG through their optional ``depends_on`` lists. A step
+    starts as soon as all of its dependencies have finished, with at most
+    ``max_concurrency`` steps running at once, so results arrive in
+    completion order rather than step order.
+
+    Each step produces a ``{"step", "result"}`` dict. With ``stream=True``
+    progress is also forwarded as :class:`AgentEvent` items on the same queue
+    while the step runs, so consumers can relay partial LLM output.
+
+    With a ``checkpoint`` every step's status and output are persisted as it
+    runs; steps the checkpoint already has as done are reported with their
+    stored output instead of being executed again.
+    """
+
+    def __init__(
+        self,
+        tool_manager: Optional[ToolManager] = None,
+        llm: Optional[LLMCallable] = None,
+        max_concurrency: int = 4,
+    ) -> None:
         super().__init__(llm=llm)
         self.tool_manager = tool_manager
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def execute(
+        self,
+        plan_queue: asyncio.Queue,
+        result_queue: asyncio.Queue,
+        *,
+        stream: bool = False,
+        checkpoint: Optional["PlanCheckpoint"] = None,
+    ) -> None:
+        events = result_queue if stream else None
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        finished: Dict[Any, asyncio.Event] = {}
+        seen = set()
+        running: List[asyncio.Task] = []
+
+        async def run_step(step: Any, task: dict) -> None:
+            for dependency in task.get("depends_on") or ():
+                await finished.setdefault(dependency, asyncio.Event()).wait()
+            result = checkpoint.completed_output(step) if checkpoint is not None else None
+            if result is None:
+                async with semaphore:
+                    action = task.get("action", "")
+                    if events is not None:
+                        await events.put(AgentEvent(STEP_STARTED, action, step))
+                    result = await self._run_step(action, task, events, step, checkpoint)
+            await result_queue.put({"step": step, "result": result})
+            # A failed step never sets its event; ``execute`` cancels the
+            # dependents that would otherwise wait forever.
+            finished.setdefault(step, asyncio.Event()).set()
 
-    async def execute(self, plan_queue: asyncio.Queue, result_queue: asyncio.Queue) -> None:
         step_counter = 0
-        while True:
-            task = await plan_queue.get()
-            if task is None:
-                await result_queue.put(None)
-                break
-
-            step_counter += 1
-            action = task.get("action", "")
-            result = await self._execute_action(action, task)
-            await result_queue.put({"step": task.get("step", step_counter), "result": result})
-
-    async def _execute_action(self, action: str, task: dict) -> str:
+        try:
+            while True:
+                task = await plan_queue.get()
+                if task is None:
+                    break
+                step_counter += 1
+                step = task.get("step", step_counter)
+                seen.add(step)
+                running.append(asyncio.create_task(run_step(step, task)))
+
+            # Dependencies on steps that were never planned cannot block.
+            for step, done in finished.items():
+                if step not in seen:
+                    done.set()
+            await asyncio.gather(*running)
+        finally:
+            for pending in running:
+                pending.cancel()
+            await result_queue.put(None)
+
+    async def _run_step(
+        self,
+        action: str,
+        task: dict,
+        events: Optional[asyncio.Queue],
+        step: Any,
+        checkpoint: Optional["PlanCheckpoint"],
+    ) -> str:
+        if checkpoint is None:
+            return await self._execute_action(action, task, events, step)
+        key = await checkpoint.step_started(step, task)
+        try:
+            result = await self._execute_action(action, task, events, step, checkpoint, key)
+        except Exception as exc:
+            await checkpoint.step_failed(step, exc)
+            raise
+        await checkpoint.step_done(step, result)
+        return result
+
+    async def _execute_action(
+        self,
+        action: str,
+        task: dict,
+        events: Optional[asyncio.Queue] = None,
+        step: Optional[int] = None,
+        checkpoint: Optional["PlanCheckpoint"] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> str:
+        async def emit(event: AgentEvent) -> None:
+            if events is not None:
+                await events.put(event)
+
         if self.tool_manager and self.tool_manager.get_tool_by_name(action):
             tool = self.tool_manager.get_tool_by_name(action)
-            output = await tool(**task.get("parameters", {}))
-            return output if isinstance(output, str) else str(output)
-        return await self.call_llm(action)
+            parameters = task.get("parameters", {})
+            await emit(AgentEvent(TOOL_CALL, {"name": action, "parameters": parameters}, step))
+            output = None
+            if checkpoint is not None and idempotency_key is not None:
+                output = await checkpoint.tool_result(idempotency_key)
+            if output is None:
+                if idempotency_key is not None and _accepts(tool, "idempotency_key"):
+                    parameters = {**parameters, "idempotency_key": idempotency_key}
+                output = await tool(**parameters)
+                output = output if isinstance(output, str) else str(output)
+                if checkpoint is not None and idempotency_key is not None:
+                    await checkpoint.record_tool(idempotency_key, output)
+            await emit(AgentEvent(TOOL_RESULT, {"name": action, "output": output}, step))
+            return output
+
+        async def on_token(delta: str) -> None:
+            await emit(AgentEvent(TOKEN, delta, step))
+
+        return await self.call_llm(action, on_token=on_token if events is not None else None)
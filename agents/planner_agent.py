@@ -4,22 +4,38 @@ from __future__ import annotations
 
 import asyncio
 import re
-from typing import Iterable, List, Dict
+from typing import Any, Dict, Iterable, List
 
 from .base_agent import BaseAgent
 
+# A step that opens with a sequencing word or refers back to earlier output
+# ("summarise it", "then translate the result") must wait for the step
+# before it. Anything else is treated as independent and may run in parallel.
+_DEPENDENT_STEP = re.compile(
+    r"^(then|and then|after that|afterwards|next|finally|using|based on)\b"
+    r"|\b(it|its|them|this|that|these|those|result|results|output|above|previous)\b"
+    r"|^(次に|それから|その後)|それ|その結果|結果",
+    re.IGNORECASE,
+)
+
 
 class PlannerAgent(BaseAgent):
-    """Split a user query into individual steps for the executor."""
+    """Split a user query into individual steps for the executor.
+
+    Steps that depend on earlier ones carry a ``depends_on`` list of step
+    numbers; steps without it can start immediately.
+    """
 
     def __init__(self, llm=None) -> None:
         super().__init__(llm=llm)
 
-    async def plan(self, user_query: str, plan_queue: asyncio.Queue) -> List[Dict[str, str]]:
-        steps = [
-            {"step": index, "action": action}
-            for index, action in enumerate(self._extract_steps(user_query), start=1)
-        ]
+    async def plan(self, user_query: str, plan_queue: asyncio.Queue) -> List[Dict[str, Any]]:
+        steps: List[Dict[str, Any]] = []
+        for index, action in enumerate(self._extract_steps(user_query), start=1):
+            step: Dict[str, Any] = {"step": index, "action": action}
+            if index > 1 and _DEPENDENT_STEP.search(action):
+                step["depends_on"] = [index - 1]
+            steps.append(step)
         for step in steps:
             await plan_queue.put(step)
         await plan_queue.put(None)
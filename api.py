@@ -10,7 +10,7 @@ from pydantic import BaseModel
 from cappuccino_agent import CappuccinoAgent
 from goal_manager import GoalManager
 from planner import Planner
-from state_manager import StateManager
+from state_manager import DEFAULT_SESSION, StateManager
 from tool_manager import ToolManager
 
 
@@ -26,6 +26,10 @@ class PlanAdvanceRequest(BaseModel):
     step: int
 
 
+class PlanResumeRequest(BaseModel):
+    session_id: str = DEFAULT_SESSION
+
+
 class RealtimeSession:
     def __init__(self, model: str, voice: str, client_secret: Optional[Dict[str, Any]] = None) -> None:
         self.model = model
@@ -79,7 +83,21 @@ async def agent_events(websocket: WebSocket) -> None:
             payload = await websocket.receive_json()
             query = payload.get("query", "")
             async for event in agent.stream_events(query):
-                await websocket.send_text(event)
+                # Structured events go out as JSON; plain strings pass through.
+                await websocket.send_text(event if isinstance(event, str) else event.to_json())
+    except WebSocketDisconnect:
+        return
+
+
+@app.websocket("/shell/{session_id}/stream")
+async def shell_stream(websocket: WebSocket, session_id: str) -> None:
+    """Forward a shell session's output as it is produced."""
+    await websocket.accept()
+    cursor = int(websocket.query_params.get("cursor", 0))
+    try:
+        async for item in agent.tool_manager.shell_stream(session_id, cursor):
+            await websocket.send_json(item)
+        await websocket.close()
     except WebSocketDisconnect:
         return
 
@@ -104,6 +122,13 @@ async def agent_plan_advance(request: PlanAdvanceRequest) -> Dict[str, Any]:
     return {"current_step": request.step}
 
 
+@app.post("/agent/plan/resume")
+async def agent_plan_resume(request: PlanResumeRequest) -> Dict[str, Any]:
+    """Finish an interrupted plan, skipping the steps that already completed."""
+    result = await agent.resume(request.session_id)
+    return {"resumed": result is not None, "result": result}
+
+
 @app.get("/session")
 async def realtime_session() -> Dict[str, Any]:
     session = await openai_client.beta.realtime.sessions.create(
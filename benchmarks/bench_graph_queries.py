@@ -0,0 +1,117 @@
+"""Benchmark: in-memory vs. SQLite-backed knowledge graph queries.
+
+Run from the repository root::
+
+    python benchmarks/bench_graph_queries.py [--sizes 10000 100000 1000000]
+
+For each size a random graph with ``edges / 5`` entities is written to a
+temporary database. The in-memory backend pays for rebuilding the NetworkX
+graph from the tables once ("load"); :class:`graph_store.SQLGraph` queries
+the indexed tables directly. Query times are averages over random entities,
+in milliseconds. The load line also reports the traced memory per edge of
+the NetworkX and :class:`compact_graph.CompactKnowledgeGraph` backends.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+import graph_store  # noqa: E402
+from compact_graph import CompactKnowledgeGraph  # noqa: E402
+from knowledge_graph import KnowledgeGraph  # noqa: E402
+from sqlite_pool import open_pool  # noqa: E402
+
+RELATIONS = ("knows", "likes", "cites", "owns")
+
+
+def build_changes(edges: int, seed: int = 1):
+    rng = random.Random(seed)
+    nodes = max(2, edges // 5)
+    changes = [("node", f"e{i}", {"group": i % 10, "score": rng.random()}) for i in range(nodes)]
+    seen = set()
+    while len(seen) < edges:
+        a, b = rng.randrange(nodes), rng.randrange(nodes)
+        relation = rng.choice(RELATIONS)
+        if a != b and (a, b, relation) not in seen:
+            seen.add((a, b, relation))
+            changes.append(("edge", f"e{a}", f"e{b}", relation, {}))
+    return nodes, changes
+
+
+async def timed(func, entities, *args):
+    started = time.perf_counter()
+    for entity in entities:
+        result = func(entity, *args)
+        if asyncio.iscoroutine(result):
+            await result
+    return (time.perf_counter() - started) / len(entities) * 1000
+
+
+async def bench(edges: int, samples: int) -> None:
+    nodes, changes = build_changes(edges)
+    rng = random.Random(2)
+    entities = [f"e{rng.randrange(nodes)}" for _ in range(samples)]
+    pairs = [(f"e{rng.randrange(nodes)}", f"e{rng.randrange(nodes)}") for _ in range(max(1, samples // 10))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = await open_pool(str(Path(tmp) / "kg.db"))
+        async with pool.writer() as conn:
+            await graph_store.create_schema(conn)
+            await graph_store.apply_changes(conn, changes)
+            await conn.commit()
+        sql = graph_store.SQLGraph(pool.reader)
+
+        print(f"\n{edges:,} edges, {nodes:,} entities")
+        for graph_class in (CompactKnowledgeGraph, KnowledgeGraph):
+            tracemalloc.start()
+            started = time.perf_counter()
+            async with pool.reader() as conn:
+                memory = await graph_store.load(conn, graph_class)
+            load_ms = (time.perf_counter() - started) * 1000
+            per_edge = tracemalloc.get_traced_memory()[0] / edges
+            tracemalloc.stop()
+            print(f"{graph_class.__name__} load {load_ms:,.0f} ms, {per_edge:,.0f} bytes/edge")
+        print(f"{'query':<28}{'memory ms':>12}{'sqlite ms':>12}")
+        cases = [
+            ("out-edges", "relations", (None, "out"), entities),
+            ("in-edges, relation filter", "relations", ("knows", "in"), entities),
+            ("2-hop neighbourhood", "neighbourhood", (2, None, "out"), entities),
+            ("3-hop, relation filter", "neighbourhood", (3, "knows", "out"), entities[: samples // 4 or 1]),
+        ]
+        for label, method, args, sample in cases:
+            mem_ms = await timed(getattr(memory, method), sample, *args)
+            sql_ms = await timed(getattr(sql, method), sample, *args)
+            print(f"{label:<28}{mem_ms:>12.3f}{sql_ms:>12.3f}")
+
+        mem_ms = await timed(lambda pair: memory.shortest_path(*pair), pairs)
+        sql_ms = await timed(lambda pair: sql.shortest_path(*pair), pairs)
+        print(f"{'shortest path':<28}{mem_ms:>12.3f}{sql_ms:>12.3f}")
+
+        where = [("group", "=", 3), ("score", ">", 0.9)]
+        mem_ms = await timed(lambda w: memory.find_entities(w), [where])
+        sql_ms = await timed(lambda w: sql.find_entities(w), [where])
+        print(f"{'attribute predicate scan':<28}{mem_ms:>12.3f}{sql_ms:>12.3f}")
+        await pool.release()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    for edges in args.sizes:
+        await bench(edges, args.samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
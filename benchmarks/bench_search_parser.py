@@ -0,0 +1,72 @@
+"""Micro-benchmark: legacy regex scraping vs. the streaming result parser.
+
+Run from the repository root::
+
+    python benchmarks/bench_search_parser.py [--repeat N]
+
+Each saved DuckDuckGo fixture page is parsed with the old
+``findall`` + ``re.sub`` approach and with :class:`ResultLinkParser`, fed in
+16 KiB chunks, both for all results and with ``max_results=10``. The
+streaming figures include how many bytes had to be read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from search_parser import ResultLinkParser  # noqa: E402
+
+FIXTURES = ROOT / "tests" / "fixtures"
+CHUNK = 16 * 1024
+
+
+def legacy_parse(text: str):
+    pattern = re.compile(r"<a[^>]+class=['\"]result__a['\"][^>]*href=['\"]([^'\"]+)['\"][^>]*>(.*?)</a>", re.IGNORECASE)
+    results = []
+    for url, title in pattern.findall(text):
+        clean_title = re.sub(r"<.*?>", "", title)
+        results.append({"title": clean_title, "url": url})
+    return results
+
+
+def streaming_parse(data: bytes, max_results=None):
+    parser = ResultLinkParser(max_results)
+    read = 0
+    for start in range(0, len(data), CHUNK):
+        chunk = data[start : start + CHUNK]
+        read += len(chunk)
+        parser.feed(chunk.decode("utf-8"))
+        if parser.done:
+            break
+    return parser.results, read
+
+
+def main() -> None:
+    options = argparse.ArgumentParser(description=__doc__)
+    options.add_argument("--repeat", type=int, default=200)
+    repeat = options.parse_args().repeat
+
+    print(f"{'page':28} {'variant':22} {'results':>7} {'bytes read':>10} {'us/page':>9}")
+    for page in sorted(FIXTURES.glob("ddg_*.html")):
+        data = page.read_bytes()
+        text = data.decode("utf-8")
+        variants = [
+            ("legacy regex", lambda: (legacy_parse(text), len(data))),
+            ("streaming", lambda: streaming_parse(data)),
+            ("streaming max=10", lambda: streaming_parse(data, 10)),
+        ]
+        for name, run in variants:
+            results, read = run()
+            seconds = timeit.timeit(run, number=repeat) / repeat
+            print(f"{page.name:28} {name:22} {len(results):7d} {read:10d} {seconds * 1e6:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
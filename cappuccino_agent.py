@@ -4,15 +4,37 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from agents import AnalyzerAgent, ExecutorAgent, PlannerAgent
-from state_manager import StateManager
+from agents import AgentEvent, AnalyzerAgent, ExecutorAgent, PlannerAgent
+from agents.events import FINAL, PLAN_CREATED, EventCallback
+from fractal_planner import FractalPlanner
+from state_manager import DEFAULT_SESSION, StateManager
 from tool_manager import ToolManager
 from agents.base_agent import BaseAgent
+from llm_cache import LLMResponseCache
+import plan_store
+from plan_checkpoint import PlanCheckpoint
+from scheduler import Scheduler
 from self_improver import SelfImprover
 
 
+@dataclass
+class SessionState:
+    """In-memory state of one conversation, guarded by its own lock."""
+
+    history: List[Dict[str, Any]]
+    task_plan: List[Dict[str, Any]] = field(default_factory=list)
+    phase: int = 0
+    loaded: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Callers holding or waiting for ``lock``; only idle sessions are evicted.
+    users: int = 0
+
+
 class CappuccinoAgent:
     def __init__(
         self,
@@ -24,9 +46,16 @@ class CappuccinoAgent:
         db_path: Optional[str] = None,
         thread_workers: int = 4,
         process_workers: int = 1,
+        max_sessions: int = 1024,
+        llm_cache: bool = True,
+        llm_cache_ttl: Optional[float] = None,
+        semantic_cache: Optional[Any] = None,
+        fractal_planner: Optional[FractalPlanner] = None,
     ) -> None:
         self.llm = llm
-        self.tool_manager = tool_manager or ToolManager(db_path=db_path or ":memory:")
+        self.tool_manager = tool_manager or ToolManager(
+            db_path=db_path or ":memory:", process_workers=process_workers, http_cache=True
+        )
         self.state_manager = state_manager or (StateManager(db_path) if db_path else None)
         self.thread_workers = thread_workers
         self.process_workers = process_workers
@@ -34,14 +63,18 @@ class CappuccinoAgent:
         self.api_base = api_base
 
         self.system_prompt = "You are Cappuccino, a helpful multitool assistant."
-        self.history: List[Dict[str, Any]] = [{"role": "system", "content": self.system_prompt}]
-        self.task_plan: List[Dict[str, Any]] = []
-        self.phase = 0
-        self._state_loaded = False if self.state_manager else True
-        self._lock = asyncio.Lock()
+        # Hot sessions in LRU order. State is written through to the state
+        # manager on every mutation, so eviction only drops the memory copy.
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
 
         self.planner = PlannerAgent()
-        self.executor = ExecutorAgent(tool_manager=self.tool_manager, llm=self.llm)
+        # When set, queries are planned as lazy plan trees whose leaves are
+        # fed to the executor while later subtrees are still unexpanded.
+        self.fractal_planner = fractal_planner
+        self.executor = ExecutorAgent(
+            tool_manager=self.tool_manager, llm=self.llm, max_concurrency=thread_workers
+        )
         self.analyzer = AnalyzerAgent()
         self.self_improver = SelfImprover(
             self.state_manager or StateManager(), self.tool_manager, api_key=api_key
@@ -49,6 +82,12 @@ class CappuccinoAgent:
 
         self.client = None
         self.model = "gpt-4o"
+        self.llm_cache = LLMResponseCache(
+            self.tool_manager,
+            ttl=llm_cache_ttl,
+            enabled=llm_cache,
+            semantic=semantic_cache,
+        )
 
     # ------------------------------------------------------------------
     # Construction helpers
@@ -59,7 +98,33 @@ class CappuccinoAgent:
         await agent._ensure_state_loaded()
         return agent
 
+    # The default session backs the single-conversation attributes.
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        return self._session(DEFAULT_SESSION).history
+
+    @history.setter
+    def history(self, value: List[Dict[str, Any]]) -> None:
+        self._session(DEFAULT_SESSION).history = value
+
+    @property
+    def task_plan(self) -> List[Dict[str, Any]]:
+        return self._session(DEFAULT_SESSION).task_plan
+
+    @task_plan.setter
+    def task_plan(self, value: List[Dict[str, Any]]) -> None:
+        self._session(DEFAULT_SESSION).task_plan = value
+
+    @property
+    def phase(self) -> int:
+        return self._session(DEFAULT_SESSION).phase
+
+    @phase.setter
+    def phase(self, value: int) -> None:
+        self._session(DEFAULT_SESSION).phase = value
+
     async def close(self) -> None:
+        await self.llm_cache.close()
         if self.state_manager:
             await self.state_manager.close()
         await self.tool_manager.close()
@@ -67,64 +132,194 @@ class CappuccinoAgent:
     # ------------------------------------------------------------------
     # Core behaviour
     # ------------------------------------------------------------------
-    async def run(self, user_query: str) -> str:
-        async with self._lock:
-            await self._ensure_state_loaded()
-            self.history.append({"role": "user", "content": user_query})
+    async def run(
+        self,
+        user_query: str,
+        session_id: str = DEFAULT_SESSION,
+        *,
+        use_cache: bool = True,
+        on_event: Optional[EventCallback] = None,
+    ) -> str:
+        async with self._locked_session(session_id) as session:
+            await self._ensure_state_loaded(session_id)
+            session.history.append({"role": "user", "content": user_query})
 
-            plan_queue: asyncio.Queue = asyncio.Queue()
-            steps = await self.planner.plan(user_query, plan_queue)
-            self.task_plan = steps
+            final = await self.llm_cache.get_or_call(
+                user_query,
+                lambda: self._execute_query(user_query, session, on_event, session_id),
+                model=self.model,
+                use_cache=use_cache,
+            )
+            session.history.append({"role": "assistant", "content": final})
 
-            result_queue: asyncio.Queue = asyncio.Queue()
-            await self.executor.execute(plan_queue, result_queue)
-            results = await self.analyzer.analyze(result_queue)
+            await self._persist_state(session_id)
+            return final
 
-            final = results[-1]["result"] if results else "error: llm unavailable"
-            self.history.append({"role": "assistant", "content": final})
+    async def resume(
+        self, session_id: str = DEFAULT_SESSION, *, on_event: Optional[EventCallback] = None
+    ) -> Optional[str]:
+        """Finish the session's interrupted plan, re-running only unfinished steps.
 
-            await self.tool_manager.set_cached_result(f"llm:{user_query}", final)
-            await self._persist_state()
+        Returns the final answer (the stored one if the last run already
+        completed), or ``None`` when there is no run to resume.
+        """
+        if self.state_manager is None:
+            return None
+        async with self._locked_session(session_id) as session:
+            await self._ensure_state_loaded(session_id)
+            checkpoint = await PlanCheckpoint.load(self.state_manager, session_id)
+            if checkpoint is None or checkpoint.finished:
+                return checkpoint.result if checkpoint else None
+            last = session.history[-1] if session.history else {}
+            if last != {"role": "user", "content": checkpoint.query}:
+                session.history.append({"role": "user", "content": checkpoint.query})
+            final = await self._execute_query(
+                checkpoint.query, session, on_event, session_id, checkpoint=checkpoint
+            )
+            session.history.append({"role": "assistant", "content": final})
+            await self._persist_state(session_id)
             return final
 
-    async def stream_events(self, user_query: str):
-        yield "planning"
-        result = await self.run(user_query)
-        yield result
+    async def schedule_plans(self, scheduler: Scheduler, *, poll_interval: float = 5.0) -> None:
+        """Execute the tool manager's due plans (``agent_schedule_task``) on ``scheduler``.
+
+        A plan runs as one query built from its steps, or its description if
+        it has none, in the plan's session (``plan_id`` when unset).
+        """
+
+        async def run_plan(plan: Dict[str, Any]) -> Optional[str]:
+            steps = await self.tool_manager.plans.get_steps(plan["plan_id"])
+            query = ". ".join(step["action"] for step in steps if step["action"]) or plan["description"]
+            if not query:
+                return None
+            return await self.run(query, plan["session_id"] or plan["plan_id"], use_cache=False)
+
+        await plan_store.schedule_due_plans(
+            scheduler, self.tool_manager.plans, run_plan, poll_interval=poll_interval
+        )
+
+    async def _execute_query(
+        self,
+        user_query: str,
+        session: SessionState,
+        on_event: Optional[EventCallback] = None,
+        session_id: str = DEFAULT_SESSION,
+        checkpoint: Optional[PlanCheckpoint] = None,
+    ) -> str:
+        plan_queue: asyncio.Queue = asyncio.Queue()
+        feeder = None
+        if checkpoint is None and self.fractal_planner is not None:
+            tree = self.fractal_planner.plan_tree(user_query)
+            if self.state_manager is not None:
+                checkpoint = await PlanCheckpoint.start(self.state_manager, user_query, [], session_id)
+            feeder = tree.feed(plan_queue, checkpoint.add_step if checkpoint is not None else None)
+            # Only the top-level outline is known before execution starts.
+            steps = tree.to_list()
+        elif checkpoint is None:
+            steps = await self.planner.plan(user_query, plan_queue)
+            if self.state_manager is not None:
+                checkpoint = await PlanCheckpoint.start(
+                    self.state_manager, user_query, steps, session_id
+                )
+        else:
+            steps = checkpoint.task_plan
+            for step in steps:
+                await plan_queue.put(step)
+            await plan_queue.put(None)
+        session.task_plan = steps
+        if on_event is not None:
+            await on_event(AgentEvent(PLAN_CREATED, steps))
+
+        # The analyzer drains results while the executor is still running so
+        # that streamed progress reaches ``on_event`` as it is produced.
+        result_queue: asyncio.Queue = asyncio.Queue()
+        _, results, *fed = await asyncio.gather(
+            self.executor.execute(
+                plan_queue, result_queue, stream=on_event is not None, checkpoint=checkpoint
+            ),
+            self.analyzer.analyze(result_queue, on_event=on_event),
+            *([feeder] if feeder is not None else []),
+        )
+        if fed:
+            session.task_plan = fed[0]
+
+        final = results[-1]["result"] if results else "error: llm unavailable"
+        if checkpoint is not None:
+            await checkpoint.finish(final)
+        return final
+
+    async def stream_events(
+        self, user_query: str, session_id: str = DEFAULT_SESSION
+    ) -> AsyncIterator[AgentEvent]:
+        """Run ``user_query`` and yield :class:`AgentEvent` updates as they happen.
+
+        The last event is always ``final`` carrying the answer. Cached answers
+        skip straight to it.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        run_task = asyncio.create_task(
+            self.run(user_query, session_id=session_id, on_event=events.put)
+        )
+        run_task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            yield AgentEvent(FINAL, await run_task)
+        finally:
+            if not run_task.done():
+                run_task.cancel()
 
     # ------------------------------------------------------------------
     # State helpers
     # ------------------------------------------------------------------
-    async def set_task_plan(self, plan: List[Dict[str, Any]]) -> None:
-        await self._ensure_state_loaded()
-        self.task_plan = plan
-        await self._persist_state()
-
-    async def add_message(self, role: str, content: str, **extra: Any) -> None:
-        await self._ensure_state_loaded()
-        message = {"role": role, "content": content}
-        message.update(extra)
-        self.history.append(message)
-        await self._persist_state()
-
-    async def advance_phase(self) -> int:
-        await self._ensure_state_loaded()
-        self.phase += 1
-        await self._persist_state()
+    async def set_task_plan(
+        self, plan: List[Dict[str, Any]], session_id: str = DEFAULT_SESSION
+    ) -> None:
+        async with self._locked_session(session_id) as session:
+            await self._ensure_state_loaded(session_id)
+            session.task_plan = plan
+            await self._persist_state(session_id)
+
+    async def add_message(
+        self, role: str, content: str, session_id: str = DEFAULT_SESSION, **extra: Any
+    ) -> None:
+        async with self._locked_session(session_id) as session:
+            await self._ensure_state_loaded(session_id)
+            message = {"role": role, "content": content}
+            message.update(extra)
+            session.history.append(message)
+            await self._persist_state(session_id)
+
+    async def advance_phase(self, session_id: str = DEFAULT_SESSION) -> int:
+        async with self._locked_session(session_id) as session:
+            await self._ensure_state_loaded(session_id)
+            session.phase += 1
+            phase = session.phase
+            await self._persist_state(session_id)
         if self.self_improver:
             await self.self_improver.improve()
-        return self.phase
+        return phase
 
     async def get_cached_result(self, key: str) -> Any:
         return await self.tool_manager.get_cached_result(key)
 
-    async def call_llm(self, prompt: str) -> str:
+    def llm_cache_key(self, prompt: str) -> str:
+        """Return the cache key under which responses to ``prompt`` are stored."""
+        return self.llm_cache.key(prompt, self.model)
+
+    async def call_llm(self, prompt: str, *, use_cache: bool = True) -> str:
         sentiment = "positive" if any(word in prompt.lower() for word in ("love", "great", "awesome")) else "negative"
         decorated = f"[sentiment={sentiment}] {prompt}"
         helper = BaseAgent(self.llm)
-        result = await helper.call_llm(decorated)
-        await self.tool_manager.set_cached_result(f"llm:{prompt}", result)
-        return result
+        return await self.llm_cache.get_or_call(
+            prompt,
+            lambda: helper.call_llm(decorated),
+            model=self.model,
+            use_cache=use_cache,
+        )
 
     async def call_llm_with_tools(self, prompt: str, tools_schema: List[Dict[str, Any]]) -> str:
         if not self.client:
@@ -154,17 +349,66 @@ class CappuccinoAgent:
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    async def _ensure_state_loaded(self) -> None:
-        if self._state_loaded:
+    def _session(self, session_id: str) -> SessionState:
+        """Return the hot state for ``session_id``, creating it if needed."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = SessionState(
+                history=[{"role": "system", "content": self.system_prompt}],
+                loaded=self.state_manager is None,
+            )
+            self._sessions[session_id] = session
+            self._evict_sessions(keep=session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    @asynccontextmanager
+    async def _locked_session(self, session_id: str) -> AsyncIterator[SessionState]:
+        """Hold ``session_id``'s lock; the session is not evicted meanwhile.
+
+        The session counts as in use from before the lock is requested until
+        after it is released, so callers queued on the lock keep it resident.
+        """
+        session = self._session(session_id)
+        session.users += 1
+        try:
+            async with session.lock:
+                yield session
+        finally:
+            session.users -= 1
+
+    def _evict_sessions(self, keep: Optional[str] = None) -> None:
+        """Drop least recently used idle sessions beyond ``max_sessions``."""
+        excess = len(self._sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        for session_id, session in list(self._sessions.items()):
+            if excess <= 0:
+                break
+            # Sessions in use, the default session and ``keep`` stay resident.
+            if session_id in (DEFAULT_SESSION, keep) or session.users:
+                continue
+            del self._sessions[session_id]
+            if self.state_manager:
+                self.state_manager.forget_session(session_id)
+            excess -= 1
+
+    async def _ensure_state_loaded(self, session_id: str = DEFAULT_SESSION) -> None:
+        session = self._session(session_id)
+        if session.loaded:
             return
-        data = await self.state_manager.load() if self.state_manager else {}
-        self.task_plan = data.get("task_plan", [])
+        data = await self.state_manager.load(session_id) if self.state_manager else {}
+        session.task_plan = data.get("task_plan", [])
         history = data.get("history")
         if history:
-            self.history = history
-        self.phase = data.get("phase", 0)
-        self._state_loaded = True
+            session.history = history
+        session.phase = data.get("phase", 0)
+        session.loaded = True
 
-    async def _persist_state(self) -> None:
+    async def _persist_state(self, session_id: str = DEFAULT_SESSION) -> None:
         if self.state_manager:
-            await self.state_manager.save(self.task_plan, self.history, self.phase)
+            session = self._session(session_id)
+            await self.state_manager.save(
+                session.task_plan, session.history, session.phase, session_id
+            )
@@ -0,0 +1,330 @@
+"""Array-backed :class:`KnowledgeGraph` for large graphs.
+
+``KnowledgeGraph`` keeps a NetworkX ``MultiDiGraph``, which spends several
+hundred bytes per edge on nested dictionaries. :class:`CompactKnowledgeGraph`
+implements the same API with entity and relation names interned to integer
+ids and edges held in CSR (compressed sparse row) NumPy arrays:
+
+* ``offsets[i]:offsets[i + 1]`` is the slice of ``targets``/``rels`` holding
+  the outgoing edges of entity ``i``;
+* a boolean ``live`` mask marks removed edges until the next compaction;
+* relations added since the last compaction are appended to a small delta
+  buffer and merged into the arrays once it grows past an eighth of them;
+* the reverse (incoming) index is built lazily on the first in-edge query;
+* attributes live in side tables that only hold non-empty dictionaries.
+
+The graph can be selected wherever a ``graph_class`` is accepted, for
+example ``ToolManager(graph_class=CompactKnowledgeGraph)``.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_graph import BaseKnowledgeGraph
+
+# Compact the delta buffer into the CSR arrays once it holds this many edges
+# or an eighth of the compacted edges, whichever is larger.
+_MIN_DELTA = 4096
+
+
+class CompactKnowledgeGraph(BaseKnowledgeGraph):
+    """Knowledge graph storing relations in interned, CSR-style arrays."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._clear()
+
+    # ------------------------------------------------------------------
+    # Interning
+    # ------------------------------------------------------------------
+    def _intern(self, name: str) -> int:
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return node
+
+    def _intern_relation(self, relation: str) -> int:
+        rel = self._rel_ids.get(relation)
+        if rel is None:
+            rel = self._rel_ids[relation] = len(self._rel_names)
+            self._rel_names.append(relation)
+        return rel
+
+    # ------------------------------------------------------------------
+    # Edge lookup
+    # ------------------------------------------------------------------
+    def _base_range(self, node: int) -> Tuple[int, int]:
+        if node + 1 >= len(self._offsets):
+            return 0, 0
+        return int(self._offsets[node]), int(self._offsets[node + 1])
+
+    def _find_base(self, source: int, target: int, rel: int) -> Optional[int]:
+        start, end = self._base_range(source)
+        if start == end:
+            return None
+        hits = np.flatnonzero(
+            (self._targets[start:end] == target)
+            & (self._rels[start:end] == rel)
+            & self._live[start:end]
+        )
+        return start + int(hits[0]) if len(hits) else None
+
+    def _find_delta(self, source: int, target: int, rel: int) -> Optional[int]:
+        for index in self._delta_out.get(source, ()):
+            if self._delta_dst[index] == target and self._delta_rel[index] == rel:
+                return index
+        return None
+
+    def _reverse(self) -> Tuple[np.ndarray, np.ndarray]:
+        """``(offsets, edge indexes)`` of the compacted edges grouped by target."""
+        if self._rev is None:
+            order = np.argsort(self._targets, kind="stable")
+            counts = np.bincount(self._targets, minlength=len(self._offsets) - 1)
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            self._rev = (offsets, order.astype(self._index_dtype(), copy=False))
+        return self._rev
+
+    def _index_dtype(self) -> Any:
+        return np.int32 if len(self._targets) < 2**31 else np.int64
+
+    def _base_sources(self, edges: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self._offsets, edges, side="right") - 1
+
+    # ------------------------------------------------------------------
+    # Storage primitives
+    # ------------------------------------------------------------------
+    def _add_node(self, name: str, attrs: Dict[str, Any]) -> None:
+        node = self._intern(name)
+        if attrs:
+            self._node_attrs.setdefault(node, {}).update(attrs)
+
+    def _add_edge(self, source: str, target: str, relation: str, attrs: Dict[str, Any]) -> None:
+        src, dst = self._intern(source), self._intern(target)
+        rel = self._intern_relation(relation)
+        key = (src, dst, rel)
+        if self._find_base(src, dst, rel) is None and self._find_delta(src, dst, rel) is None:
+            index = len(self._delta_src)
+            self._delta_src.append(src)
+            self._delta_dst.append(dst)
+            self._delta_rel.append(rel)
+            self._delta_out.setdefault(src, []).append(index)
+            self._delta_in.setdefault(dst, []).append(index)
+            self._edge_count += 1
+        if attrs:
+            self._edge_attrs.setdefault(key, {}).update(attrs)
+        if len(self._delta_src) > max(_MIN_DELTA, len(self._targets) // 8):
+            self._compact()
+
+    def _drop_delta(self, index: int) -> None:
+        # Tombstone; the slot is discarded by the next compaction.
+        self._delta_rel[index] = -1
+        self._delta_out[self._delta_src[index]].remove(index)
+        self._delta_in[self._delta_dst[index]].remove(index)
+
+    def _remove_edge(self, source: str, target: str, relation: str) -> bool:
+        src, dst = self._ids.get(source), self._ids.get(target)
+        rel = self._rel_ids.get(relation)
+        if src is None or dst is None or rel is None:
+            return False
+        base = self._find_base(src, dst, rel)
+        if base is not None:
+            self._live[base] = False
+        else:
+            index = self._find_delta(src, dst, rel)
+            if index is None:
+                return False
+            self._drop_delta(index)
+        self._edge_attrs.pop((src, dst, rel), None)
+        self._edge_count -= 1
+        return True
+
+    def _remove_node(self, name: str) -> bool:
+        node = self._ids.pop(name, None)
+        if node is None:
+            return False
+        removed = []
+        start, end = self._base_range(node)
+        for edge in np.flatnonzero(self._live[start:end]) + start:
+            removed.append((node, int(self._targets[edge]), int(self._rels[edge])))
+        self._live[start:end] = False
+        if node + 1 < len(self._offsets):
+            offsets, order = self._reverse()
+            incoming = order[offsets[node] : offsets[node + 1]]
+            incoming = incoming[self._live[incoming]]
+            for src, edge in zip(self._base_sources(incoming), incoming):
+                removed.append((int(src), node, int(self._rels[edge])))
+            self._live[incoming] = False
+        for index in self._delta_out.get(node, []) + self._delta_in.get(node, []):
+            if self._delta_rel[index] >= 0:
+                removed.append((self._delta_src[index], self._delta_dst[index], self._delta_rel[index]))
+                self._drop_delta(index)
+        self._delta_out.pop(node, None)
+        self._delta_in.pop(node, None)
+        for key in removed:
+            self._edge_attrs.pop(key, None)
+        self._edge_count -= len(removed)
+        self._node_attrs.pop(node, None)
+        # The id stays reserved so the arrays never need renumbering.
+        self._names[node] = None
+        return True
+
+    def _clear(self) -> None:
+        self._names: List[Optional[str]] = []
+        self._ids: Dict[str, int] = {}
+        self._rel_names: List[str] = []
+        self._rel_ids: Dict[str, int] = {}
+        self._node_attrs: Dict[int, Dict[str, Any]] = {}
+        self._edge_attrs: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        self._set_arrays(
+            np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        )
+        self._edge_count = 0
+
+    def _set_arrays(self, offsets: np.ndarray, targets: np.ndarray, rels: np.ndarray) -> None:
+        self._offsets = offsets
+        self._targets = targets
+        self._rels = rels
+        self._live = np.ones(len(targets), dtype=bool)
+        self._rev: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._delta_src = array("i")
+        self._delta_dst = array("i")
+        self._delta_rel = array("i")
+        self._delta_out: Dict[int, List[int]] = {}
+        self._delta_in: Dict[int, List[int]] = {}
+
+    def _build(self, sources: np.ndarray, targets: np.ndarray, rels: np.ndarray) -> None:
+        """Install edges given as parallel arrays as the compacted CSR arrays."""
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=len(self._names))
+        offsets = np.zeros(len(self._names) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self._set_arrays(
+            offsets,
+            targets[order].astype(np.int32, copy=False),
+            rels[order].astype(np.int32, copy=False),
+        )
+
+    def _compact(self) -> None:
+        """Fold the delta buffer and removals into fresh CSR arrays."""
+        live = self._live
+        sources = np.concatenate(
+            [
+                self._base_sources(np.flatnonzero(live)),
+                np.frombuffer(self._delta_src, dtype=np.int32),
+            ]
+        )
+        targets = np.concatenate([self._targets[live], np.frombuffer(self._delta_dst, dtype=np.int32)])
+        rels = np.concatenate([self._rels[live], np.frombuffer(self._delta_rel, dtype=np.int32)])
+        keep = rels >= 0
+        self._build(sources[keep], targets[keep], rels[keep])
+
+    # ------------------------------------------------------------------
+    # Read accessors
+    # ------------------------------------------------------------------
+    def has_entity(self, name: str) -> bool:
+        return name in self._ids
+
+    def entity_attrs(self, name: str) -> Dict[str, Any]:
+        return dict(self._node_attrs.get(self._ids[name], {}))
+
+    def entities(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for node, name in enumerate(self._names):
+            if name is not None:
+                yield name, self._node_attrs.get(node, {})
+
+    def relation_rows(self) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+        names, rel_names = self._names, self._rel_names
+        edges = np.flatnonzero(self._live)
+        for src, dst, rel in zip(
+            self._base_sources(edges).tolist(),
+            self._targets[edges].tolist(),
+            self._rels[edges].tolist(),
+        ):
+            yield names[src], names[dst], rel_names[rel], self._edge_attrs.get((src, dst, rel), {})
+        for src, dst, rel in zip(self._delta_src, self._delta_dst, self._delta_rel):
+            if rel >= 0:
+                yield names[src], names[dst], rel_names[rel], self._edge_attrs.get((src, dst, rel), {})
+
+    def out_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        node = self._ids.get(name)
+        if node is None:
+            return
+        names, rel_names = self._names, self._rel_names
+        start, end = self._base_range(node)
+        live = self._live[start:end]
+        for dst, rel in zip(self._targets[start:end][live].tolist(), self._rels[start:end][live].tolist()):
+            yield names[dst], rel_names[rel]
+        for index in self._delta_out.get(node, ()):
+            yield names[self._delta_dst[index]], rel_names[self._delta_rel[index]]
+
+    def in_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        node = self._ids.get(name)
+        if node is None:
+            return
+        names, rel_names = self._names, self._rel_names
+        if node + 1 < len(self._offsets):
+            offsets, order = self._reverse()
+            edges = order[offsets[node] : offsets[node + 1]]
+            edges = edges[self._live[edges]]
+            for src, rel in zip(self._base_sources(edges).tolist(), self._rels[edges].tolist()):
+                yield names[src], rel_names[rel]
+        for index in self._delta_in.get(node, ()):
+            yield names[self._delta_src[index]], rel_names[self._delta_rel[index]]
+
+    def number_of_entities(self) -> int:
+        return len(self._ids)
+
+    def number_of_relations(self) -> int:
+        return self._edge_count
+
+    def nbytes(self) -> int:
+        """Bytes held by the edge arrays, excluding Python-level tables."""
+        arrays = [self._offsets, self._targets, self._rels, self._live]
+        if self._rev is not None:
+            arrays.extend(self._rev)
+        delta = sum(buf.itemsize * len(buf) for buf in (self._delta_src, self._delta_dst, self._delta_rel))
+        return sum(a.nbytes for a in arrays) + delta
+
+    # ------------------------------------------------------------------
+    # Bulk construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_rows(
+        cls,
+        nodes: Iterable[Tuple[str, Dict[str, Any]]],
+        edges: Iterable[Tuple[str, str, str, Dict[str, Any]]],
+    ) -> "CompactKnowledgeGraph":
+        """Build the arrays in one pass instead of edge by edge."""
+        instance = cls()
+        for name, attrs in nodes:
+            instance._add_node(name, attrs)
+        sources, targets, rels = array("i"), array("i"), array("i")
+        intern, intern_relation = instance._intern, instance._intern_relation
+        edge_attrs = instance._edge_attrs
+        for source, target, relation, attrs in edges:
+            key = (intern(source), intern(target), intern_relation(relation))
+            sources.append(key[0])
+            targets.append(key[1])
+            rels.append(key[2])
+            if attrs:
+                edge_attrs.setdefault(key, {}).update(attrs)
+        src = np.frombuffer(sources, dtype=np.int32)
+        dst = np.frombuffer(targets, dtype=np.int32)
+        rel = np.frombuffer(rels, dtype=np.int32)
+        if len(src):
+            # Repeated (source, target, relation) rows collapse into one
+            # relation, as they do when added one at a time.
+            packed = np.stack([src, dst, rel], axis=1)
+            _, first = np.unique(packed, axis=0, return_index=True)
+            if len(first) < len(src):
+                first.sort()
+                src, dst, rel = src[first], dst[first], rel[first]
+        instance._build(src, dst, rel)
+        instance._edge_count = len(src)
+        return instance
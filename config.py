@@ -17,5 +17,13 @@ class Settings:
     azure_openai_key: str | None = os.getenv("AZURE_OPENAI_API_KEY")
     fractal_depth: int = int(os.getenv("FRACTAL_DEPTH", "2"))
     fractal_breadth: int = int(os.getenv("FRACTAL_BREADTH", "3"))
+    # Per-plan caps on FractalPlanner expansion (steps, seconds).
+    fractal_max_nodes: int = int(os.getenv("FRACTAL_MAX_NODES", "2000"))
+    fractal_time_budget: float = float(os.getenv("FRACTAL_TIME_BUDGET", "2.0"))
+    # Wall-clock budget (seconds) for an LLM-mode plan; unset means
+    # ``llm_timeout`` per plan level.
+    planner_time_budget: Optional[float] = (
+        float(os.environ["PLANNER_TIME_BUDGET"]) if os.getenv("PLANNER_TIME_BUDGET") else None
+    )
 
 settings = Settings()
\ No newline at end of file
@@ -19,6 +19,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from cappuccino_agent import CappuccinoAgent
+from scheduler import JobStore, Scheduler
 import json
 import feedparser
 import aiohttp
@@ -51,6 +52,8 @@ is_generating_image = False
 image_generating_channel_id = None
 
 EEW_BASE_URL = os.environ.get("EEW_BASE_URL", "https://www.jma.go.jp/bosai/quake/data/")
+# ニュースRSSのキャッシュが古くても即答に使ってよい秒数（裏で再検証する）
+NEWS_STALE_SECONDS = 900
 
 
 async def _send_eew(channel: "discord.abc.Messageable", item: dict) -> None:
@@ -61,12 +64,9 @@ async def _send_eew(channel: "discord.abc.Messageable", item: dict) -> None:
     url = detail_path if detail_path.startswith("http") else f"{EEW_BASE_URL}{detail_path}"
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as response:
-                try:
-                    detail = await response.json(content_type=None)
-                except TypeError:  # pragma: no cover - compatibility with mocked response
-                    detail = await response.json()
+        # 共有のkeep-aliveセッションとHTTPキャッシュを経由して取得する
+        response = await cappuccino_agent.tool_manager.http_get(url, timeout=10)
+        detail = await response.json()
     except Exception:  # pragma: no cover - network failures
         return
 
@@ -461,6 +461,12 @@ WEATHER_CHANNEL_ID = _load_weather_channel()
 # api_baseがNoneの場合はデフォルト値を使用
 api_base = OPENAI_API_BASE if OPENAI_API_BASE else "https://api.openai.com/v1"
 cappuccino_agent = CappuccinoAgent(api_key=OPENAI_API_KEY, api_base=api_base)
+# ───────────────── スケジューラー ─────────────────
+# 次回実行時刻は scheduler.db に保存されるので、再起動しても周期がリセットされない
+scheduler = Scheduler(
+    JobStore(os.path.join(ROOT_DIR, "scheduler.db")),
+    concurrency={"auto_post": 1, "agent": 2},
+)
 # ───────────────── ロギング設定 ─────────────────
 log_file_path = os.path.join(ROOT_DIR, "..", "bot.log")
 handler = RotatingFileHandler(log_file_path, maxBytes=1_000_000, backupCount=5, encoding='utf-8')
@@ -795,14 +801,27 @@ async def on_ready():
         synced = await bot.tree.sync()
         print(f"Slashコマンドを{len(synced)}件同期しました")
         
-        # 自動配信タスクを開始
-        asyncio.create_task(auto_news_task())
-        asyncio.create_task(auto_weather_task())
-        print("自動配信タスクを開始しました")
+        # 自動配信ジョブを開始（on_readyは再接続のたびに呼ばれるので一度だけ）
+        if not scheduler.running:
+            await start_scheduled_jobs()
+            print("自動配信タスクを開始しました")
         
     except Exception as e:
         print(f"コマンド同期に失敗: {e}")
 
+async def start_scheduled_jobs():
+    """自動配信とエージェントの予約タスクをスケジューラーに登録して開始"""
+    await scheduler.add_job(
+        "auto_news", auto_news_task, "every 6 hours",
+        job_type="auto_post", jitter=60, run_immediately=True,
+    )
+    await scheduler.add_job(
+        "auto_weather", auto_weather_task, "every 3 hours",
+        job_type="auto_post", jitter=60, run_immediately=True,
+    )
+    await cappuccino_agent.schedule_plans(scheduler)
+    scheduler.start()
+
 async def start_bot():
     # Discord Botのトークンを環境変数から取得
     TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -1445,19 +1464,21 @@ async def get_weather_data(city: str = "Tokyo") -> dict:
             return {"error": "OpenWeatherMap APIキーが設定されていません"}
         
         url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric&lang=ja"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {
-                        "city": data["name"],
-                        "temp": data["main"]["temp"],
-                        "humidity": data["main"]["humidity"],
-                        "description": data["weather"][0]["description"],
-                        "icon": data["weather"][0]["icon"]
-                    }
-                else:
-                    return {"error": f"天気情報の取得に失敗: {response.status}"}
+        # ToolManagerの共有セッションとHTTPキャッシュを使う
+        response = await cappuccino_agent.tool_manager.http_get(
+            url, timeout=aiohttp.ClientTimeout(total=10)
+        )
+        if response.status == 200:
+            data = await response.json()
+            return {
+                "city": data["name"],
+                "temp": data["main"]["temp"],
+                "humidity": data["main"]["humidity"],
+                "description": data["weather"][0]["description"],
+                "icon": data["weather"][0]["icon"]
+            }
+        else:
+            return {"error": f"天気情報の取得に失敗: {response.status}"}
     except Exception as e:
         return {"error": f"天気情報取得エラー: {e}"}
 
@@ -1479,39 +1500,38 @@ async def get_news_data() -> list:
         ]
         
         all_news = []
-        # SSL証明書の問題を回避するための設定
-        connector = aiohttp.TCPConnector(ssl=False)
+        # ToolManagerの共有セッションとHTTPキャッシュを使う（SSL証明書の問題を回避するため ssl=False）
         timeout = aiohttp.ClientTimeout(total=10)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            for source in news_sources:
-                try:
-                    async with session.get(source) as response:
-                        if response.status == 200:
-                            content = await response.text()
-                            feed = feedparser.parse(content)
-                            for entry in feed.entries[:2]:  # 各ソースから最新2件（日本・海外バランス）
-                                # ソース名を日本語で表示
-                                source_name = "NHK" if "nhk" in source else \
-                                            "朝日新聞" if "asahi" in source else \
-                                            "読売新聞" if "yomiuri" in source else \
-                                            "日経新聞" if "nikkei" in source else \
-                                            "NBC" if "nbcnews" in source else \
-                                            "BBC" if "bbci" in source else \
-                                            "CBC" if "cbc" in source else \
-                                            "Reuters" if "reuters" in source else \
-                                            source.split('/')[-1]
-                                
-                                all_news.append({
-                                    "title": entry.title,
-                                    "link": entry.link,
-                                    "published": getattr(entry, 'published', ''),
-                                    "source": source_name
-                                })
-                        else:
-                            print(f"ニュースソース {source} のHTTPステータス: {response.status}")
-                except Exception as e:
-                    print(f"ニュースソース {source} の取得に失敗: {e}")
+        for source in news_sources:
+            try:
+                response = await cappuccino_agent.tool_manager.http_get(
+                    source, ssl=False, timeout=timeout, stale_while_revalidate=NEWS_STALE_SECONDS
+                )
+                if response.status == 200:
+                    content = await response.text()
+                    feed = feedparser.parse(content)
+                    for entry in feed.entries[:2]:  # 各ソースから最新2件（日本・海外バランス）
+                        # ソース名を日本語で表示
+                        source_name = "NHK" if "nhk" in source else \
+                                    "朝日新聞" if "asahi" in source else \
+                                    "読売新聞" if "yomiuri" in source else \
+                                    "日経新聞" if "nikkei" in source else \
+                                    "NBC" if "nbcnews" in source else \
+                                    "BBC" if "bbci" in source else \
+                                    "CBC" if "cbc" in source else \
+                                    "Reuters" if "reuters" in source else \
+                                    source.split('/')[-1]
+                        
+                        all_news.append({
+                            "title": entry.title,
+                            "link": entry.link,
+                            "published": getattr(entry, 'published', ''),
+                            "source": source_name
+                        })
+                else:
+                    print(f"ニュースソース {source} のHTTPステータス: {response.status}")
+            except Exception as e:
+                print(f"ニュースソース {source} の取得に失敗: {e}")
         
         return all_news[:8]  # 最新8件を返す（日本・海外バランス）
     except Exception as e:
@@ -1650,72 +1670,64 @@ async def eew_command(interaction: discord.Interaction):
 # ───────────────── 自動配信機能 ─────────────────
 
 async def auto_news_task():
-    """定期的にニュースを自動配信"""
-    while True:
-        try:
-            if NEWS_CHANNEL_ID:
-                channel = bot.get_channel(NEWS_CHANNEL_ID)
-                if channel:
-                    news_data = await get_news_data()
-                    if news_data and len(news_data) > 0 and "error" not in news_data[0]:
-                        embed = discord.Embed(
-                            title="📰 自動ニュース配信",
-                            color=discord.Color.green(),
-                            timestamp=discord.utils.utcnow()
+    """ニュースを自動配信（スケジューラーから6時間ごとに実行）"""
+    try:
+        if NEWS_CHANNEL_ID:
+            channel = bot.get_channel(NEWS_CHANNEL_ID)
+            if channel:
+                news_data = await get_news_data()
+                if news_data and len(news_data) > 0 and "error" not in news_data[0]:
+                    embed = discord.Embed(
+                        title="📰 自動ニュース配信",
+                        color=discord.Color.green(),
+                        timestamp=discord.utils.utcnow()
+                    )
+                    
+                    for i, news in enumerate(news_data[:3], 1):
+                        title = news["title"][:100] + "..." if len(news["title"]) > 100 else news["title"]
+                        embed.add_field(
+                            name=f"{i}. {title}",
+                            value=f"🔗 [記事を読む]({news['link']})",
+                            inline=False
                         )
-                        
-                        for i, news in enumerate(news_data[:3], 1):
-                            title = news["title"][:100] + "..." if len(news["title"]) > 100 else news["title"]
-                            embed.add_field(
-                                name=f"{i}. {title}",
-                                value=f"🔗 [記事を読む]({news['link']})",
-                                inline=False
-                            )
-                        
-                        await channel.send(embed=embed)
-        except Exception as e:
-            logger.error(f"Auto news task error: {e}")
-        
-        # 6時間ごとに実行
-        await asyncio.sleep(6 * 60 * 60)
+                    
+                    await channel.send(embed=embed)
+    except Exception as e:
+        logger.error(f"Auto news task error: {e}")
 
 async def auto_weather_task():
-    """定期的に天気を自動配信"""
-    while True:
-        try:
-            if WEATHER_CHANNEL_ID:
-                channel = bot.get_channel(WEATHER_CHANNEL_ID)
-                if channel:
-                    weather_data = await get_weather_data("Tokyo")
-                    if "error" not in weather_data:
-                        embed = discord.Embed(
-                            title=f"🌤️ {weather_data['city']}の天気",
-                            color=discord.Color.blue(),
-                            timestamp=discord.utils.utcnow()
-                        )
-                        
-                        embed.add_field(
-                            name="🌡️ 気温",
-                            value=f"{weather_data['temp']}°C",
-                            inline=True
-                        )
-                        embed.add_field(
-                            name="💧 湿度",
-                            value=f"{weather_data['humidity']}%",
-                            inline=True
-                        )
-                        embed.add_field(
-                            name="☁️ 天気",
-                            value=weather_data['description'],
-                            inline=True
-                        )
-                        
-                        await channel.send(embed=embed)
-        except Exception as e:
-            logger.error(f"Auto weather task error: {e}")
-        
-        # 3時間ごとに実行
-        await asyncio.sleep(3 * 60 * 60)
+    """天気を自動配信（スケジューラーから3時間ごとに実行）"""
+    try:
+        if WEATHER_CHANNEL_ID:
+            channel = bot.get_channel(WEATHER_CHANNEL_ID)
+            if channel:
+                weather_data = await get_weather_data("Tokyo")
+                if "error" not in weather_data:
+                    embed = discord.Embed(
+                        title=f"🌤️ {weather_data['city']}の天気",
+                        color=discord.Color.blue(),
+                        timestamp=discord.utils.utcnow()
+                    )
+                    
+                    embed.add_field(
+                        name="🌡️ 気温",
+                        value=f"{weather_data['temp']}°C",
+                        inline=True
+                    )
+                    embed.add_field(
+                        name="💧 湿度",
+                        value=f"{weather_data['humidity']}%",
+                        inline=True
+                    )
+                    embed.add_field(
+                        name="☁️ 天気",
+                        value=weather_data['description'],
+                        inline=True
+                    )
+                    
+                    await channel.send(embed=embed)
+    except Exception as e:
+        logger.error(f"Auto weather task error: {e}")
 
 # ───────────────── 設定コマンド ─────────────────
 
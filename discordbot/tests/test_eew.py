@@ -44,29 +44,23 @@ class DummyDiscord:
     class TextChannel:
         pass
 
-def _make_aiohttp(detail):
+def _make_agent(detail):
     class DummyResponse:
         def __init__(self, data):
             self._data = data
-        async def __aenter__(self):
-            return self
-        async def __aexit__(self, exc_type, exc, tb):
-            pass
         async def json(self, content_type=None):
             return self._data
-    class DummySession:
-        async def __aenter__(self):
-            return self
-        async def __aexit__(self, exc_type, exc, tb):
-            pass
-        def get(self, url, timeout=10):
+    class DummyToolManager:
+        def __init__(self):
+            self.urls = []
+        async def http_get(self, url, timeout=10):
+            self.urls.append(url)
             return DummyResponse(detail)
-    class DummyAiohttp:
-        def ClientSession(self):
-            return DummySession()
-    return DummyAiohttp()
+    class DummyAgent:
+        tool_manager = DummyToolManager()
+    return DummyAgent()
 
-def _load_send_eew(aiohttp_mod, discord_mod):
+def _load_send_eew(agent, discord_mod):
     # Adjust path for repository layout
     with open('discordbot/bot.py', 'r', encoding='utf-8') as f:
         source = f.read()
@@ -79,7 +73,7 @@ def _load_send_eew(aiohttp_mod, discord_mod):
     if func_node is None:
         raise RuntimeError('_send_eew not found')
     namespace = {
-        'aiohttp': aiohttp_mod,
+        'cappuccino_agent': agent,
         'discord': discord_mod,
         'datetime': datetime,
         'EEW_BASE_URL': 'https://example.com/'
@@ -97,17 +91,19 @@ def _make_detail():
     }
 
 def test_send_eew_with_ctt():
-    aiohttp_mod = _make_aiohttp(_make_detail())
-    send_eew = _load_send_eew(aiohttp_mod, DummyDiscord)
+    agent = _make_agent(_make_detail())
+    send_eew = _load_send_eew(agent, DummyDiscord)
     channel = DummyChannel()
     item = {'json': 'x.json', 'ctt': '20240102123456'}
     import asyncio
     asyncio.run(send_eew(channel, item))
     assert channel.sent.fields[0]['value'] == '2024年01月02日(Tue)12:34:56'
+    # The detail is fetched through the agent's shared HTTP client.
+    assert agent.tool_manager.urls == ['https://example.com/x.json']
 
 def test_send_eew_without_ctt():
-    aiohttp_mod = _make_aiohttp(_make_detail())
-    send_eew = _load_send_eew(aiohttp_mod, DummyDiscord)
+    agent = _make_agent(_make_detail())
+    send_eew = _load_send_eew(agent, DummyDiscord)
     channel = DummyChannel()
     item = {'json': 'x.json'}
     import asyncio
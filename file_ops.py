@@ -0,0 +1,193 @@
+"""Bounded-memory file operations used by the ``ToolManager`` file tools.
+
+Every function works on byte ranges or fixed-size blocks so that
+multi-hundred-megabyte logs can be read, searched and edited without
+loading them into memory. They are blocking and meant to be run with
+``asyncio.to_thread``. Text is UTF-8; offsets are byte offsets.
+"""
+
+from __future__ import annotations
+
+import codecs
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def read_range(path: Path, offset: int, length: Optional[int]) -> Dict[str, Any]:
+    """Read up to ``length`` bytes starting at ``offset``.
+
+    A multi-byte character cut off at the end of the range is left for the
+    next read, so ``next_offset`` can be passed back as ``offset`` to page
+    through a file without corrupting text.
+    """
+    size = path.stat().st_size
+    offset = min(max(offset, 0), size)
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        data = handle.read(length if length is not None else -1)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    content = decoder.decode(data)
+    pending = len(decoder.getstate()[0])
+    next_offset = offset + len(data) - pending
+    if next_offset >= size and pending:
+        # Truncated character at end of file: nothing more will arrive.
+        content += decoder.decode(b"", final=True)
+        next_offset = size
+    return {
+        "content": content,
+        "offset": offset,
+        "next_offset": next_offset,
+        "size": size,
+        "eof": next_offset >= size,
+    }
+
+
+def tail(path: Path, lines: int, block_size: int = 64 * 1024) -> Dict[str, Any]:
+    """Return the last ``lines`` lines, reading the file backwards in blocks."""
+    size = path.stat().st_size
+    if lines <= 0 or size == 0:
+        return {"content": "", "offset": size, "size": size}
+    with path.open("rb") as handle:
+        end = size
+        # A trailing newline terminates the last line rather than starting a new one.
+        handle.seek(size - 1)
+        needed = lines + 1 if handle.read(1) == b"\n" else lines
+        data = b""
+        while end > 0 and data.count(b"\n") < needed:
+            start = max(0, end - block_size)
+            handle.seek(start)
+            data = handle.read(end - start) + data
+            end = start
+    cut = end
+    newlines = data.count(b"\n")
+    if newlines >= needed:
+        position = len(data)
+        for _ in range(needed):
+            position = data.rindex(b"\n", 0, position)
+        data = data[position + 1 :]
+        cut = size - len(data)
+    return {"content": data.decode("utf-8", errors="replace"), "offset": cut, "size": size}
+
+
+def search(
+    path: Path,
+    pattern: str,
+    *,
+    regex: bool = False,
+    ignore_case: bool = False,
+    max_matches: int = 100,
+) -> Dict[str, Any]:
+    """Find lines containing ``pattern`` using a memory map of the file.
+
+    Returns one entry per matching line with its 1-based line number and
+    byte offset. The page cache backs the mapping, so the file is never
+    copied into the process.
+    """
+    matches: List[Dict[str, Any]] = []
+    size = path.stat().st_size
+    if size == 0 or not pattern:
+        return {"matches": matches, "truncated": False}
+    needle = pattern.encode("utf-8")
+    if regex or ignore_case:
+        flags = re.IGNORECASE if ignore_case else 0
+        compiled = re.compile(needle if regex else re.escape(needle), flags | re.MULTILINE)
+    else:
+        compiled = None
+
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        line = 1
+        counted = 0  # ``line`` is the line number of byte ``counted``
+        position = 0
+        truncated = False
+        while position <= size:
+            if compiled is None:
+                start = mm.find(needle, position)
+                if start == -1:
+                    break
+            else:
+                found = compiled.search(mm, position)
+                if found is None:
+                    break
+                start = found.start()
+            line += _count_newlines(mm, counted, start)
+            counted = start
+            line_start = mm.rfind(b"\n", 0, start) + 1
+            line_end = mm.find(b"\n", start)
+            if line_end == -1:
+                line_end = size
+            if len(matches) >= max_matches:
+                truncated = True
+                break
+            matches.append(
+                {
+                    "line": line,
+                    "offset": line_start,
+                    "text": mm[line_start:line_end].decode("utf-8", errors="replace").rstrip("\r"),
+                }
+            )
+            # Report each line once, however many times it matches.
+            position = line_end + 1
+    return {"matches": matches, "truncated": truncated}
+
+
+def _count_newlines(mm: mmap.mmap, start: int, end: int) -> int:
+    count = 0
+    while start < end:
+        stop = min(end, start + BLOCK_SIZE)
+        count += mm[start:stop].count(b"\n")
+        start = stop
+    return count
+
+
+def replace(path: Path, target: str, replacement: str, block_size: int = BLOCK_SIZE) -> int:
+    """Replace every ``target`` with ``replacement`` and return the count.
+
+    The result is streamed into a temporary file in the same directory and
+    renamed over ``path`` only when complete, so readers see either the old
+    or the new file and a crash never leaves it half written. UTF-8 is
+    self-synchronising, so replacing the encoded bytes is equivalent to
+    replacing the text.
+    """
+    old = target.encode("utf-8")
+    new = replacement.encode("utf-8")
+    overlap = len(old) - 1
+    count = 0
+    fd, temp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with path.open("rb") as source, os.fdopen(fd, "wb") as out:
+            carry = b""
+            while True:
+                block = source.read(block_size)
+                buffer = carry + block
+                position = 0
+                while True:
+                    found = buffer.find(old, position)
+                    if found == -1:
+                        break
+                    out.write(buffer[position:found])
+                    out.write(new)
+                    position = found + len(old)
+                    count += 1
+                if not block:
+                    out.write(buffer[position:])
+                    break
+                # Keep a tail that could be the start of a match split across blocks.
+                keep = max(position, len(buffer) - overlap)
+                out.write(buffer[position:keep])
+                carry = buffer[keep:]
+            out.flush()
+            os.fsync(out.fileno())
+        if count:
+            shutil.copymode(path, temp_name)
+            os.replace(temp_name, path)
+    finally:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+    return count
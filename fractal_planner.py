@@ -1,30 +1,200 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
 
 from config import settings
 from planner import Planner as BasicPlanner
 
 
+def normalize_action(action: str) -> str:
+    """Canonical form of an action used as the decomposition cache key."""
+    return re.sub(r"\s+", " ", action).strip().lower()
+
+
+class PlanNode:
+    """One step of a :class:`PlanTree` whose substeps are expanded on demand."""
+
+    __slots__ = ("step", "action", "depth", "truncated", "_tree", "_substeps", "_data")
+
+    def __init__(self, tree: "PlanTree", data: Dict[str, Any], depth: int) -> None:
+        self._tree = tree
+        self._data = data
+        self.step = data.get("step")
+        self.action = data["action"]
+        self.depth = depth
+        # Set when a budget stopped this node from being expanded.
+        self.truncated = False
+        self._substeps: Optional[List["PlanNode"]] = None
+
+    @property
+    def expanded(self) -> bool:
+        return self._substeps is not None
+
+    @property
+    def substeps(self) -> List["PlanNode"]:
+        """Child steps, decomposed the first time they are requested."""
+        if self._substeps is None:
+            self._substeps = self._tree._expand(self)
+        return self._substeps
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-dict form including only the subtrees expanded so far."""
+        data = dict(self._data)
+        if self._substeps:
+            data["substeps"] = [child.to_dict() for child in self._substeps]
+        if self.truncated:
+            data["truncated"] = True
+        return data
+
+
+class PlanTree:
+    """Lazily expanded plan shared by one :meth:`FractalPlanner.plan_tree` call.
+
+    ``nodes`` counts the steps created so far and ``expansion_time`` the
+    seconds spent decomposing; once either reaches the planner's budget the
+    remaining nodes stay leaves and are flagged as ``truncated``. The root's
+    own steps are always decomposed, so a plan is never empty.
+    """
+
+    def __init__(self, planner: "FractalPlanner", context: str) -> None:
+        self.planner = planner
+        self.nodes = 0
+        self.expansion_time = 0.0
+        self.steps = self._children(context, depth=1, bounded=False) or []
+
+    def _children(self, action: str, depth: int, bounded: bool = True) -> Optional[List[PlanNode]]:
+        """Decompose ``action`` into nodes, or ``None`` if over budget."""
+        planner = self.planner
+        if bounded and planner.time_budget is not None and self.expansion_time >= planner.time_budget:
+            return None
+        started = time.perf_counter()
+        try:
+            steps = planner.decompose(action)
+        finally:
+            self.expansion_time += time.perf_counter() - started
+        if bounded and planner.max_nodes is not None and self.nodes + len(steps) > planner.max_nodes:
+            return None
+        self.nodes += len(steps)
+        return [PlanNode(self, step, depth) for step in steps]
+
+    def _expand(self, node: PlanNode) -> List[PlanNode]:
+        if node.depth >= self.planner.depth:
+            return []
+        children = self._children(node.action, node.depth + 1)
+        if children is None:
+            node.truncated = True
+            return []
+        return children
+
+    def walk(self) -> Iterator[PlanNode]:
+        """Yield the leaf steps in execution order, expanding as they are reached."""
+        stack = list(reversed(self.steps))
+        while stack:
+            node = stack.pop()
+            children = node.substeps
+            if children:
+                stack.extend(reversed(children))
+            else:
+                yield node
+
+    async def feed(
+        self,
+        plan_queue: "asyncio.Queue",
+        on_step: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Put the leaf steps on ``plan_queue`` as :meth:`walk` reaches them.
+
+        Meant to run alongside :meth:`agents.ExecutorAgent.execute`: control
+        returns to the event loop after every leaf, so the first steps start
+        executing while later subtrees are still undecomposed. ``on_step`` is
+        awaited with each step before it is queued. Ends the queue with
+        ``None`` and returns the steps that were put on it.
+        """
+        steps: List[Dict[str, Any]] = []
+        try:
+            for index, leaf in enumerate(self.walk(), start=1):
+                step: Dict[str, Any] = {"step": index, "action": leaf.action}
+                if leaf.truncated:
+                    step["truncated"] = True
+                steps.append(step)
+                if on_step is not None:
+                    await on_step(step)
+                await plan_queue.put(step)
+                await asyncio.sleep(0)
+        finally:
+            await plan_queue.put(None)
+        return steps
+
+    def expand_all(self) -> None:
+        """Expand breadth-first until the depth limit or a budget is reached.
+
+        Breadth-first order means a budget cut leaves a balanced tree rather
+        than one fully expanded branch.
+        """
+        queue = deque(self.steps)
+        while queue:
+            queue.extend(queue.popleft().substeps)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [node.to_dict() for node in self.steps]
+
+
 class FractalPlanner:
-    """Recursive planner breaking tasks into hierarchical substeps."""
+    """Recursive planner breaking tasks into hierarchical substeps.
+
+    Decompositions are memoized per normalized action, so repeated sibling
+    actions cost one ``base_planner`` call. Each plan is capped by
+    ``max_nodes`` steps and ``time_budget`` seconds of expansion, which keeps
+    deep ``FRACTAL_DEPTH``/``FRACTAL_BREADTH`` settings bounded.
+    """
 
     def __init__(
         self,
         depth: int | None = None,
         breadth: int | None = None,
         base_planner: Optional[BasicPlanner] = None,
+        *,
+        max_nodes: int | None = None,
+        time_budget: float | None = None,
+        cache_size: int = 1024,
     ) -> None:
         self.depth = depth if depth is not None else settings.fractal_depth
         self.breadth = breadth if breadth is not None else settings.fractal_breadth
         self.base_planner = base_planner or BasicPlanner()
+        self.max_nodes = max_nodes if max_nodes is not None else settings.fractal_max_nodes
+        self.time_budget = time_budget if time_budget is not None else settings.fractal_time_budget
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-    def _search(self, context: str, depth: int) -> List[Dict[str, Any]]:
-        steps = self.base_planner.create_plan(context)[: self.breadth]
-        if depth <= 1:
-            return steps
-        for step in steps:
-            step["substeps"] = self._search(step["action"], depth - 1)
-        return steps
+    def decompose(self, action: str) -> List[Dict[str, Any]]:
+        """Return up to ``breadth`` substeps of ``action`` (memoized)."""
+        key = normalize_action(action)
+        steps = self._cache.get(key)
+        if steps is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+        else:
+            self.cache_misses += 1
+            steps = self.base_planner.create_plan(action)[: self.breadth]
+            self._cache[key] = steps
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [dict(step) for step in steps]
+
+    def plan_tree(self, context: str) -> PlanTree:
+        """Return a plan whose substeps are expanded only when visited."""
+        return PlanTree(self, context)
 
     def create_plan(self, context: str) -> List[Dict[str, Any]]:
-        """Generate a hierarchical plan using recursive expansion."""
-        return self._search(context, self.depth)
+        """Generate a hierarchical plan, expanded up to ``depth`` within budget.
+
+        This expands the whole tree up front; use :meth:`plan_tree` with
+        :meth:`PlanTree.feed` to expand only as execution proceeds.
+        """
+        tree = self.plan_tree(context)
+        tree.expand_all()
+        return tree.to_list()
@@ -0,0 +1,301 @@
+"""Normalized SQLite storage for :class:`KnowledgeGraph`.
+
+Nodes and edges live in the ``kg_nodes`` and ``kg_edges`` tables, one row
+each, so a mutation touches only the rows it changes instead of rewriting a
+serialized copy of the whole graph. ``ToolManager`` and ``StateManager``
+both persist graphs through this module; the change records they apply are
+the ones produced by :meth:`KnowledgeGraph.drain_changes`.
+
+:class:`SQLGraph` answers the :class:`KnowledgeGraph` queries straight from
+the indexed tables, so large graphs never have to be loaded into memory.
+
+Attribute dictionaries are stored as JSON and merged on upsert with SQLite's
+``json_patch``, matching how NetworkX updates attributes of an existing node
+or edge.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import (
+    Any,
+    AsyncContextManager,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+import aiosqlite
+
+from knowledge_graph import (
+    BaseKnowledgeGraph,
+    Change,
+    Edge,
+    KnowledgeGraph,
+    Predicates,
+    build_path,
+    check_direction,
+    normalize_predicates,
+)
+
+# Keep ``IN (...)`` lists well below SQLite's bound-parameter limit.
+_IN_CHUNK = 500
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS kg_nodes (
+        name TEXT PRIMARY KEY,
+        attrs TEXT NOT NULL DEFAULT '{}'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS kg_edges (
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        relation TEXT NOT NULL,
+        attrs TEXT NOT NULL DEFAULT '{}',
+        PRIMARY KEY (source, target, relation)
+    )
+    """,
+    # The primary key serves lookups by source; these cover the other
+    # directions and relation-type filters.
+    "CREATE INDEX IF NOT EXISTS idx_kg_edges_source_relation ON kg_edges(source, relation, target)",
+    "CREATE INDEX IF NOT EXISTS idx_kg_edges_target_relation ON kg_edges(target, relation, source)",
+    "CREATE INDEX IF NOT EXISTS idx_kg_edges_relation ON kg_edges(relation)",
+)
+
+_UPSERT_NODE = (
+    "INSERT INTO kg_nodes(name, attrs) VALUES(?, ?) "
+    "ON CONFLICT(name) DO UPDATE SET attrs=json_patch(kg_nodes.attrs, excluded.attrs)"
+)
+# Edges create missing endpoints, as ``MultiDiGraph.add_edge`` does.
+_ENSURE_NODE = "INSERT OR IGNORE INTO kg_nodes(name, attrs) VALUES(?, '{}')"
+_UPSERT_EDGE = (
+    "INSERT INTO kg_edges(source, target, relation, attrs) VALUES(?, ?, ?, ?) "
+    "ON CONFLICT(source, target, relation) "
+    "DO UPDATE SET attrs=json_patch(kg_edges.attrs, excluded.attrs)"
+)
+_DELETE_EDGE = "DELETE FROM kg_edges WHERE source=? AND target=? AND relation=?"
+
+
+async def create_schema(conn: aiosqlite.Connection) -> None:
+    """Create the graph tables and import a legacy ``knowledge_graph`` blob."""
+    for statement in SCHEMA:
+        await conn.execute(statement)
+    await _migrate_blob(conn)
+
+
+async def _migrate_blob(conn: aiosqlite.Connection) -> None:
+    async with conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='knowledge_graph'"
+    ) as cur:
+        if await cur.fetchone() is None:
+            return
+    async with conn.execute("SELECT data FROM knowledge_graph WHERE id=1") as cur:
+        row = await cur.fetchone()
+    if row and row[0]:
+        async with conn.execute("SELECT 1 FROM kg_nodes LIMIT 1") as cur:
+            empty = await cur.fetchone() is None
+        if empty:
+            await apply_changes(conn, KnowledgeGraph.from_json(row[0]).snapshot())
+    await conn.execute("DROP TABLE knowledge_graph")
+
+
+def _attrs(attrs: Any) -> str:
+    return json.dumps(attrs or {})
+
+
+async def apply_changes(conn: aiosqlite.Connection, changes: Sequence[Change]) -> None:
+    """Write ``changes`` in order; runs of the same kind use ``executemany``.
+
+    The caller owns the transaction and commits.
+    """
+    index = 0
+    while index < len(changes):
+        kind = changes[index][0]
+        end = index
+        while end < len(changes) and changes[end][0] == kind:
+            end += 1
+        run = changes[index:end]
+        if kind == "node":
+            await conn.executemany(_UPSERT_NODE, [(c[1], _attrs(c[2])) for c in run])
+        elif kind == "edge":
+            await conn.executemany(
+                _ENSURE_NODE, [(name,) for c in run for name in (c[1], c[2])]
+            )
+            await conn.executemany(_UPSERT_EDGE, [(c[1], c[2], c[3], _attrs(c[4])) for c in run])
+        elif kind == "remove_edge":
+            await conn.executemany(_DELETE_EDGE, [c[1:4] for c in run])
+        elif kind == "remove_node":
+            names = [(c[1],) for c in run]
+            await conn.executemany("DELETE FROM kg_edges WHERE source=? OR target=?", [n * 2 for n in names])
+            await conn.executemany("DELETE FROM kg_nodes WHERE name=?", names)
+        elif kind == "clear":
+            await conn.execute("DELETE FROM kg_edges")
+            await conn.execute("DELETE FROM kg_nodes")
+        else:  # pragma: no cover - programming error
+            raise ValueError(f"unknown graph change {kind!r}")
+        index = end
+
+
+async def load(
+    conn: aiosqlite.Connection, graph_class: Type[BaseKnowledgeGraph] = KnowledgeGraph
+) -> BaseKnowledgeGraph:
+    """Rebuild a graph of ``graph_class`` from the tables."""
+    async with conn.execute("SELECT name, attrs FROM kg_nodes") as cur:
+        nodes = [(name, json.loads(attrs)) for name, attrs in await cur.fetchall()]
+    async with conn.execute("SELECT source, target, relation, attrs FROM kg_edges") as cur:
+        edges = [
+            (source, target, relation, json.loads(attrs))
+            for source, target, relation, attrs in await cur.fetchall()
+        ]
+    graph = graph_class.from_rows(nodes, edges)
+    graph.mark_persisted()
+    return graph
+
+
+def _json_path(key: str) -> str:
+    return '$."' + key.replace('"', '\\"') + '"'
+
+
+class SQLGraph:
+    """Database-backed version of the :class:`KnowledgeGraph` query methods.
+
+    ``reader`` returns an async context manager yielding a connection, such
+    as ``SQLitePool.reader``. Results match the in-memory methods exactly.
+    """
+
+    def __init__(self, reader: Callable[[], AsyncContextManager[aiosqlite.Connection]]) -> None:
+        self._reader = reader
+
+    async def _fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        async with self._reader() as conn:
+            async with conn.execute(sql, tuple(params)) as cur:
+                return list(await cur.fetchall())
+
+    async def edge_count(self) -> int:
+        rows = await self._fetchall("SELECT COUNT(*) FROM kg_edges")
+        return rows[0][0]
+
+    async def relations(
+        self, entity: str, relation: Optional[str] = None, direction: str = "out"
+    ) -> List[Edge]:
+        check_direction(direction)
+        filter_sql = " AND relation = ?" if relation is not None else ""
+        extra = [relation] if relation is not None else []
+        edges = set()
+        if direction in ("out", "both"):
+            edges.update(
+                await self._fetchall(
+                    f"SELECT source, relation, target FROM kg_edges WHERE source = ?{filter_sql}",
+                    [entity, *extra],
+                )
+            )
+        if direction in ("in", "both"):
+            edges.update(
+                await self._fetchall(
+                    f"SELECT source, relation, target FROM kg_edges WHERE target = ?{filter_sql}",
+                    [entity, *extra],
+                )
+            )
+        return sorted(edges)
+
+    async def neighbourhood(
+        self,
+        entity: str,
+        hops: int = 1,
+        relation: Optional[str] = None,
+        direction: str = "out",
+    ) -> Dict[str, int]:
+        """k-hop neighbourhood computed with a recursive CTE."""
+        check_direction(direction)
+        filter_sql = " AND e.relation = ?" if relation is not None else ""
+        steps = []
+        params: List[Any] = [entity]
+        if direction in ("out", "both"):
+            steps.append(
+                "SELECT e.target, r.depth + 1 FROM reach r JOIN kg_edges e ON e.source = r.name "
+                f"WHERE r.depth < ?{filter_sql}"
+            )
+            params += [hops] + ([relation] if relation is not None else [])
+        if direction in ("in", "both"):
+            steps.append(
+                "SELECT e.source, r.depth + 1 FROM reach r JOIN kg_edges e ON e.target = r.name "
+                f"WHERE r.depth < ?{filter_sql}"
+            )
+            params += [hops] + ([relation] if relation is not None else [])
+        sql = (
+            "WITH RECURSIVE reach(name, depth) AS (SELECT ?, 0 UNION "
+            + " UNION ".join(steps)
+            + ") SELECT name, MIN(depth) FROM reach WHERE name != ? GROUP BY name"
+        )
+        rows = await self._fetchall(sql, [*params, entity])
+        return dict(rows)
+
+    async def _expand(
+        self, frontier: List[str], relation: Optional[str], direction: str
+    ) -> List[Tuple[str, str]]:
+        """``(node, neighbour)`` pairs for every node in ``frontier``."""
+        filter_sql = " AND relation = ?" if relation is not None else ""
+        extra = [relation] if relation is not None else []
+        pairs: List[Tuple[str, str]] = []
+        for start in range(0, len(frontier), _IN_CHUNK):
+            chunk = frontier[start : start + _IN_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            if direction in ("out", "both"):
+                pairs += await self._fetchall(
+                    f"SELECT source, target FROM kg_edges WHERE source IN ({marks}){filter_sql}",
+                    [*chunk, *extra],
+                )
+            if direction in ("in", "both"):
+                pairs += await self._fetchall(
+                    f"SELECT target, source FROM kg_edges WHERE target IN ({marks}){filter_sql}",
+                    [*chunk, *extra],
+                )
+        return pairs
+
+    async def _has_node(self, name: str) -> bool:
+        return bool(await self._fetchall("SELECT 1 FROM kg_nodes WHERE name = ?", [name]))
+
+    async def shortest_path(
+        self,
+        source: str,
+        target: str,
+        relation: Optional[str] = None,
+        direction: str = "out",
+        max_hops: Optional[int] = None,
+    ) -> Optional[List[str]]:
+        """Breadth-first search issuing one indexed query per level."""
+        check_direction(direction)
+        if not (await self._has_node(source) and await self._has_node(target)):
+            return None
+        parents: Dict[str, Optional[str]] = {source: None}
+        frontier = [source]
+        depth = 0
+        while frontier and target not in parents and (max_hops is None or depth < max_hops):
+            reached: Dict[str, str] = {}
+            for node, other in await self._expand(frontier, relation, direction):
+                if other not in parents and (other not in reached or node < reached[other]):
+                    reached[other] = node
+            parents.update(reached)
+            frontier = sorted(reached)
+            depth += 1
+        return build_path(parents, target)
+
+    async def find_entities(self, where: Optional[Predicates] = None) -> List[str]:
+        predicates = normalize_predicates(where)
+        clauses = []
+        params: List[Any] = []
+        for key, op, value in predicates:
+            clauses.append(f"json_extract(attrs, ?) {op} ?")
+            params += [_json_path(key), value]
+        sql = "SELECT name FROM kg_nodes"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = await self._fetchall(sql + " ORDER BY name", params)
+        return [row[0] for row in rows]
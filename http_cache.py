@@ -0,0 +1,493 @@
+"""Validating HTTP cache for GET requests made through ``ToolManager``.
+
+Bodies and validators are stored in the ``http_cache`` table of the tool
+database. Freshness follows ``Cache-Control`` (``max-age``, ``no-cache``,
+``no-store``, ``stale-while-revalidate``) and ``Expires``. Once an entry is
+stale the next request is conditional (``If-None-Match`` /
+``If-Modified-Since``), so an unchanged resource costs a 304 instead of a
+full download. Within the stale-while-revalidate window the stale body is
+returned immediately and refreshed in the background.
+
+Entries are keyed by URL, query parameters and the explicit request headers,
+so variants a server selects by header (``Vary``) are stored apart;
+``Vary: *`` responses are not stored. :meth:`HTTPCache.stream` serves the
+same entries to callers that read the body incrementally.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Union
+
+import aiohttp
+from yarl import URL
+
+from sqlite_pool import SQLitePool
+
+LOGGER = logging.getLogger(__name__)
+
+# Response headers worth keeping with a cached body.
+_STORED_HEADERS = (
+    "Content-Type",
+    "Cache-Control",
+    "ETag",
+    "Last-Modified",
+    "Expires",
+    "Date",
+    "Vary",
+)
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a ``Cache-Control`` header into ``{directive: argument}``."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class CachedResponse:
+    """A fully read response with the reading API of ``aiohttp.ClientResponse``."""
+
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    from_cache: bool = False
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return self.body.decode(encoding or "utf-8", errors="replace")
+
+    async def json(self, content_type: Optional[str] = None) -> Any:
+        return json.loads(self.body.decode("utf-8")) if self.body else None
+
+    @property
+    def charset(self) -> Optional[str]:
+        for part in self.headers.get("Content-Type", "").split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip('"')
+        return None
+
+    @property
+    def content(self) -> "_BodyReader":
+        return _BodyReader(self.body)
+
+
+class _BodyReader:
+    """``iter_chunked`` over a body already in memory."""
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._body), size):
+            yield self._body[start : start + size]
+
+
+class _RecordingResponse:
+    """A live response that keeps the body chunks its reader consumed."""
+
+    def __init__(self, url: str, response: Any) -> None:
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+        self.charset = getattr(response, "charset", None)
+        self.from_cache = False
+        self.complete = False
+        self._response = response
+        self._chunks: List[bytes] = []
+
+    @property
+    def content(self) -> "_RecordingResponse":
+        return self
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        async for chunk in self._response.content.iter_chunked(size):
+            self._chunks.append(chunk)
+            yield chunk
+        self.complete = True
+
+    async def read(self) -> bytes:
+        """Read the rest of the body and return all of it."""
+        if not self.complete:
+            self._chunks.append(await self._response.content.read())
+            self.complete = True
+        return b"".join(self._chunks)
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return (await self.read()).decode(encoding or self.charset or "utf-8", errors="replace")
+
+    def cached(self) -> CachedResponse:
+        return CachedResponse(
+            self.url, self.status, HTTPCache._kept_headers(self.headers), b"".join(self._chunks)
+        )
+
+
+@dataclass
+class _Entry:
+    response: CachedResponse
+    stored_at: float
+    max_age: float
+    stale_while_revalidate: float
+    no_cache: bool
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+
+class HTTPCache:
+    """Read-through GET cache persisted in SQLite.
+
+    ``pool`` and ``session`` are coroutine functions returning the database
+    pool and the shared client session, so the cache never owns either.
+    """
+
+    def __init__(
+        self,
+        pool: Callable[[], Awaitable[SQLitePool]],
+        session: Callable[[], Awaitable[aiohttp.ClientSession]],
+        *,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._pool = pool
+        self._session = session
+        self._clock = clock
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @staticmethod
+    def target(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        """The request URL with ``params`` applied."""
+        target = URL(url)
+        if params:
+            target = target.update_query({k: str(v) for k, v in params.items() if v is not None})
+        return str(target)
+
+    @classmethod
+    def key(
+        cls,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, Any]] = None,
+    ) -> str:
+        """Storage key: the request URL followed by its explicit headers, if any."""
+        target = cls.target(url, params)
+        if not headers:
+            return target
+        canonical = sorted((str(name).lower(), str(value)) for name, value in headers.items())
+        # A URL never contains a raw space, so the key splits unambiguously.
+        return f"{target} {json.dumps(canonical)}"
+
+    @staticmethod
+    def create_schema_sql() -> str:
+        return """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                max_age REAL,
+                stale_while_revalidate REAL,
+                no_cache INTEGER DEFAULT 0
+            )
+        """
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    async def get(
+        self,
+        url: str,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        stale_while_revalidate: Optional[float] = None,
+        **request_kwargs: Any,
+    ) -> CachedResponse:
+        """Return the response for ``url``, from cache when allowed.
+
+        ``stale_while_revalidate`` widens the server's window for serving a
+        stale body while it is refreshed in the background. Other keyword
+        arguments (``timeout``, ``ssl``, ``headers``) go to ``session.get``.
+        """
+        target = self.target(url, params)
+        key = self.key(url, params, request_kwargs.get("headers"))
+        entry = await self._load(key)
+        cached = self._cached(target, key, entry, request_kwargs, stale_while_revalidate)
+        if cached is not None:
+            return cached
+        self.misses += 1
+        return await self._fetch(target, key, entry, request_kwargs)
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        url: str,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        stale_while_revalidate: Optional[float] = None,
+        **request_kwargs: Any,
+    ) -> AsyncIterator[Union[CachedResponse, _RecordingResponse]]:
+        """Like :meth:`get`, but yield a response whose body can be streamed.
+
+        Cached bodies are served from the entry. A downloaded body is recorded
+        as the caller reads ``content.iter_chunked`` and stored once complete;
+        if the caller stops early and the response is cacheable, the rest is
+        read in the background before it is stored.
+        """
+        target = self.target(url, params)
+        key = self.key(url, params, request_kwargs.get("headers"))
+        entry = await self._load(key)
+        cached = self._cached(target, key, entry, request_kwargs, stale_while_revalidate)
+        if cached is not None:
+            yield cached
+            return
+        self.misses += 1
+        request = await self._request(target, entry, request_kwargs)
+        resp = await request.__aenter__()
+        handed_off = False
+        try:
+            if resp.status == 304 and entry is not None:
+                yield await self._revalidated(key, entry, resp)
+                return
+            recorder = _RecordingResponse(target, resp)
+            yield recorder
+            if recorder.status != 200:
+                return
+            if recorder.complete:
+                await self._store(key, recorder.cached())
+            elif key not in self._refreshing and self._freshness(recorder.headers, self._clock()):
+                self._finish_in_background(key, request, recorder)
+                handed_off = True
+        finally:
+            if not handed_off:
+                await request.__aexit__(None, None, None)
+
+    async def close(self) -> None:
+        tasks = list(self._refreshing.values())
+        self._refreshing.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _cached(
+        self,
+        target: str,
+        key: str,
+        entry: Optional[_Entry],
+        request_kwargs: Dict[str, Any],
+        stale_while_revalidate: Optional[float],
+    ) -> Optional[CachedResponse]:
+        """The stored response if it may be served without a request."""
+        if entry is None or entry.no_cache:
+            return None
+        age = entry.age(self._clock())
+        if age < entry.max_age:
+            self.hits += 1
+            return entry.response
+        window = max(entry.stale_while_revalidate, stale_while_revalidate or 0.0)
+        if age < entry.max_age + window:
+            self.hits += 1
+            self._refresh_in_background(target, key, entry, request_kwargs)
+            return entry.response
+        return None
+
+    # ------------------------------------------------------------------
+    # Network
+    # ------------------------------------------------------------------
+    def _background(self, key: str, work: Callable[[], Awaitable[None]]) -> None:
+        async def run() -> None:
+            try:
+                await work()
+            except Exception as exc:  # pragma: no cover - network failures
+                LOGGER.warning("Background refresh of %s failed: %s", key, exc)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(run())
+
+    def _refresh_in_background(
+        self, target: str, key: str, entry: _Entry, request_kwargs: Dict[str, Any]
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            await self._fetch(target, key, entry, request_kwargs)
+
+        self._background(key, refresh)
+
+    def _finish_in_background(self, key: str, request: Any, recorder: _RecordingResponse) -> None:
+        async def finish() -> None:
+            try:
+                await recorder.read()
+                await self._store(key, recorder.cached())
+            finally:
+                await request.__aexit__(None, None, None)
+
+        self._background(key, finish)
+
+    async def _request(
+        self, target: str, entry: Optional[_Entry], request_kwargs: Dict[str, Any]
+    ) -> Any:
+        """Return the (conditional, when ``entry`` has validators) GET context."""
+        request_kwargs = dict(request_kwargs)
+        headers = dict(request_kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        session = await self._session()
+        return session.get(target, headers=headers, **request_kwargs)
+
+    async def _revalidated(self, key: str, entry: _Entry, resp: Any) -> CachedResponse:
+        self.revalidated += 1
+        merged = {**entry.response.headers, **self._kept_headers(resp.headers)}
+        response = CachedResponse(
+            entry.response.url, entry.response.status, merged, entry.response.body, True
+        )
+        await self._store(key, response)
+        return response
+
+    async def _fetch(
+        self, target: str, key: str, entry: Optional[_Entry], request_kwargs: Dict[str, Any]
+    ) -> CachedResponse:
+        async with await self._request(target, entry, request_kwargs) as resp:
+            if resp.status == 304 and entry is not None:
+                return await self._revalidated(key, entry, resp)
+            body = await resp.read()
+            response = CachedResponse(target, resp.status, self._kept_headers(resp.headers), body)
+        if response.status == 200:
+            await self._store(key, response)
+        return response
+
+    @staticmethod
+    def _kept_headers(headers: Mapping[str, str]) -> Dict[str, str]:
+        return {name: headers[name] for name in _STORED_HEADERS if name in headers}
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _freshness(self, headers: Mapping[str, str], now: float) -> Optional[Dict[str, Any]]:
+        """Return freshness fields for storage, or ``None`` if not storable."""
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+            return None
+        max_age = _seconds(directives.get("max-age"))
+        if max_age is None:
+            expires = _http_date(headers.get("Expires"))
+            if expires is not None:
+                date = _http_date(headers.get("Date")) or now
+                max_age = max(expires - date, 0.0)
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if max_age is None and not (etag or last_modified):
+            # Neither fresh for any time nor revalidatable.
+            return None
+        return {
+            "max_age": max_age or 0.0,
+            "stale_while_revalidate": _seconds(directives.get("stale-while-revalidate")) or 0.0,
+            "no_cache": "no-cache" in directives,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+
+    async def _store(self, key: str, response: CachedResponse) -> None:
+        now = self._clock()
+        fresh = self._freshness(response.headers, now)
+        pool = await self._pool()
+        async with pool.writer() as conn:
+            if fresh is None:
+                await conn.execute("DELETE FROM http_cache WHERE url = ?", (key,))
+            else:
+                await conn.execute(
+                    "INSERT OR REPLACE INTO http_cache(url, status, headers, body, etag, last_modified, "
+                    "stored_at, max_age, stale_while_revalidate, no_cache) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        response.status,
+                        json.dumps(response.headers),
+                        response.body,
+                        fresh["etag"],
+                        fresh["last_modified"],
+                        now,
+                        fresh["max_age"],
+                        fresh["stale_while_revalidate"],
+                        int(fresh["no_cache"]),
+                    ),
+                )
+            await conn.commit()
+
+    async def _load(self, key: str) -> Optional[_Entry]:
+        pool = await self._pool()
+        async with pool.reader() as conn:
+            async with conn.execute(
+                "SELECT status, headers, body, etag, last_modified, stored_at, max_age, "
+                "stale_while_revalidate, no_cache FROM http_cache WHERE url = ?",
+                (key,),
+            ) as cursor:
+                row = await cursor.fetchone()
+        if row is None:
+            return None
+        status, headers, body, etag, last_modified, stored_at, max_age, swr, no_cache = row
+        return _Entry(
+            response=CachedResponse(
+                key.partition(" ")[0], status, json.loads(headers or "{}"), bytes(body or b""), True
+            ),
+            stored_at=stored_at,
+            max_age=max_age or 0.0,
+            stale_while_revalidate=swr or 0.0,
+            no_cache=bool(no_cache),
+            etag=etag,
+            last_modified=last_modified,
+        )
+
+    async def prune(self, max_rows: int) -> int:
+        """Keep only the ``max_rows`` most recently stored responses."""
+        pool = await self._pool()
+        async with pool.writer() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM http_cache WHERE url NOT IN "
+                "(SELECT url FROM http_cache ORDER BY stored_at DESC LIMIT ?)",
+                (max_rows,),
+            )
+            removed = max(cursor.rowcount, 0)
+            await cursor.close()
+            await conn.commit()
+        return removed
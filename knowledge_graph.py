@@ -1,37 +1,377 @@
 import json
-from typing import Any, List, Tuple
+import operator
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 
 import networkx as nx
 from networkx.readwrite import json_graph
 
+# A recorded mutation: ("node", name, attrs), ("edge", source, target,
+# relation, attrs), ("remove_edge", source, target, relation),
+# ("remove_node", name) or ("clear",).
+Change = Tuple[Any, ...]
 
-class KnowledgeGraph:
-    """Simple wrapper around a MultiDiGraph for entity relations."""
+# An edge as returned by the query methods: (source, relation, target).
+Edge = Tuple[str, str, str]
+
+DIRECTIONS = ("out", "in", "both")
+
+PREDICATE_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+Predicates = Union[Mapping[str, Any], Iterable[Tuple[str, str, Any]]]
+
+
+def normalize_predicates(where: Optional[Predicates]) -> List[Tuple[str, str, Any]]:
+    """Turn ``{"key": value}`` or ``[(key, op, value), ...]`` into triples."""
+    if not where:
+        return []
+    triples = [(key, "=", value) for key, value in where.items()] if isinstance(where, Mapping) else list(where)
+    for _, op, _ in triples:
+        if op not in PREDICATE_OPS:
+            raise ValueError(f"unsupported operator {op!r}")
+    return triples
+
+
+def check_direction(direction: str) -> None:
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, not {direction!r}")
+
+
+class BaseKnowledgeGraph:
+    """Entity/relation graph API shared by the storage backends.
+
+    Subclasses implement a handful of storage primitives (``_add_node``,
+    ``_add_edge``, ``_remove_node``, ``_remove_edge``, ``_clear`` and the
+    read accessors ``has_entity``, ``entity_attrs``, ``entities``,
+    ``relation_rows``, ``out_edges`` and ``in_edges``). Everything else,
+    including change recording for :mod:`graph_store` and the query engine,
+    is written against those primitives so every backend behaves the same.
+    Relations are keyed by ``(source, target, relation)``; adding an
+    existing one merges its attributes.
+    """
 
     def __init__(self) -> None:
-        self.graph = nx.MultiDiGraph()
+        self._changes: List[Change] = []
+        # False until the graph has been loaded from or fully written to a
+        # store; until then only a full snapshot describes it.
+        self.persisted = False
+
+    # ------------------------------------------------------------------
+    # Storage primitives
+    # ------------------------------------------------------------------
+    def _add_node(self, name: str, attrs: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _add_edge(self, source: str, target: str, relation: str, attrs: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _remove_node(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def _remove_edge(self, source: str, target: str, relation: str) -> bool:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+    def has_entity(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def entity_attrs(self, name: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def entities(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """``(name, attrs)`` for every entity."""
+        raise NotImplementedError
 
+    def relation_rows(self) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+        """``(source, target, relation, attrs)`` for every relation."""
+        raise NotImplementedError
+
+    def out_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        """``(target, relation)`` for relations leaving ``name``."""
+        raise NotImplementedError
+
+    def in_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        """``(source, relation)`` for relations entering ``name``."""
+        raise NotImplementedError
+
+    # ------------------------------------------------------------------
+    # Mutation API
+    # ------------------------------------------------------------------
     def add_entity(self, name: str, **attrs: Any) -> None:
         """Add a node representing an entity."""
-        self.graph.add_node(name, **attrs)
+        self._add_node(name, attrs)
+        self._record(("node", name, attrs))
 
     def add_relation(self, source: str, target: str, relation: str, **attrs: Any) -> None:
         """Create a typed relation between two entities."""
-        self.graph.add_edge(source, target, key=relation, **attrs)
+        self._add_edge(source, target, relation, attrs)
+        self._record(("edge", source, target, relation, attrs))
+
+    def add_relations(self, relations: Iterable[Tuple[str, str, str, dict]]) -> None:
+        """Add ``(source, target, relation, attrs)`` tuples in one call."""
+        for source, target, relation, attrs in relations:
+            self.add_relation(source, target, relation, **attrs)
 
     def remove_entity(self, name: str) -> None:
         """Remove an entity and its relations."""
-        if self.graph.has_node(name):
-            self.graph.remove_node(name)
+        if self._remove_node(name):
+            self._record(("remove_node", name))
 
     def remove_relation(self, source: str, target: str, relation: str) -> None:
         """Remove a specific relation between two entities."""
-        if self.graph.has_edge(source, target, key=relation):
-            self.graph.remove_edge(source, target, key=relation)
+        if self._remove_edge(source, target, relation):
+            self._record(("remove_edge", source, target, relation))
+
+    def apply_changes(self, changes: Iterable[Change]) -> None:
+        """Replay changes written elsewhere without recording them again."""
+        for change in changes:
+            kind = change[0]
+            if kind == "node":
+                self._add_node(change[1], change[2])
+            elif kind == "edge":
+                self._add_edge(change[1], change[2], change[3], change[4])
+            elif kind == "remove_edge":
+                self._remove_edge(change[1], change[2], change[3])
+            elif kind == "remove_node":
+                self._remove_node(change[1])
+            elif kind == "clear":
+                self._clear()
+
+    def _record(self, change: Change) -> None:
+        # Unpersisted graphs are saved from a snapshot; no journal needed.
+        if self.persisted:
+            self._changes.append(change)
+
+    def drain_changes(self) -> List[Change]:
+        """Return the changes to persist and start recording afresh.
+
+        A graph that was never persisted yields a full snapshot instead, so
+        saving it replaces whatever the store held before.
+        """
+        changes = self._changes if self.persisted else self.snapshot()
+        self.mark_persisted()
+        return changes
 
+    def mark_persisted(self) -> None:
+        self._changes = []
+        self.persisted = True
+
+    def snapshot(self) -> List[Change]:
+        """Changes that rebuild this graph from an empty store."""
+        changes: List[Change] = [("clear",)]
+        changes.extend(("node", name, dict(attrs)) for name, attrs in self.entities())
+        changes.extend(
+            ("edge", source, target, relation, dict(attrs))
+            for source, target, relation, attrs in self.relation_rows()
+        )
+        return changes
+
+    @classmethod
+    def from_rows(
+        cls,
+        nodes: Iterable[Tuple[str, Dict[str, Any]]],
+        edges: Iterable[Tuple[str, str, str, Dict[str, Any]]],
+    ) -> "BaseKnowledgeGraph":
+        """Build a graph from stored rows without recording changes."""
+        instance = cls()
+        for name, attrs in nodes:
+            instance._add_node(name, attrs)
+        for source, target, relation, attrs in edges:
+            instance._add_edge(source, target, relation, attrs)
+        return instance
+
+    # ------------------------------------------------------------------
+    # Queries. ``graph_store.SQLGraph`` answers the same queries from the
+    # database with identical results.
+    # ------------------------------------------------------------------
     def query(self, entity: str) -> List[Tuple[str, str]]:
         """Return outgoing relations from the given entity."""
-        return [(key, tgt) for _, tgt, key in self.graph.out_edges(entity, keys=True)]
+        if not self.has_entity(entity):
+            return []
+        return [(relation, target) for target, relation in self.out_edges(entity)]
+
+    def relations(
+        self, entity: str, relation: Optional[str] = None, direction: str = "out"
+    ) -> List[Edge]:
+        """Edges touching ``entity``, optionally of one relation type."""
+        check_direction(direction)
+        if not self.has_entity(entity):
+            return []
+        edges = set()
+        if direction in ("out", "both"):
+            edges.update((entity, rel, target) for target, rel in self.out_edges(entity))
+        if direction in ("in", "both"):
+            edges.update((source, rel, entity) for source, rel in self.in_edges(entity))
+        return sorted(edge for edge in edges if relation is None or edge[1] == relation)
+
+    def _neighbours(self, node: str, relation: Optional[str], direction: str) -> List[str]:
+        found = set()
+        if direction in ("out", "both"):
+            found.update(t for t, rel in self.out_edges(node) if relation is None or rel == relation)
+        if direction in ("in", "both"):
+            found.update(s for s, rel in self.in_edges(node) if relation is None or rel == relation)
+        return sorted(found)
+
+    def neighbourhood(
+        self,
+        entity: str,
+        hops: int = 1,
+        relation: Optional[str] = None,
+        direction: str = "out",
+    ) -> Dict[str, int]:
+        """Entities within ``hops`` steps of ``entity`` mapped to their distance."""
+        check_direction(direction)
+        if not self.has_entity(entity):
+            return {}
+        distances = {entity: 0}
+        frontier = [entity]
+        for depth in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for other in self._neighbours(node, relation, direction):
+                    if other not in distances:
+                        distances[other] = depth
+                        next_frontier.append(other)
+            frontier = next_frontier
+        del distances[entity]
+        return distances
+
+    def shortest_path(
+        self,
+        source: str,
+        target: str,
+        relation: Optional[str] = None,
+        direction: str = "out",
+        max_hops: Optional[int] = None,
+    ) -> Optional[List[str]]:
+        """Fewest-hop path from ``source`` to ``target`` or ``None``.
+
+        Among equally short paths the one through the lexicographically
+        smallest predecessors is returned, so both backends agree.
+        """
+        check_direction(direction)
+        if not (self.has_entity(source) and self.has_entity(target)):
+            return None
+        parents: Dict[str, Optional[str]] = {source: None}
+        frontier = [source]
+        depth = 0
+        while frontier and target not in parents and (max_hops is None or depth < max_hops):
+            next_frontier = []
+            for node in frontier:
+                for other in self._neighbours(node, relation, direction):
+                    if other not in parents:
+                        parents[other] = node
+                        next_frontier.append(other)
+            frontier = sorted(next_frontier)
+            depth += 1
+        return build_path(parents, target)
+
+    def find_entities(self, where: Optional[Predicates] = None) -> List[str]:
+        """Names of entities whose attributes satisfy every predicate."""
+        predicates = normalize_predicates(where)
+        return sorted(name for name, attrs in self.entities() if matches(attrs, predicates))
+
+    # ------------------------------------------------------------------
+    # Serialization (NetworkX node-link format)
+    # ------------------------------------------------------------------
+    def to_json(self) -> str:
+        """Serialize the graph to a JSON string."""
+        data = {
+            "directed": True,
+            "multigraph": True,
+            "graph": {},
+            "nodes": [{**attrs, "id": name} for name, attrs in self.entities()],
+            "links": [
+                {**attrs, "source": source, "target": target, "key": relation}
+                for source, target, relation, attrs in self.relation_rows()
+            ],
+        }
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, data: str) -> "BaseKnowledgeGraph":
+        """Create a graph from JSON written by any backend's ``to_json``."""
+        payload = json.loads(data)
+        nodes = [
+            (node["id"], {k: v for k, v in node.items() if k != "id"})
+            for node in payload.get("nodes", [])
+        ]
+        edges = [
+            (
+                link["source"],
+                link["target"],
+                link["key"],
+                {k: v for k, v in link.items() if k not in ("source", "target", "key")},
+            )
+            for link in payload.get("links", payload.get("edges", []))
+        ]
+        return cls.from_rows(nodes, edges)
+
+
+class KnowledgeGraph(BaseKnowledgeGraph):
+    """Simple wrapper around a MultiDiGraph for entity relations.
+
+    Mutations are also recorded as change tuples so that a store can persist
+    just what changed since the last save (see :mod:`graph_store`).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.graph = nx.MultiDiGraph()
+
+    def _add_node(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.graph.add_node(name, **attrs)
+
+    def _add_edge(self, source: str, target: str, relation: str, attrs: Dict[str, Any]) -> None:
+        self.graph.add_edge(source, target, key=relation, **attrs)
+
+    def _remove_node(self, name: str) -> bool:
+        if not self.graph.has_node(name):
+            return False
+        self.graph.remove_node(name)
+        return True
+
+    def _remove_edge(self, source: str, target: str, relation: str) -> bool:
+        if not self.graph.has_edge(source, target, key=relation):
+            return False
+        self.graph.remove_edge(source, target, key=relation)
+        return True
+
+    def _clear(self) -> None:
+        self.graph.clear()
+
+    def has_entity(self, name: str) -> bool:
+        return self.graph.has_node(name)
+
+    def entity_attrs(self, name: str) -> Dict[str, Any]:
+        return dict(self.graph.nodes[name])
+
+    def entities(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(self.graph.nodes(data=True))
+
+    def relation_rows(self) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+        return iter(self.graph.edges(keys=True, data=True))
+
+    def out_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        return ((target, key) for _, target, key in self.graph.out_edges(name, keys=True))
+
+    def in_edges(self, name: str) -> Iterator[Tuple[str, str]]:
+        return ((source, key) for source, _, key in self.graph.in_edges(name, keys=True))
+
+    @classmethod
+    def from_rows(cls, nodes, edges) -> "KnowledgeGraph":
+        instance = cls()
+        instance.graph.add_nodes_from(nodes)
+        instance.graph.add_edges_from(edges)
+        return instance
 
     def to_json(self) -> str:
         """Serialize the graph to a JSON string."""
@@ -50,3 +390,24 @@ class KnowledgeGraph:
             json.loads(data), multigraph=True, edges="links"
         )
         return instance
+
+
+def matches(attrs: Mapping[str, Any], predicates: List[Tuple[str, str, Any]]) -> bool:
+    for key, op, value in predicates:
+        if key not in attrs:
+            return False
+        try:
+            if not PREDICATE_OPS[op](attrs[key], value):
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def build_path(parents: Mapping[str, Optional[str]], target: str) -> Optional[List[str]]:
+    if target not in parents:
+        return None
+    path = [target]
+    while parents[path[-1]] is not None:
+        path.append(parents[path[-1]])
+    return path[::-1]
@@ -0,0 +1,145 @@
+"""Read-through cache for LLM responses backed by ``ToolManager``'s cache."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a key."""
+    return " ".join(prompt.split()).casefold()
+
+
+def is_cacheable(response: Any) -> bool:
+    """Do not pin failures such as ``"error: llm unavailable"`` in the cache."""
+    return not (isinstance(response, str) and response.lower().startswith("error"))
+
+
+class _LeaderCancelled(Exception):
+    """The shared call was cancelled along with the caller that made it."""
+
+
+class LLMResponseCache:
+    """Exact-match response cache with per-model namespaces and single-flight.
+
+    Concurrent lookups for the same key share one in-flight LLM call instead
+    of each paying full model latency. If the caller making the shared call
+    is cancelled, its followers retry and one of them makes the call.
+    """
+
+    def __init__(
+        self,
+        tool_manager: Any,
+        *,
+        ttl: Optional[float] = None,
+        enabled: bool = True,
+        semantic: Optional[Any] = None,
+    ) -> None:
+        self.tool_manager = tool_manager
+        self.ttl = ttl
+        self.enabled = enabled
+        # Optional ``SemanticCache`` consulted after an exact-match miss.
+        self.semantic = semantic
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def close(self) -> None:
+        """Persist the semantic index, if any."""
+        if self.semantic is not None:
+            self.semantic.close()
+
+    @staticmethod
+    def key(prompt: str, model: str) -> str:
+        return f"llm:{model}:{normalize_prompt(prompt)}"
+
+    async def get_or_call(
+        self,
+        prompt: str,
+        call: Callable[[], Awaitable[Any]],
+        *,
+        model: str,
+        use_cache: bool = True,
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached response for ``prompt`` or compute it with ``call``."""
+        if not (self.enabled and use_cache):
+            return await call()
+
+        key = self.key(prompt, model)
+        while True:
+            try:
+                return await self._get_or_lead(key, prompt, model, call, ttl)
+            except _LeaderCancelled:
+                continue
+
+    async def _get_or_lead(
+        self,
+        key: str,
+        prompt: str,
+        model: str,
+        call: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+    ) -> Any:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        cached = await self.tool_manager.get_cached_result(key)
+        if cached is not None:
+            return cached
+
+        cached = await self._semantic_lookup(prompt, model)
+        if cached is not None:
+            return cached
+
+        # Re-check: another caller may have started while we read the cache.
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # Followers were not cancelled themselves: tell them to retry.
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an unobserved failure does not log a warning.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if is_cacheable(result):
+                try:
+                    await self.tool_manager.set_cached_result(
+                        key, result, ttl=self.ttl if ttl is None else ttl
+                    )
+                except Exception as exc:  # pragma: no cover - cache is best effort
+                    LOGGER.warning("Failed to cache LLM response: %s", exc)
+                else:
+                    if self.semantic is not None:
+                        self.semantic.add(key, prompt)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _semantic_lookup(self, prompt: str, model: str) -> Any:
+        """Serve the response of a sufficiently similar prompt for ``model``."""
+        if self.semantic is None:
+            return None
+        match = await self.semantic.alookup(prompt, prefix=f"llm:{model}:")
+        if match is None:
+            return None
+        key, _score = match
+        cached = await self.tool_manager.get_cached_result(key)
+        if cached is None:
+            # The response expired or was evicted; stop matching against it.
+            self.semantic.remove(key)
+        return cached
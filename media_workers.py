@@ -0,0 +1,92 @@
+"""CPU-bound media jobs used by ``ToolManager``.
+
+The functions live at module level and take only plain arguments so they can
+run either in a thread or in a worker process of :class:`ProcessToolBackend`.
+Optional dependencies are imported when the job runs, inside whichever
+process executes it.
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+from typing import Any, Dict, List, Optional
+
+
+def _import_optional(name: str):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    return importlib.import_module(name)
+
+
+def ocr_image(path: str) -> str:
+    pytesseract_module = _import_optional("pytesseract")
+    image_module = _import_optional("PIL.Image")
+    image = image_module.open(path)
+    try:
+        return pytesseract_module.image_to_string(image)
+    finally:
+        close = getattr(image, "close", None)
+        if close:
+            close()
+
+
+def recognize_speech(path: str) -> str:
+    sr_module = _import_optional("speech_recognition")
+    recognizer = sr_module.Recognizer()
+    with sr_module.AudioFile(path) as source:
+        audio = recognizer.record(source)
+    return recognizer.recognize_sphinx(audio)
+
+
+def analyze_video(path: str) -> Optional[Dict[str, Any]]:
+    cv2_module = _import_optional("cv2")
+    capture = cv2_module.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return None
+        frame_prop = getattr(cv2_module, "CAP_PROP_FRAME_COUNT", 7)
+        fps_prop = getattr(cv2_module, "CAP_PROP_FPS", 5)
+        width_prop = getattr(cv2_module, "CAP_PROP_FRAME_WIDTH", 3)
+        height_prop = getattr(cv2_module, "CAP_PROP_FRAME_HEIGHT", 4)
+        frames = int(capture.get(frame_prop) or 0)
+        fps = float(capture.get(fps_prop) or 0.0)
+        width = int(capture.get(width_prop) or 0)
+        height = int(capture.get(height_prop) or 0)
+    finally:
+        capture.release()
+    duration = frames / fps if fps else 0.0
+    return {
+        "frames": frames,
+        "fps": fps,
+        "duration": duration,
+        "width": width,
+        "height": height,
+    }
+
+
+def describe_video(path: str, sample_frames: int) -> Optional[Dict[str, Any]]:
+    cv2_module = _import_optional("cv2")
+    capture = cv2_module.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return None
+        collected: List[List[float]] = []
+        count = 0
+        while count < sample_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            mean = frame.mean(axis=(0, 1)) if hasattr(frame, "mean") else [0.0, 0.0, 0.0]
+            collected.append([float(x) for x in mean])
+            count += 1
+    finally:
+        capture.release()
+    if not collected:
+        return {"avg_color": [0.0, 0.0, 0.0]}
+    avg = [sum(channel) / len(collected) for channel in zip(*collected)]
+    return {"avg_color": [float(x) for x in avg]}
@@ -0,0 +1,96 @@
+"""In-process LRU cache tier with a byte budget and per-entry TTL."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss/eviction counters shared by both cache tiers."""
+
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    disk_evictions: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        lookups = self.hits + self.misses
+        data["hit_ratio"] = self.hits / lookups if lookups else 0.0
+        return data
+
+
+class MemoryCache:
+    """LRU mapping of key to serialized payload bounded by total payload size.
+
+    Entries are stored as strings so the size accounting is exact enough to
+    bound memory and callers always receive a fresh copy when decoding.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        stats: Optional[CacheStats] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.stats = stats or CacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @staticmethod
+    def _entry_size(key: str, payload: str) -> int:
+        return len(key) + len(payload)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        if expires_at is not None and expires_at <= self._clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def set(self, key: str, payload: str, expires_at: Optional[float] = None) -> None:
+        size = self._entry_size(key, payload)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            # Too large for this tier; it is still served from SQLite.
+            return
+        self._entries[key] = (payload, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        payload, _ = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, payload)
@@ -0,0 +1,133 @@
+"""Per-step checkpoints that let an interrupted plan resume where it stopped.
+
+:class:`PlanCheckpoint` ties one plan execution (a *run*) to the
+``StateManager`` tables: each step is marked ``running`` before it starts
+and ``done`` (with its output) or ``failed`` (with the error) afterwards.
+Resuming a run skips the ``done`` steps and re-executes the rest.
+
+Tool calls get an idempotency key derived from the run, step, action and
+parameters. The tool's output is recorded under that key, so a retried step
+reuses a completed call instead of repeating its side effects; tools that
+accept an ``idempotency_key`` argument also receive it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+from state_manager import DEFAULT_SESSION, StateManager
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class PlanCheckpoint:
+    """Checkpoint writer for one run of a plan in one session."""
+
+    def __init__(
+        self,
+        state_manager: StateManager,
+        run_id: str,
+        query: str,
+        task_plan: List[Dict[str, Any]],
+        session_id: str = DEFAULT_SESSION,
+        *,
+        steps: Optional[Dict[str, Dict[str, Any]]] = None,
+        result: Optional[str] = None,
+    ) -> None:
+        self.state_manager = state_manager
+        self.run_id = run_id
+        self.query = query
+        self.task_plan = task_plan
+        self.session_id = session_id
+        self.steps: Dict[str, Dict[str, Any]] = steps or {}
+        # Final answer once the run has finished.
+        self.result = result
+
+    @classmethod
+    async def start(
+        cls,
+        state_manager: StateManager,
+        query: str,
+        task_plan: List[Dict[str, Any]],
+        session_id: str = DEFAULT_SESSION,
+    ) -> "PlanCheckpoint":
+        """Record a new run of ``task_plan`` with every step pending."""
+        run_id = uuid.uuid4().hex
+        await state_manager.start_run(run_id, query, task_plan, session_id)
+        return cls(state_manager, run_id, query, task_plan, session_id)
+
+    @classmethod
+    async def load(
+        cls, state_manager: StateManager, session_id: str = DEFAULT_SESSION
+    ) -> Optional["PlanCheckpoint"]:
+        """Return the session's latest run, or ``None`` if it has none."""
+        run = await state_manager.load_run(session_id)
+        if run is None:
+            return None
+        return cls(
+            state_manager,
+            run["run_id"],
+            run.get("query", ""),
+            run["task_plan"],
+            session_id,
+            steps=run["steps"],
+            result=run.get("result") if run.get("status") == DONE else None,
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def completed_output(self, step: Any) -> Optional[str]:
+        """Output of ``step`` if an earlier attempt finished it."""
+        record = self.steps.get(str(step))
+        if record and record["status"] == DONE:
+            return record["output"]
+        return None
+
+    def idempotency_key(self, step: Any, task: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            [self.run_id, str(step), task.get("action", ""), task.get("parameters", {})],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _checkpoint(self, step: Any, status: str, **fields: Any) -> None:
+        record = self.steps.setdefault(str(step), {"output": None, "error": None, "idempotency_key": None})
+        record.update(status=status, **{k: v for k, v in fields.items() if v is not None})
+        await self.state_manager.checkpoint_step(step, status, session_id=self.session_id, **fields)
+
+    async def add_step(self, task: Dict[str, Any]) -> None:
+        """Append a step planned while the run executes (lazy plan trees)."""
+        self.task_plan.append(task)
+        await self.state_manager.add_run_steps(self.run_id, [task], self.task_plan, self.session_id)
+
+    async def step_started(self, step: Any, task: Dict[str, Any]) -> str:
+        """Mark ``step`` running and return the idempotency key for its tool call."""
+        key = self.idempotency_key(step, task)
+        await self._checkpoint(step, RUNNING, idempotency_key=key)
+        return key
+
+    async def step_done(self, step: Any, output: str) -> None:
+        await self._checkpoint(step, DONE, output=output)
+
+    async def step_failed(self, step: Any, error: BaseException) -> None:
+        await self._checkpoint(step, FAILED, error=f"{type(error).__name__}: {error}")
+
+    async def tool_result(self, idempotency_key: str) -> Optional[str]:
+        return await self.state_manager.get_tool_call(idempotency_key)
+
+    async def record_tool(self, idempotency_key: str, output: str) -> None:
+        await self.state_manager.record_tool_call(idempotency_key, output, self.session_id)
+
+    async def finish(self, result: str) -> None:
+        """Mark the run complete so :meth:`CappuccinoAgent.resume` stops at it."""
+        self.result = result
+        await self.state_manager.finish_run(self.run_id, result, self.session_id)
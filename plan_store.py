@@ -0,0 +1,529 @@
+"""Indexed SQLite storage for agent plans and their steps.
+
+Each plan is one row of ``task_plans`` and each of its steps one row of
+``task_plan_steps``. Plans belong to an ``agent_id`` and/or ``session_id``,
+and any number of them may exist per agent or session. Both tables are
+indexed on ``(status, next_run_at)``, so "what is due now" is an index seek
+(see :meth:`PlanStore.due_plans` and :meth:`PlanStore.claim_due`) rather
+than a scan over serialized plans.
+
+The legacy one-row-per-agent ``agent_tasks`` table is migrated into
+``task_plans`` and replaced by a view with the same columns, so existing
+queries keep working. ``ToolManager`` and ``StateManager`` both expose a
+:class:`PlanStore` over their database, and :func:`schedule_due_plans`
+runs due plans on a :class:`scheduler.Scheduler`.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+import aiosqlite
+
+from scheduler import Scheduler, parse_schedule
+from sqlite_pool import SQLitePool
+
+LOGGER = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS task_plans (
+        plan_id TEXT PRIMARY KEY,
+        agent_id TEXT,
+        session_id TEXT,
+        title TEXT NOT NULL DEFAULT '',
+        description TEXT NOT NULL DEFAULT '',
+        status TEXT NOT NULL DEFAULT 'pending',
+        schedule TEXT,
+        next_run_at REAL,
+        current_step INTEGER NOT NULL DEFAULT 0,
+        lease_until REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task_plan_steps (
+        plan_id TEXT NOT NULL,
+        step INTEGER NOT NULL,
+        action TEXT NOT NULL DEFAULT '',
+        parameters TEXT NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'pending',
+        output TEXT,
+        next_run_at REAL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (plan_id, step)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_task_plans_due ON task_plans(status, next_run_at)",
+    "CREATE INDEX IF NOT EXISTS idx_task_plans_agent ON task_plans(agent_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_task_plans_session ON task_plans(session_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_task_plan_steps_due ON task_plan_steps(status, next_run_at)",
+)
+
+# Columns callers may set through ``add_plans``/``update_plan``.
+PLAN_FIELDS = (
+    "agent_id",
+    "session_id",
+    "title",
+    "description",
+    "status",
+    "schedule",
+    "next_run_at",
+    "current_step",
+    "lease_until",
+)
+STEP_FIELDS = ("action", "parameters", "status", "output", "next_run_at")
+
+_PLAN_COLUMNS = ("plan_id",) + PLAN_FIELDS + ("created_at", "updated_at")
+_STEP_COLUMNS = ("plan_id", "step") + STEP_FIELDS + ("updated_at",)
+
+StepSpec = Union[str, Dict[str, Any]]
+
+
+def agent_plan_id(agent_id: str) -> str:
+    """Id of the plan the ``agent_*`` tools manage for ``agent_id``."""
+    return f"agent:{agent_id}"
+
+
+async def create_schema(conn: aiosqlite.Connection) -> None:
+    """Create the plan tables and migrate a legacy ``agent_tasks`` table."""
+    for statement in SCHEMA:
+        await conn.execute(statement)
+    async with conn.execute("PRAGMA table_info(task_plans)") as cur:
+        columns = {row[1] for row in await cur.fetchall()}
+    if "lease_until" not in columns:
+        await conn.execute("ALTER TABLE task_plans ADD COLUMN lease_until REAL")
+    await conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_task_plans_lease ON task_plans(status, lease_until)"
+    )
+    async with conn.execute(
+        "SELECT type FROM sqlite_master WHERE name='agent_tasks'"
+    ) as cur:
+        row = await cur.fetchone()
+    if row is not None and row[0] == "table":
+        now = time.time()
+        await conn.execute(
+            """
+            INSERT OR IGNORE INTO task_plans(
+                plan_id, agent_id, description, status, schedule, next_run_at,
+                current_step, created_at, updated_at)
+            SELECT 'agent:' || agent_id, agent_id, COALESCE(plan, ''),
+                   COALESCE(status, 'pending'), schedule, NULL, COALESCE(phase, 0), ?, ?
+            FROM agent_tasks
+            """,
+            (now, now),
+        )
+        await conn.execute("DROP TABLE agent_tasks")
+    await conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS agent_tasks AS
+        SELECT agent_id, description AS plan, current_step AS phase, status, schedule
+        FROM task_plans WHERE plan_id = 'agent:' || agent_id
+        """
+    )
+
+
+def next_run_at(schedule: Optional[str], after: Optional[float] = None) -> Optional[float]:
+    """Next run time for ``schedule`` after ``after`` (default now).
+
+    Accepts anything :func:`scheduler.parse_schedule` does: cron
+    expressions, ``hourly``/``daily``/``weekly``, intervals such as
+    ``every 15 minutes`` or ``2h`` and one-off ISO 8601 timestamps.
+    Returns ``None`` for anything else, leaving the plan unscheduled.
+    """
+    if not schedule:
+        return None
+    try:
+        spec = parse_schedule(schedule)
+    except ValueError:
+        return None
+    return spec.first(time.time() if after is None else after)
+
+
+def _step_row(plan_id: str, index: int, spec: StepSpec, now: float) -> tuple:
+    step = {"action": spec} if isinstance(spec, str) else dict(spec)
+    return (
+        plan_id,
+        int(step.get("step", index)),
+        step.get("action", ""),
+        json.dumps(step.get("parameters") or {}),
+        step.get("status", PENDING),
+        step.get("output"),
+        step.get("next_run_at"),
+        now,
+    )
+
+
+def _plan_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    return dict(zip(_PLAN_COLUMNS, row))
+
+
+def _step_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    step = dict(zip(_STEP_COLUMNS, row))
+    step["parameters"] = json.loads(step["parameters"] or "{}")
+    return step
+
+
+class PlanStore:
+    """Plans and steps stored in the database of ``get_pool``'s pool.
+
+    ``get_pool`` is a coroutine function returning the :class:`SQLitePool`
+    whose schema includes :data:`SCHEMA` (``ToolManager._ensure_pool`` or
+    ``StateManager._get_pool``). Writes go through the pool's writer and
+    commit immediately; reads use the reader connections.
+    """
+
+    def __init__(self, get_pool: Callable[[], Awaitable[SQLitePool]]) -> None:
+        self._get_pool = get_pool
+
+    async def _fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[Sequence[Any]]:
+        pool = await self._get_pool()
+        async with pool.reader() as conn:
+            async with conn.execute(sql, tuple(params)) as cur:
+                return list(await cur.fetchall())
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    async def add_plans(self, plans: Iterable[Dict[str, Any]]) -> List[str]:
+        """Insert many plans, with their ``steps``, in one transaction.
+
+        Each dict takes the :data:`PLAN_FIELDS`, an optional ``plan_id`` and
+        ``steps`` as action strings or dicts with :data:`STEP_FIELDS`. A
+        ``schedule`` without an explicit ``next_run_at`` is scheduled from
+        now. Returns the plan ids in order.
+        """
+        now = time.time()
+        plan_rows, step_rows, ids = [], [], []
+        for plan in plans:
+            plan_id = plan.get("plan_id") or uuid.uuid4().hex
+            fields = {name: plan.get(name) for name in PLAN_FIELDS}
+            fields["title"] = fields["title"] or ""
+            fields["description"] = fields["description"] or ""
+            fields["status"] = fields["status"] or PENDING
+            fields["current_step"] = fields["current_step"] or 0
+            if fields["next_run_at"] is None:
+                fields["next_run_at"] = next_run_at(fields["schedule"], now)
+            plan_rows.append((plan_id, *fields.values(), now, now))
+            step_rows.extend(
+                _step_row(plan_id, index, spec, now)
+                for index, spec in enumerate(plan.get("steps") or (), start=1)
+            )
+            ids.append(plan_id)
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.executemany(
+                f"INSERT INTO task_plans({', '.join(_PLAN_COLUMNS)}) "
+                f"VALUES({', '.join('?' * len(_PLAN_COLUMNS))})",
+                plan_rows,
+            )
+            await conn.executemany(
+                f"INSERT INTO task_plan_steps({', '.join(_STEP_COLUMNS)}) "
+                f"VALUES({', '.join('?' * len(_STEP_COLUMNS))})",
+                step_rows,
+            )
+            await conn.commit()
+        return ids
+
+    async def create_plan(
+        self, steps: Iterable[StepSpec] = (), *, plan_id: Optional[str] = None, **fields: Any
+    ) -> str:
+        """Insert one plan and return its id."""
+        return (await self.add_plans([{**fields, "plan_id": plan_id, "steps": list(steps)}]))[0]
+
+    async def upsert_plan(self, plan_id: str, **fields: Any) -> None:
+        """Create ``plan_id`` if missing, then set the given fields."""
+        unknown = set(fields) - set(PLAN_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown plan fields: {sorted(unknown)}")
+        now = time.time()
+        columns = ["plan_id", *fields, "created_at", "updated_at"]
+        updates = ", ".join(f"{name}=excluded.{name}" for name in (*fields, "updated_at"))
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                f"INSERT INTO task_plans({', '.join(columns)}) VALUES({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(plan_id) DO UPDATE SET {updates}",
+                (plan_id, *fields.values(), now, now),
+            )
+            await conn.commit()
+
+    async def update_plan(self, plan_id: str, **fields: Any) -> bool:
+        """Set fields of an existing plan; returns whether it exists."""
+        unknown = set(fields) - set(PLAN_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown plan fields: {sorted(unknown)}")
+        assignments = ", ".join(f"{name}=?" for name in (*fields, "updated_at"))
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            cur = await conn.execute(
+                f"UPDATE task_plans SET {assignments} WHERE plan_id=?",
+                (*fields.values(), time.time(), plan_id),
+            )
+            await conn.commit()
+        return cur.rowcount > 0
+
+    async def advance_plan(self, plan_id: str, steps: int = 1) -> Optional[int]:
+        """Increment ``current_step`` and return the new value."""
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "UPDATE task_plans SET current_step = current_step + ?, updated_at=? WHERE plan_id=?",
+                (steps, time.time(), plan_id),
+            )
+            async with conn.execute(
+                "SELECT current_step FROM task_plans WHERE plan_id=?", (plan_id,)
+            ) as cur:
+                row = await cur.fetchone()
+            await conn.commit()
+        return row[0] if row else None
+
+    async def replace_steps(self, plan_id: str, steps: Iterable[StepSpec]) -> None:
+        """Replace all step rows of ``plan_id``."""
+        now = time.time()
+        rows = [_step_row(plan_id, index, spec, now) for index, spec in enumerate(steps, start=1)]
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.execute("DELETE FROM task_plan_steps WHERE plan_id=?", (plan_id,))
+            await conn.executemany(
+                f"INSERT INTO task_plan_steps({', '.join(_STEP_COLUMNS)}) "
+                f"VALUES({', '.join('?' * len(_STEP_COLUMNS))})",
+                rows,
+            )
+            await conn.commit()
+
+    async def update_steps(self, plan_id: str, updates: Dict[int, Dict[str, Any]]) -> None:
+        """Apply ``{step: fields}`` updates to several steps in one transaction."""
+        now = time.time()
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            for step, fields in updates.items():
+                unknown = set(fields) - set(STEP_FIELDS)
+                if unknown:
+                    raise ValueError(f"unknown step fields: {sorted(unknown)}")
+                if "parameters" in fields:
+                    fields = {**fields, "parameters": json.dumps(fields["parameters"] or {})}
+                assignments = ", ".join(f"{name}=?" for name in (*fields, "updated_at"))
+                await conn.execute(
+                    f"UPDATE task_plan_steps SET {assignments} WHERE plan_id=? AND step=?",
+                    (*fields.values(), now, plan_id, step),
+                )
+            await conn.commit()
+
+    async def delete_plan(self, plan_id: str) -> None:
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.execute("DELETE FROM task_plan_steps WHERE plan_id=?", (plan_id,))
+            await conn.execute("DELETE FROM task_plans WHERE plan_id=?", (plan_id,))
+            await conn.commit()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    async def get_plan(self, plan_id: str, *, steps: bool = True) -> Optional[Dict[str, Any]]:
+        rows = await self._fetchall(
+            f"SELECT {', '.join(_PLAN_COLUMNS)} FROM task_plans WHERE plan_id=?", (plan_id,)
+        )
+        if not rows:
+            return None
+        plan = _plan_dict(rows[0])
+        if steps:
+            plan["steps"] = await self.get_steps(plan_id)
+        return plan
+
+    async def get_steps(self, plan_id: str) -> List[Dict[str, Any]]:
+        rows = await self._fetchall(
+            f"SELECT {', '.join(_STEP_COLUMNS)} FROM task_plan_steps WHERE plan_id=? ORDER BY step",
+            (plan_id,),
+        )
+        return [_step_dict(row) for row in rows]
+
+    async def list_plans(
+        self,
+        *,
+        agent_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Plans matching every given filter, oldest first."""
+        clauses, params = [], []
+        for column, value in (("agent_id", agent_id), ("session_id", session_id), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column}=?")
+                params.append(value)
+        sql = f"SELECT {', '.join(_PLAN_COLUMNS)} FROM task_plans"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at, rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [_plan_dict(row) for row in await self._fetchall(sql, params)]
+
+    async def due_plans(
+        self, now: Optional[float] = None, *, status: str = PENDING, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Plans in ``status`` whose ``next_run_at`` has passed, earliest first."""
+        rows = await self._fetchall(
+            f"SELECT {', '.join(_PLAN_COLUMNS)} FROM task_plans "
+            "WHERE status=? AND next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+            (status, time.time() if now is None else now, limit),
+        )
+        return [_plan_dict(row) for row in rows]
+
+    async def claim_due(
+        self, now: Optional[float] = None, *, limit: int = 100, lease: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Atomically move due pending plans to ``running`` and return them.
+
+        Claiming under the writer lock means concurrent pollers never pick
+        up the same plan twice. With ``lease`` the claim expires after that
+        many seconds unless renewed with :meth:`extend_lease`; ``running``
+        plans whose lease has expired (their worker died) are claimed again.
+        """
+        now = time.time() if now is None else now
+        columns = ", ".join(_PLAN_COLUMNS)
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            async with conn.execute(
+                f"SELECT {columns} FROM task_plans WHERE status=? AND next_run_at <= ? "
+                f"UNION ALL SELECT {columns} FROM task_plans WHERE status=? AND lease_until <= ? "
+                "ORDER BY next_run_at LIMIT ?",
+                (PENDING, now, RUNNING, now, limit),
+            ) as cur:
+                plans = [_plan_dict(row) for row in await cur.fetchall()]
+            lease_until = None if lease is None else now + lease
+            await conn.executemany(
+                "UPDATE task_plans SET status=?, lease_until=?, updated_at=? WHERE plan_id=?",
+                [(RUNNING, lease_until, now, plan["plan_id"]) for plan in plans],
+            )
+            await conn.commit()
+        for plan in plans:
+            plan["status"] = RUNNING
+            plan["lease_until"] = lease_until
+            plan["updated_at"] = now
+        return plans
+
+    async def extend_lease(self, plan_ids: Iterable[str], until: float) -> None:
+        """Renew the claim on ``running`` plans that are still being worked on."""
+        pool = await self._get_pool()
+        async with pool.writer() as conn:
+            await conn.executemany(
+                "UPDATE task_plans SET lease_until=? WHERE plan_id=? AND status=?",
+                [(until, plan_id, RUNNING) for plan_id in plan_ids],
+            )
+            await conn.commit()
+
+    async def pending_steps(
+        self, now: Optional[float] = None, *, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Pending steps that are unscheduled or due, across all plans."""
+        now = time.time() if now is None else now
+        rows = await self._fetchall(
+            f"SELECT {', '.join(_STEP_COLUMNS)} FROM task_plan_steps "
+            "WHERE status=? AND (next_run_at IS NULL OR next_run_at <= ?) "
+            "ORDER BY next_run_at, plan_id, step LIMIT ?",
+            (PENDING, now, limit),
+        )
+        return [_step_dict(row) for row in rows]
+
+    async def count_by_status(self) -> Dict[str, int]:
+        rows = await self._fetchall("SELECT status, COUNT(*) FROM task_plans GROUP BY status")
+        return dict(rows)
+
+
+def _following_run(schedule: Optional[str], nominal: float, now: float) -> Optional[float]:
+    if not schedule:
+        return None
+    try:
+        spec = parse_schedule(schedule)
+    except ValueError:
+        return None
+    following = spec.next_after(nominal)
+    if following is not None and following <= now:
+        following = spec.next_after(now)
+    return following
+
+
+async def schedule_due_plans(
+    scheduler: Scheduler,
+    store: PlanStore,
+    runner: Callable[[Dict[str, Any]], Awaitable[Any]],
+    *,
+    poll_interval: float = 5.0,
+    job_type: str = "agent",
+    batch: int = 20,
+    lease: float = 300.0,
+    name: str = "agent-plans",
+) -> None:
+    """Register a job on ``scheduler`` that executes due plans with ``runner``.
+
+    Every ``poll_interval`` seconds the poller claims as many due plans as
+    the scheduler's ``job_type`` concurrency has free slots (at most
+    ``batch``) and starts each one as its own task, so a slow plan never
+    holds up the next poll. Claims are leased for ``lease`` seconds and
+    renewed on every poll while the plan runs; a plan left ``running`` by a
+    process that stopped is claimed again once its lease expires.
+
+    Afterwards a plan with a recurring schedule returns to ``pending`` with
+    its next run time (runs missed while it was late are coalesced); a
+    one-off plan ends ``completed`` or ``failed``.
+    """
+    in_flight: Set[str] = set()
+
+    async def run_plan(plan: Dict[str, Any]) -> None:
+        failed = False
+        try:
+            async with scheduler.semaphore(job_type):
+                try:
+                    await runner(plan)
+                except Exception:
+                    failed = True
+                    LOGGER.exception("Scheduled plan %s failed", plan["plan_id"])
+            now = scheduler.clock()
+            following = _following_run(plan["schedule"], plan["next_run_at"] or now, now)
+            if following is not None:
+                await store.update_plan(
+                    plan["plan_id"], status=PENDING, next_run_at=following, lease_until=None
+                )
+            else:
+                await store.update_plan(
+                    plan["plan_id"],
+                    status=FAILED if failed else COMPLETED,
+                    next_run_at=None,
+                    lease_until=None,
+                )
+        finally:
+            in_flight.discard(plan["plan_id"])
+
+    async def poll() -> None:
+        now = scheduler.clock()
+        if in_flight:
+            await store.extend_lease(in_flight, now + lease)
+        free = min(batch, scheduler.limit(job_type) - len(in_flight))
+        if free <= 0:
+            return
+        for plan in await store.claim_due(now, limit=free, lease=lease):
+            in_flight.add(plan["plan_id"])
+            scheduler.spawn(run_plan(plan))
+
+    await scheduler.add_job(
+        name,
+        poll,
+        f"every {poll_interval} seconds",
+        job_type=f"{job_type}-poll",
+        misfire_grace=None,
+        run_immediately=True,
+    )
@@ -1,10 +1,37 @@
-from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 from config import settings
+from llm_cache import normalize_prompt
+
+LOGGER = logging.getLogger(__name__)
+
+_BATCH_PROMPT = (
+    "Break each numbered task below into at most {breadth} short, concrete steps.\n"
+    'Reply with JSON only, mapping each task number to a list of step strings, e.g. {{"1": ["...", "..."]}}.\n\n'
+    "{tasks}"
+)
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
 
 
 class Planner:
-    """Generate plans from user context using selectable strategy."""
+    """Generate plans from user context using selectable strategy.
+
+    ``mode`` is ``"basic"`` (split on sentences), ``"fractal"`` (recursive
+    expansion via :class:`fractal_planner.FractalPlanner`) or ``"llm"``. The
+    LLM mode expands a plan one level at a time, decomposing every node of a
+    level in a single model call, so a plan costs one round-trip per level
+    instead of one per node. Decompositions are cached in ``tool_manager``'s
+    cache under a hash of the normalized task. A task the model does not
+    answer in time falls back to the sentence splitter and is not expanded
+    further, and the whole plan shares one ``time_budget`` across its model
+    calls (default ``settings.planner_time_budget``, or ``llm_timeout`` per
+    level when that is unset).
+    """
 
     def __init__(
         self,
@@ -12,17 +39,34 @@ class Planner:
         *,
         fractal_depth: int | None = None,
         fractal_breadth: int | None = None,
+        llm: Any = None,
+        tool_manager: Any = None,
+        llm_timeout: float = 10.0,
+        cache_ttl: Optional[float] = None,
+        time_budget: Optional[float] = None,
     ) -> None:
         self.mode = mode
+        self.depth = fractal_depth or settings.fractal_depth
+        self.breadth = fractal_breadth or settings.fractal_breadth
+        self.tool_manager = tool_manager
+        self.llm_timeout = llm_timeout
+        self.cache_ttl = cache_ttl
+        if time_budget is None:
+            time_budget = settings.planner_time_budget
+        self.time_budget = time_budget if time_budget is not None else llm_timeout * self.depth
+        self.llm_calls = 0
         if self.mode == "fractal":
             from fractal_planner import FractalPlanner
 
-            self._planner = FractalPlanner(
-                depth=fractal_depth or settings.fractal_depth,
-                breadth=fractal_breadth or settings.fractal_breadth,
-            )
+            self._planner = FractalPlanner(depth=self.depth, breadth=self.breadth)
         else:
             self._planner = None
+        if llm is not None:
+            from agents.base_agent import BaseAgent
+
+            self._llm: Optional[Any] = BaseAgent(llm)
+        else:
+            self._llm = None
 
     def _basic_plan(self, context: str) -> List[Dict[str, Any]]:
         steps = []
@@ -35,7 +79,163 @@ class Planner:
         return steps
 
     def create_plan(self, context: str) -> List[Dict[str, Any]]:
-        """Create a plan based on the configured mode."""
+        """Create a plan based on the configured mode.
+
+        The LLM mode needs an event loop; use :meth:`plan` for it. Called
+        synchronously it returns the sentence-split plan.
+        """
         if self.mode == "fractal" and self._planner is not None:
             return self._planner.create_plan(context)
         return self._basic_plan(context)
+
+    async def plan(self, context: str) -> List[Dict[str, Any]]:
+        """Create a plan, consulting the LLM in ``"llm"`` mode."""
+        if self.mode != "llm":
+            return self.create_plan(context)
+        return await self._llm_plan(context)
+
+    async def stream_plan(
+        self,
+        context: str,
+        plan_queue: asyncio.Queue,
+        on_step: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Put the plan's steps on an executor ``plan_queue``, ending with ``None``.
+
+        In ``"fractal"`` mode the leaf steps are queued as the tree is
+        walked, so subtrees are decomposed only when execution reaches them.
+        Other modes queue the finished plan. ``on_step`` is awaited with each
+        step before it is queued.
+        """
+        if self.mode == "fractal" and self._planner is not None:
+            return await self._planner.plan_tree(context).feed(plan_queue, on_step)
+        steps = await self.plan(context)
+        for step in steps:
+            if on_step is not None:
+                await on_step(step)
+            await plan_queue.put(step)
+        await plan_queue.put(None)
+        return steps
+
+    # ------------------------------------------------------------------
+    # LLM mode
+    # ------------------------------------------------------------------
+    async def _llm_plan(self, context: str) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_budget
+        root: Dict[str, Any] = {"action": context}
+        frontier = [root]
+        budget = settings.fractal_max_nodes
+        for _ in range(self.depth):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                for node in frontier:
+                    node["truncated"] = True
+                break
+            decompositions = await self._decompose(
+                [node["action"] for node in frontier], timeout=min(self.llm_timeout, remaining)
+            )
+            next_frontier = []
+            for node, (actions, answered) in zip(frontier, decompositions):
+                if not answered:
+                    if node is root:
+                        actions = [step["action"] for step in self._basic_plan(context)]
+                    elif len(actions) <= 1:
+                        # Splitting found nothing to split; keep the node a leaf.
+                        continue
+                if budget < len(actions):
+                    node["truncated"] = True
+                    continue
+                budget -= len(actions)
+                node["substeps"] = [
+                    {"step": index, "action": action} for index, action in enumerate(actions, start=1)
+                ]
+                # Fallback splits are final: asking the model about them again
+                # would only repeat the timeout at the next level.
+                if answered:
+                    next_frontier.extend(node["substeps"])
+            frontier = next_frontier
+            if not frontier:
+                break
+        return root.get("substeps") or self._basic_plan(context)
+
+    @staticmethod
+    def cache_key(action: str, breadth: int) -> str:
+        digest = hashlib.sha256(normalize_prompt(action).encode("utf-8")).hexdigest()
+        return f"plan:{breadth}:{digest}"
+
+    async def decompose_batch(self, actions: Sequence[str]) -> List[List[str]]:
+        """Split each of ``actions`` into at most ``breadth`` substeps.
+
+        Cached tasks are answered from the cache; the rest go to the model in
+        one prompt. Tasks missing from the reply, or all of them on a timeout
+        or unparseable reply, use the sentence splitter and are not cached.
+        """
+        return [steps for steps, _ in await self._decompose(actions)]
+
+    async def _decompose(
+        self, actions: Sequence[str], timeout: Optional[float] = None
+    ) -> List[Tuple[List[str], bool]]:
+        """``(steps, answered)`` per action; ``answered`` is false for fallbacks."""
+        results: List[Optional[Tuple[List[str], bool]]] = [None] * len(actions)
+        pending: Dict[str, List[int]] = {}
+        for index, action in enumerate(actions):
+            key = self.cache_key(action, self.breadth)
+            cached = await self.tool_manager.get_cached_result(key) if self.tool_manager else None
+            if isinstance(cached, list):
+                results[index] = (cached, True)
+            else:
+                pending.setdefault(key, []).append(index)
+
+        if pending:
+            keys = list(pending)
+            answers = await self._ask_llm(
+                [actions[pending[key][0]] for key in keys],
+                self.llm_timeout if timeout is None else timeout,
+            )
+            for position, key in enumerate(keys):
+                steps = answers.get(position + 1)
+                if steps and self.tool_manager is not None:
+                    await self.tool_manager.set_cached_result(key, steps, ttl=self.cache_ttl)
+                for index in pending[key]:
+                    results[index] = (steps, True) if steps else (self._fallback_steps(actions[index]), False)
+        return [result or ([], False) for result in results]
+
+    def _fallback_steps(self, action: str) -> List[str]:
+        return [step["action"] for step in self._basic_plan(action)][: self.breadth]
+
+    async def _ask_llm(self, actions: List[str], timeout: float) -> Dict[int, List[str]]:
+        """Return ``{task number: steps}`` for the tasks the model answered."""
+        if self._llm is None:
+            return {}
+        tasks = "\n".join(f"{number}. {action}" for number, action in enumerate(actions, start=1))
+        prompt = _BATCH_PROMPT.format(breadth=self.breadth, tasks=tasks)
+        self.llm_calls += 1
+        try:
+            reply = await asyncio.wait_for(self._llm.call_llm(prompt), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Plan decomposition timed out after %.1fs", timeout)
+            return {}
+        except Exception as exc:  # pragma: no cover - depends on the LLM client
+            LOGGER.warning("Plan decomposition failed: %s", exc)
+            return {}
+        return self._parse_reply(reply, len(actions))
+
+    def _parse_reply(self, reply: str, count: int) -> Dict[int, List[str]]:
+        match = _JSON_OBJECT.search(reply or "")
+        if match is None:
+            return {}
+        try:
+            payload = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(payload, dict):
+            return {}
+        answers: Dict[int, List[str]] = {}
+        for number, steps in payload.items():
+            if not (str(number).isdigit() and 1 <= int(number) <= count and isinstance(steps, list)):
+                continue
+            cleaned = [str(step).strip() for step in steps if str(step).strip()]
+            if cleaned:
+                answers[int(number)] = cleaned[: self.breadth]
+        return answers
@@ -0,0 +1,123 @@
+"""Process-pool execution backend for CPU-bound tools.
+
+OCR, speech recognition and video decoding hold the GIL for long stretches,
+so running them in threads stalls the event loop's other work and competes
+with SQLite I/O for the default thread pool. :class:`ProcessToolBackend` runs
+such jobs in separate worker processes instead.
+
+Each worker is its own single-process ``ProcessPoolExecutor`` ("slot"). That
+lets a timed-out or cancelled job be stopped by killing exactly the process
+that runs it, without disturbing jobs in other slots. Workers import the
+heavy media libraries once at start-up so the first job does not pay for it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+WARM_MODULES: Sequence[str] = ("PIL.Image", "pytesseract", "cv2", "speech_recognition")
+
+
+def warm_worker(modules: Sequence[str]) -> None:
+    """Worker initializer: pre-import optional media libraries."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:  # pragma: no cover - optional dependency
+            pass
+
+
+def _noop() -> None:
+    return None
+
+
+class ProcessToolBackend:
+    """Run picklable callables in ``workers`` warm worker processes."""
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        warm_modules: Sequence[str] = WARM_MODULES,
+        start_method: str = "spawn",
+    ) -> None:
+        self.workers = max(1, workers)
+        self.warm_modules = tuple(warm_modules)
+        # ``spawn`` avoids forking a parent that runs aiosqlite threads.
+        self._context = multiprocessing.get_context(start_method)
+        self._slots: List[ProcessPoolExecutor] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self.kills = 0
+
+    def _new_slot(self) -> ProcessPoolExecutor:
+        slot = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._context,
+            initializer=warm_worker,
+            initargs=(self.warm_modules,),
+        )
+        # Processes start on first submit; do it now so the worker is warm.
+        slot.submit(_noop)
+        self._slots.append(slot)
+        return slot
+
+    def start(self) -> None:
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            self._idle.put_nowait(self._new_slot())
+
+    async def run(
+        self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        """Run ``func(*args)`` in a worker process.
+
+        Raises ``asyncio.TimeoutError`` after ``timeout`` seconds. On timeout
+        or cancellation the worker running the job is killed and replaced.
+        """
+        self.start()
+        slot = await self._idle.get()
+        healthy = False
+        try:
+            future = asyncio.get_running_loop().run_in_executor(slot, func, *args)
+            result = await asyncio.wait_for(future, timeout)
+            healthy = True
+            return result
+        except Exception as exc:
+            # Errors raised by ``func`` leave the worker usable.
+            healthy = not isinstance(exc, (asyncio.TimeoutError, BrokenProcessPool))
+            raise
+        finally:
+            if not healthy:
+                self._kill(slot)
+                slot = self._new_slot()
+            if self._idle is not None:
+                self._idle.put_nowait(slot)
+
+    def _kill(self, slot: ProcessPoolExecutor) -> None:
+        for process in list((getattr(slot, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.kill()
+        slot.shutdown(wait=False, cancel_futures=True)
+        if slot in self._slots:
+            self._slots.remove(slot)
+        self.kills += 1
+        LOGGER.warning("Killed tool worker process after timeout or cancellation")
+
+    async def close(self) -> None:
+        slots, self._slots, self._idle = self._slots, [], None
+
+        def _shutdown() -> None:
+            for slot in slots:
+                slot.shutdown(wait=True, cancel_futures=True)
+
+        await asyncio.to_thread(_shutdown)
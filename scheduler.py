@@ -0,0 +1,568 @@
+"""In-process asyncio scheduler for periodic and one-off jobs.
+
+Jobs are coroutine functions registered under a unique name with a schedule:
+
+* cron expressions (``"*/15 9-17 * * 1-5"``, ``"@daily"``), evaluated in local
+  time;
+* intervals (``"every 10 minutes"``, ``"6h"``, ``"hourly"``/``"daily"``/
+  ``"weekly"``);
+* one-off ISO 8601 timestamps.
+
+Pending fire times live in a heap, so the loop sleeps exactly until the
+earliest one. Each fire is delayed by up to ``jitter`` seconds so that jobs
+sharing a schedule do not stampede. The next fire time is computed from the
+*scheduled* time rather than from when the job finished, so periodic jobs do
+not drift.
+
+With a :class:`JobStore` every job's next run time and counters are
+persisted; a job re-added after a restart resumes its schedule instead of
+starting from zero. A fire that is noticed more than ``misfire_grace``
+seconds late (the process was down or the loop was blocked) is a misfire:
+``misfire="run_once"`` runs it once and then continues with the next future
+fire time, ``misfire="skip"`` drops it. Runs are bounded per ``job_type`` by
+a semaphore, and a job never overlaps itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from sqlite_pool import SQLitePool, open_pool
+
+LOGGER = logging.getLogger(__name__)
+
+JobFunc = Callable[[], Awaitable[Any]]
+
+MISFIRE_POLICIES = ("run_once", "skip")
+
+
+# ----------------------------------------------------------------------
+# Schedule specifications
+# ----------------------------------------------------------------------
+class IntervalSpec:
+    """Fire every ``seconds`` seconds."""
+
+    def __init__(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        self.seconds = seconds
+
+    def first(self, now: float) -> Optional[float]:
+        return self.next_after(now)
+
+    def next_after(self, when: float) -> Optional[float]:
+        return when + self.seconds
+
+
+class OnceSpec:
+    """Fire once at ``at``; a time already past fires as soon as possible."""
+
+    def __init__(self, at: float) -> None:
+        self.at = at
+
+    def first(self, now: float) -> Optional[float]:
+        return self.at
+
+    def next_after(self, when: float) -> Optional[float]:
+        return self.at if self.at > when else None
+
+
+_CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+# (low, high) for minute, hour, day of month, month, day of week.
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# Give up on expressions that never match (e.g. "0 0 30 2 *").
+_CRON_HORIZON_YEARS = 8
+
+
+def _cron_field(text: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"invalid cron step in {text!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"cron field {text!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSpec:
+    """Five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Day of week runs from 0 (Sunday) to 6, with 7 also meaning Sunday. As in
+    classic cron, when both day fields are restricted a day matching either
+    one fires.
+    """
+
+    def __init__(self, expression: str) -> None:
+        self.expression = _CRON_ALIASES.get(expression.strip().lower(), expression.strip())
+        fields = self.expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression!r}")
+        minutes, hours, days, months, weekdays = (
+            _cron_field(text, low, high) for text, (low, high) in zip(fields, _CRON_RANGES)
+        )
+        self.minutes = sorted(minutes)
+        self.hours = sorted(hours)
+        self.days = days
+        self.months = months
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def first(self, now: float) -> Optional[float]:
+        return self.next_after(now)
+
+    def next_after(self, when: float) -> Optional[float]:
+        moment = datetime.fromtimestamp(when).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + _CRON_HORIZON_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+                moment = moment.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                later = [hour for hour in self.hours if hour > moment.hour]
+                if later:
+                    moment = moment.replace(hour=later[0], minute=0)
+                else:
+                    moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            else:
+                later = [minute for minute in self.minutes if minute >= moment.minute]
+                if later:
+                    return moment.replace(minute=later[0]).timestamp()
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+        return None
+
+
+Spec = Union[IntervalSpec, OnceSpec, CronSpec]
+
+_INTERVAL = re.compile(
+    r"^(?:every\s+)?(\d+(?:\.\d+)?)\s*"
+    r"(s|sec|secs|seconds?|m|min|mins|minutes?|h|hr|hrs|hours?|d|days?|w|weeks?)$"
+)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_NAMED_INTERVALS = {"hourly": 3600, "daily": 86400, "weekly": 604800}
+
+
+def parse_schedule(schedule: str) -> Spec:
+    """Parse a schedule string; raises ``ValueError`` if it is not understood."""
+    text = schedule.strip()
+    lowered = text.lower()
+    if lowered in _NAMED_INTERVALS:
+        return IntervalSpec(_NAMED_INTERVALS[lowered])
+    match = _INTERVAL.match(lowered)
+    if match:
+        return IntervalSpec(float(match.group(1)) * _UNIT_SECONDS[match.group(2)[0]])
+    if lowered in _CRON_ALIASES or len(text.split()) == 5:
+        return CronSpec(text)
+    try:
+        return OnceSpec(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        raise ValueError(f"unrecognised schedule {schedule!r}") from None
+
+
+# ----------------------------------------------------------------------
+# Persistence
+# ----------------------------------------------------------------------
+class JobStore:
+    """Persist job schedules and counters in the ``scheduled_jobs`` table.
+
+    Pass ``db_path`` to use a dedicated database, or ``get_pool`` to share an
+    existing :class:`SQLitePool` (such as ``ToolManager._ensure_pool``).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            schedule TEXT NOT NULL,
+            job_type TEXT NOT NULL,
+            next_run_at REAL,
+            last_run_at REAL,
+            runs INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            misfires INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        *,
+        get_pool: Optional[Callable[[], Awaitable[SQLitePool]]] = None,
+    ) -> None:
+        if (db_path is None) == (get_pool is None):
+            raise ValueError("pass exactly one of db_path or get_pool")
+        self.db_path = db_path
+        self._get_pool = get_pool
+        self._pool: Optional[SQLitePool] = None
+        self._ready = False
+        self._lock = asyncio.Lock()
+
+    async def _ensure(self) -> SQLitePool:
+        if self._ready and self._pool is not None:
+            return self._pool
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await (self._get_pool() if self._get_pool else open_pool(self.db_path))
+            if not self._ready:
+                async with self._pool.writer() as conn:
+                    await conn.execute(self.SCHEMA)
+                    await conn.commit()
+                self._ready = True
+        return self._pool
+
+    async def load(self, name: str) -> Optional[Dict[str, Any]]:
+        pool = await self._ensure()
+        async with pool.reader() as conn:
+            async with conn.execute(
+                "SELECT schedule, next_run_at, last_run_at, runs, failures, misfires, last_error "
+                "FROM scheduled_jobs WHERE name=?",
+                (name,),
+            ) as cur:
+                row = await cur.fetchone()
+        if row is None:
+            return None
+        keys = ("schedule", "next_run_at", "last_run_at", "runs", "failures", "misfires", "last_error")
+        return dict(zip(keys, row))
+
+    async def save(self, job: "Job") -> None:
+        pool = await self._ensure()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "REPLACE INTO scheduled_jobs (name, schedule, job_type, next_run_at, last_run_at, "
+                "runs, failures, misfires, last_error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.name,
+                    job.schedule,
+                    job.job_type,
+                    job.next_run_at,
+                    job.last_run_at,
+                    job.runs,
+                    job.failures,
+                    job.misfires,
+                    job.last_error,
+                ),
+            )
+            await conn.commit()
+
+    async def delete(self, name: str) -> None:
+        pool = await self._ensure()
+        async with pool.writer() as conn:
+            await conn.execute("DELETE FROM scheduled_jobs WHERE name=?", (name,))
+            await conn.commit()
+
+    async def close(self) -> None:
+        """Release the pool if this store opened it."""
+        if self._get_pool is None and self._pool is not None:
+            await self._pool.release()
+        self._pool = None
+        self._ready = False
+
+
+# ----------------------------------------------------------------------
+# Scheduler
+# ----------------------------------------------------------------------
+@dataclass
+class Job:
+    """A registered job and its run statistics."""
+
+    name: str
+    func: JobFunc
+    schedule: str
+    spec: Spec
+    job_type: str = "default"
+    jitter: float = 0.0
+    misfire_grace: Optional[float] = 60.0
+    misfire: str = "run_once"
+    next_run_at: Optional[float] = None
+    last_run_at: Optional[float] = None
+    runs: int = 0
+    failures: int = 0
+    misfires: int = 0
+    overlaps: int = 0
+    last_error: Optional[str] = None
+    running: bool = False
+    version: int = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "schedule": self.schedule,
+            "job_type": self.job_type,
+            "next_run_at": self.next_run_at,
+            "last_run_at": self.last_run_at,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "misfires": self.misfires,
+            "overlaps": self.overlaps,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Run registered jobs at their scheduled times on the current event loop.
+
+    ``concurrency`` maps a ``job_type`` to the number of its jobs that may run
+    at once; other types get ``default_concurrency``. ``clock`` returns the
+    current Unix time and exists for tests.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        *,
+        concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = 4,
+        clock: Callable[[], float] = time.time,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.store = store
+        self.concurrency = dict(concurrency or {})
+        self.default_concurrency = default_concurrency
+        self.clock = clock
+        self._rng = rng or random.Random()
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._seq = 0
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop_task is not None and not self._loop_task.done()
+
+    def limit(self, job_type: str) -> int:
+        """How many runs of ``job_type`` may execute at once."""
+        return max(1, self.concurrency.get(job_type, self.default_concurrency))
+
+    def semaphore(self, job_type: str) -> asyncio.Semaphore:
+        """The semaphore bounding concurrent runs of ``job_type``."""
+        semaphore = self._semaphores.get(job_type)
+        if semaphore is None:
+            semaphore = self._semaphores[job_type] = asyncio.Semaphore(self.limit(job_type))
+        return semaphore
+
+    def spawn(self, coro: Awaitable[Any]) -> asyncio.Future:
+        """Run ``coro`` as a task that :meth:`stop` waits for (or cancels)."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ------------------------------------------------------------------
+    # Job registry
+    # ------------------------------------------------------------------
+    async def add_job(
+        self,
+        name: str,
+        func: JobFunc,
+        schedule: Union[str, Spec],
+        *,
+        job_type: str = "default",
+        jitter: float = 0.0,
+        misfire_grace: Optional[float] = 60.0,
+        misfire: str = "run_once",
+        run_immediately: bool = False,
+    ) -> Job:
+        """Register or replace ``name``.
+
+        A job with a persisted row for the same schedule keeps its stored next
+        run time (possibly in the past, which is then handled as a misfire).
+        Otherwise the first run is the next fire time, or now with
+        ``run_immediately``.
+        """
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"misfire must be one of {MISFIRE_POLICIES}")
+        if isinstance(schedule, str):
+            spec, text = parse_schedule(schedule), schedule
+        else:
+            spec, text = schedule, getattr(schedule, "expression", repr(schedule))
+        previous = self._jobs.get(name)
+        job = Job(
+            name=name,
+            func=func,
+            schedule=text,
+            spec=spec,
+            job_type=job_type,
+            jitter=jitter,
+            misfire_grace=misfire_grace,
+            misfire=misfire,
+            version=previous.version + 1 if previous else 0,
+        )
+        stored = await self.store.load(name) if self.store else None
+        if stored and stored["schedule"] == text:
+            job.next_run_at = stored["next_run_at"]
+            job.last_run_at = stored["last_run_at"]
+            job.runs = stored["runs"]
+            job.failures = stored["failures"]
+            job.misfires = stored["misfires"]
+            job.last_error = stored["last_error"]
+        else:
+            now = self.clock()
+            job.next_run_at = now if run_immediately else spec.first(now)
+        self._jobs[name] = job
+        self._push(job)
+        await self._persist(job)
+        return job
+
+    async def remove_job(self, name: str) -> bool:
+        job = self._jobs.pop(name, None)
+        if job is None:
+            return False
+        job.version += 1
+        if self.store:
+            await self.store.delete(name)
+        return True
+
+    def get_job(self, name: str) -> Optional[Job]:
+        return self._jobs.get(name)
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Snapshot of every job, earliest next run first."""
+        return sorted(
+            (job.info() for job in self._jobs.values()),
+            key=lambda info: (info["next_run_at"] is None, info["next_run_at"] or 0),
+        )
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._run_loop())
+
+    async def stop(self, *, wait: bool = True) -> None:
+        """Stop firing jobs; wait for running ones or cancel them."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        if not wait:
+            for task in self._tasks:
+                task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _push(self, job: Job) -> None:
+        if job.next_run_at is None:
+            return
+        delay = self._rng.uniform(0, job.jitter) if job.jitter > 0 else 0.0
+        self._seq += 1
+        heapq.heappush(self._heap, (job.next_run_at + delay, self._seq, job.name, job.version))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_loop(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            now = self.clock()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, name, version = heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                # Entries of removed or replaced jobs are discarded lazily.
+                if job is not None and job.version == version:
+                    self._fire(job, now)
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, job: Job, now: float) -> None:
+        nominal = job.next_run_at if job.next_run_at is not None else now
+        run = True
+        if job.misfire_grace is not None and now - nominal > job.misfire_grace:
+            job.misfires += 1
+            run = job.misfire == "run_once"
+            LOGGER.warning("Job %s misfired by %.1fs", job.name, now - nominal)
+        if job.running:
+            job.overlaps += 1
+            run = False
+        # Schedule from the nominal time so periodic jobs do not drift;
+        # fires missed while late are coalesced into the next future one.
+        following = job.spec.next_after(nominal)
+        if following is not None and following <= now:
+            following = job.spec.next_after(now)
+        job.next_run_at = following
+        self._push(job)
+        if run:
+            job.running = True
+            self.spawn(self._run_job(job))
+        else:
+            self.spawn(self._persist(job))
+
+    async def _run_job(self, job: Job) -> None:
+        try:
+            # Persist the advanced schedule first: a crash mid-run does not
+            # repeat the run after a restart.
+            await self._persist(job)
+            async with self.semaphore(job.job_type):
+                job.last_run_at = self.clock()
+                try:
+                    await job.func()
+                    job.runs += 1
+                    job.last_error = None
+                except Exception as exc:
+                    job.failures += 1
+                    job.last_error = f"{type(exc).__name__}: {exc}"
+                    LOGGER.exception("Scheduled job %s failed", job.name)
+        finally:
+            job.running = False
+        await self._persist(job)
+
+    async def _persist(self, job: Job) -> None:
+        if self.store is None or self._jobs.get(job.name) is not job:
+            return
+        try:
+            await self.store.save(job)
+        except Exception as exc:  # pragma: no cover - logged, schedule continues
+            LOGGER.error("Failed to persist job %s: %s", job.name, exc)
@@ -72,6 +72,22 @@ TOOLS_SCHEMA: List[Dict] = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "info_search_multi",
+            "description": "Search several backends at once and return merged, de-duplicated results.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"},
+                    "max_results": {"type": "integer"},
+                    "deadline": {"type": "number"}
+                },
+                "required": ["query"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -0,0 +1,114 @@
+"""Incremental parser for DuckDuckGo HTML search result pages.
+
+:class:`ResultLinkParser` is fed the page chunk by chunk as it arrives and
+extracts ``<a class="result__a" href=...>title</a>`` links in one pass over
+the input using pre-compiled patterns. Parsing stops as soon as
+``max_results`` links have been found, which lets the caller stop reading the
+response.
+"""
+
+from __future__ import annotations
+
+import codecs
+import re
+from typing import AsyncIterable, Dict, List, Optional
+
+# The parser alternates between two searches and never moves backwards: find
+# the next ``result__a`` class token, then the ``</a>`` closing its anchor.
+# Both patterns start with a literal, so the regex engine skips the rest of
+# the page with a fast substring scan instead of trying a match at every "<".
+_RESULT_TOKEN = re.compile(r"""result__a(?=[\s'"])""")
+_CLASS_VALUE_TAIL = re.compile(r"""class\s*=\s*['"](?:[^'"]*\s)?$""")
+_ANCHOR_CLOSE = re.compile(r"</[aA]\s*>")
+_HREF = re.compile(r"""href\s*=\s*(['"])(.*?)\1""", re.DOTALL)
+_INNER_TAG = re.compile(r"<[^>]*>")
+
+
+class ResultLinkParser:
+    """Collect result links from HTML fed in arbitrary chunks."""
+
+    def __init__(self, max_results: Optional[int] = None) -> None:
+        self.max_results = max_results
+        self.results: List[Dict[str, str]] = []
+        self._buffer = ""
+        # href of the result anchor currently open; its title starts at the
+        # beginning of ``_buffer``.
+        self._href: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.max_results is not None and len(self.results) >= self.max_results
+
+    def feed(self, chunk: str) -> None:
+        if self.done:
+            return
+        buffer = self._buffer + chunk if self._buffer else chunk
+        pos = 0
+        title_start = 0
+        while True:
+            if self._href is None:
+                match = _RESULT_TOKEN.search(buffer, pos)
+                if match is None:
+                    break
+                tag_start = buffer.rfind("<", pos, match.start())
+                tag_end = buffer.find(">", match.end())
+                if tag_end == -1:
+                    # The tag is cut off; resume from it with the next chunk.
+                    pos = tag_start if tag_start != -1 else match.start()
+                    break
+                pos = tag_end + 1
+                attribute = buffer.rfind("class", tag_start, match.start())
+                if (
+                    tag_start == -1
+                    or buffer[tag_start + 1 : tag_start + 2] not in ("a", "A")
+                    or not buffer[tag_start + 2].isspace()
+                    or attribute == -1
+                    or not _CLASS_VALUE_TAIL.match(buffer, attribute, match.start())
+                ):
+                    continue
+                href = _HREF.search(buffer, tag_start, pos)
+                if href:
+                    self._href = href.group(2)
+                    title_start = pos
+            else:
+                match = _ANCHOR_CLOSE.search(buffer, pos)
+                if match is None:
+                    break
+                title = _INNER_TAG.sub("", buffer[title_start : match.start()])
+                self.results.append({"title": title, "url": self._href})
+                self._href = None
+                pos = match.end()
+                if self.done:
+                    self._buffer = ""
+                    return
+
+        if self._href is not None:
+            # The title continues in the next chunk.
+            self._buffer = buffer[title_start:]
+            return
+        # Only a tag cut off at the chunk boundary needs to be carried over.
+        cut = buffer.rfind("<", pos)
+        self._buffer = buffer[cut:] if cut != -1 and buffer.find(">", cut) == -1 else ""
+
+
+async def parse_stream(
+    chunks: AsyncIterable[bytes],
+    max_results: Optional[int] = None,
+    encoding: str = "utf-8",
+) -> List[Dict[str, str]]:
+    """Parse result links from a byte stream, stopping early once enough are found."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = ResultLinkParser(max_results)
+    async for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+    return parser.results
+
+
+def parse_results(html: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+    parser = ResultLinkParser(max_results)
+    parser.feed(html)
+    return parser.results
@@ -0,0 +1,304 @@
+"""Embedding-based near-duplicate lookup for cached LLM prompts.
+
+The index stores one L2-normalised vector per cached prompt in a float32
+matrix, optionally backed by a memory-mapped ``.npy`` file so it survives
+restarts without being loaded into the Python heap. The key list is written
+next to it every ``flush_every`` changes and on :meth:`SemanticCache.close`.
+The index holds at most ``capacity`` prompts: removed rows are reused and,
+when full, the least recently used prompt is evicted. A lookup is a single
+matrix-vector product (cosine similarity). Once the index grows past
+``ivf_threshold`` rows it is partitioned into ``n_lists`` k-means buckets and
+only the ``n_probe`` closest buckets are scanned.
+
+The embedding function is pluggable; :class:`HashingEmbedder` is a
+dependency-free default that works offline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from llm_cache import normalize_prompt
+
+Embedder = Callable[[str], np.ndarray]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """Hashing-trick bag of words and character n-grams.
+
+    Uses a stable hash so vectors persisted by one process match vectors
+    computed by another.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3) -> None:
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str) -> List[str]:
+        normalized = normalize_prompt(text)
+        features = _TOKEN_RE.findall(normalized)
+        padded = f" {normalized} "
+        features.extend(
+            padded[i : i + self.ngram] for i in range(max(len(padded) - self.ngram + 1, 0))
+        )
+        return features
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Map prompts to the cache key of the most similar previously seen prompt.
+
+    :meth:`alookup` scans indexes of ``offload_rows`` or more rows in a worker
+    thread so the event loop is not blocked by the matrix product.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        *,
+        dim: Optional[int] = None,
+        threshold: float = 0.9,
+        capacity: int = 1024,
+        ivf_threshold: int = 4096,
+        n_lists: int = 64,
+        n_probe: int = 4,
+        flush_every: int = 64,
+        offload_rows: int = 2048,
+    ) -> None:
+        self.embedder = embedder or HashingEmbedder(dim or 256)
+        self.dim = dim or getattr(self.embedder, "dim", None) or len(self.embedder("probe"))
+        self.threshold = threshold
+        self.ivf_threshold = ivf_threshold
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.flush_every = flush_every
+        self.offload_rows = offload_rows
+        self.capacity = max(capacity, 1)
+        self.evictions = 0
+        self._unflushed = 0
+        self.path = Path(path) if path else None
+        self._keys: List[Optional[str]] = []
+        # Row of each indexed key, least recently used first.
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._indexed_rows = 0
+        self._written_since_ivf = 0
+        self._vectors = self._open(self.capacity)
+        while len(self._rows) > self.capacity:
+            self._evict()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    @property
+    def _keys_path(self) -> Optional[Path]:
+        return self.path.with_suffix(".keys.json") if self.path else None
+
+    def _allocate(self, path: Path, capacity: int) -> np.ndarray:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(capacity, self.dim)
+        )
+
+    def _open(self, capacity: int) -> np.ndarray:
+        if self.path is None:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        if not self.path.exists():
+            return self._allocate(self.path, capacity)
+        # An existing matrix is never recreated: without its key list the
+        # rows are unreachable and get overwritten by later additions.
+        vectors = np.load(self.path, mmap_mode="r+")
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"{self.path} holds vectors of shape {vectors.shape[1:]}, expected ({self.dim},)"
+            )
+        if self._keys_path.exists():
+            self._keys = json.loads(self._keys_path.read_text(encoding="utf-8"))[: len(vectors)]
+            self._rows = OrderedDict(
+                (key, row) for row, key in enumerate(self._keys) if key is not None
+            )
+            self._free = [row for row, key in enumerate(self._keys) if key is None]
+        return vectors
+
+    def _grow(self) -> None:
+        count = len(self._keys)
+        capacity = min(max(self._vectors.shape[0] * 2, 1), self.capacity)
+        if self.path is None:
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:count] = self._vectors[:count]
+            self._vectors = grown
+            return
+        # Build the larger matrix beside the old one and swap it in, so a
+        # crash mid-way leaves the previous file intact.
+        scratch = self.path.with_name(self.path.name + ".tmp")
+        grown = self._allocate(scratch, capacity)
+        grown[:count] = self._vectors[:count]
+        grown.flush()
+        del grown
+        self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        os.replace(scratch, self.path)
+        self._vectors = np.load(self.path, mmap_mode="r+")
+
+    def flush(self) -> None:
+        """Persist the key list and flush the memory-mapped matrix."""
+        self._unflushed = 0
+        if self.path is None:
+            return
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        self._keys_path.write_text(json.dumps(self._keys), encoding="utf-8")
+
+    def close(self) -> None:
+        self.flush()
+
+    def _changed(self) -> None:
+        self._unflushed += 1
+        if self.path is not None and self._unflushed >= self.flush_every:
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+    def add(self, key: str, text: str) -> None:
+        """Index ``text`` as the prompt whose response is cached under ``key``."""
+        vector = self.embedder(text).astype(np.float32, copy=False)
+        row = self._rows.get(key)
+        if row is None:
+            if len(self._rows) >= self.capacity:
+                self._evict()
+            row = self._free.pop() if self._free else self._append_row()
+            self._keys[row] = key
+            self._rows[key] = row
+        else:
+            self._rows.move_to_end(key)
+        self._vectors[row] = vector
+        self._written_since_ivf += 1
+        if self._centroids is not None:
+            self._assign(row)
+        # Re-partition once the index doubled or its rows were rewritten.
+        if len(self._keys) >= self.ivf_threshold and (
+            self._centroids is None or self._written_since_ivf >= self._indexed_rows
+        ):
+            self._build_ivf()
+        self._changed()
+
+    def _append_row(self) -> int:
+        row = len(self._keys)
+        if row >= self._vectors.shape[0]:
+            self._grow()
+        self._keys.append(None)
+        return row
+
+    def _evict(self) -> None:
+        key = next(iter(self._rows))
+        self.remove(key)
+        self.evictions += 1
+
+    def remove(self, key: str) -> None:
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._keys[row] = None
+            self._vectors[row] = 0.0
+            self._free.append(row)
+            self._changed()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def lookup(self, text: str, prefix: str = "") -> Optional[Tuple[str, float]]:
+        """Return ``(key, similarity)`` of the best match above ``threshold``.
+
+        Only keys starting with ``prefix`` are considered, which keeps
+        per-model namespaces apart.
+        """
+        return self._touch(self._search(text, prefix))
+
+    async def alookup(self, text: str, prefix: str = "") -> Optional[Tuple[str, float]]:
+        """:meth:`lookup` that scans a large index in a worker thread."""
+        if len(self._keys) < self.offload_rows:
+            return self.lookup(text, prefix)
+        return self._touch(await asyncio.to_thread(self._search, text, prefix))
+
+    def _touch(self, match: Optional[Tuple[str, float]]) -> Optional[Tuple[str, float]]:
+        if match is not None and match[0] in self._rows:
+            self._rows.move_to_end(match[0])
+        return match
+
+    def _search(self, text: str, prefix: str) -> Optional[Tuple[str, float]]:
+        count = len(self._keys)
+        if not count:
+            return None
+        query = self.embedder(text).astype(np.float32, copy=False)
+        candidates = self._candidate_rows(query, count)
+        vectors = self._vectors[:count] if candidates is None else self._vectors[candidates]
+        scores = vectors @ query
+        above = np.nonzero(scores >= self.threshold)[0]
+        for index in above[np.argsort(scores[above])[::-1]]:
+            row = int(index if candidates is None else candidates[index])
+            key = self._keys[row]
+            if key is not None and key.startswith(prefix):
+                return key, float(scores[index])
+        return None
+
+    def _candidate_rows(self, query: np.ndarray, count: int) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        probes = np.argsort(self._centroids @ query)[::-1][: self.n_probe]
+        return np.nonzero(np.isin(self._assignments[:count], probes))[0]
+
+    # ------------------------------------------------------------------
+    # IVF partitioning
+    # ------------------------------------------------------------------
+    def _build_ivf(self, iterations: int = 8) -> None:
+        count = len(self._keys)
+        n_lists = min(self.n_lists, count)
+        data = np.asarray(self._vectors[:count])
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(count, n_lists, replace=False)].copy()
+        assignments = np.zeros(count, dtype=np.int32)
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+            for bucket in range(n_lists):
+                members = data[assignments == bucket]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[bucket] = centroid / norm if norm else centroid
+        self._centroids = centroids
+        self._assignments = np.zeros(self._vectors.shape[0], dtype=np.int32)
+        self._assignments[:count] = assignments
+        self._indexed_rows = count
+        self._written_since_ivf = 0
+
+    def _assign(self, row: int) -> None:
+        if row >= len(self._assignments):
+            grown = np.zeros(self._vectors.shape[0], dtype=np.int32)
+            grown[: len(self._assignments)] = self._assignments
+            self._assignments = grown
+        self._assignments[row] = int(np.argmax(self._centroids @ self._vectors[row]))
@@ -0,0 +1,464 @@
+"""Scheduling and incremental output capture for ``ToolManager`` shell sessions.
+
+:class:`ShellScheduler` bounds how many commands run at once and applies
+resource limits and timeouts. A :class:`ShellSession` pumps a subprocess's
+stdout and stderr into an :class:`OutputRing` as the data arrives, so callers
+can look at output while the command is still running. The ring keeps at most ``max_bytes`` of the
+most recent output; positions are absolute byte counts since the session
+started, so a reader's cursor stays valid after older output is dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import os
+import signal
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+try:  # pragma: no cover - POSIX only
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+_READ_SIZE = 64 * 1024
+_SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+class OutputRing:
+    """Byte-capped buffer of ``(position, stream, data)`` chunks."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(1, max_bytes)
+        self._chunks: Deque[Tuple[int, str, bytes]] = deque()
+        self._size = 0
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        """Position of the oldest byte still held."""
+        return self.end - self._size
+
+    def append(self, stream: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            # Only the tail of an oversized chunk can survive anyway.
+            skipped = len(data) - self.max_bytes
+            self.end += skipped
+            data = data[skipped:]
+        self._chunks.append((self.end, stream, data))
+        self._size += len(data)
+        self.end += len(data)
+        while self._size > self.max_bytes:
+            position, name, oldest = self._chunks.popleft()
+            excess = self._size - self.max_bytes
+            if len(oldest) > excess:
+                self._chunks.appendleft((position + excess, name, oldest[excess:]))
+                self._size -= excess
+            else:
+                self._size -= len(oldest)
+
+    def read(self, cursor: int = 0) -> List[Tuple[int, str, bytes]]:
+        """Return the chunks at or after ``cursor``, trimming the first one."""
+        cursor = max(cursor, self.start)
+        chunks = []
+        for position, stream, data in self._chunks:
+            if position + len(data) <= cursor:
+                continue
+            if position < cursor:
+                data = data[cursor - position :]
+                position = cursor
+            chunks.append((position, stream, data))
+        return chunks
+
+
+def _decode(data: bytes) -> str:
+    return data.decode(errors="ignore")
+
+
+@dataclass
+class ShellLimits:
+    """Resource limits applied to every shell session with ``setrlimit``.
+
+    ``None`` leaves a limit as inherited. Limits are never raised above the
+    parent's hard limit.
+    """
+
+    cpu_seconds: Optional[int] = 600
+    address_space: Optional[int] = None
+    open_files: Optional[int] = 1024
+
+    def rlimits(self) -> List[Tuple[int, int]]:
+        if resource is None:
+            return []
+        pairs = (
+            (resource.RLIMIT_CPU, self.cpu_seconds),
+            (resource.RLIMIT_AS, self.address_space),
+            (resource.RLIMIT_NOFILE, self.open_files),
+        )
+        return [(which, value) for which, value in pairs if value is not None]
+
+
+def _apply_limits(rlimits: List[Tuple[int, int]]) -> None:
+    """``preexec_fn`` run in the child between fork and exec."""
+    for which, value in rlimits:
+        _, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(which, (value, hard))
+
+
+@dataclass
+class ShellStats:
+    """Counters and timings for shell sessions run by a scheduler."""
+
+    started: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    killed: int = 0
+    queue_wait_total: float = 0.0
+    queue_wait_max: float = 0.0
+    run_time_total: float = 0.0
+    run_time_max: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["queue_wait_avg"] = self.queue_wait_total / self.started if self.started else 0.0
+        data["run_time_avg"] = self.run_time_total / self.completed if self.completed else 0.0
+        return data
+
+
+class ShellScheduler:
+    """Admit at most ``max_concurrent`` shell sessions, queueing the rest FIFO."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        *,
+        limits: Optional[ShellLimits] = None,
+        timeout: Optional[float] = None,
+        kill_grace: float = 5.0,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.limits = limits if limits is not None else ShellLimits()
+        self.timeout = timeout
+        self.kill_grace = kill_grace
+        self.stats = ShellStats()
+        self._running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def has_free_slot(self) -> bool:
+        return self._running < self.max_concurrent and not self._waiters
+
+    def reserve(self) -> Optional[asyncio.Future]:
+        """Take a free slot now (``None``) or join the queue (a future).
+
+        Reserving is synchronous so queue order is the order of submission.
+        """
+        if self.has_free_slot():
+            self._running += 1
+            return None
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        return waiter
+
+    async def wait(self, ticket: Optional[asyncio.Future]) -> None:
+        """Wait until the slot reserved by ``ticket`` is handed over.
+
+        Cancelling the ticket or the waiting task gives up the place in the
+        queue.
+        """
+        if ticket is None:
+            return
+        try:
+            # ``release`` hands its slot straight to the waiter.
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                self.release()
+            elif ticket in self._waiters:
+                self._waiters.remove(ticket)
+            raise
+
+    async def acquire(self) -> None:
+        await self.wait(self.reserve())
+
+    def record_started(self, queue_wait: float) -> None:
+        self.stats.started += 1
+        self.stats.queue_wait_total += queue_wait
+        self.stats.queue_wait_max = max(self.stats.queue_wait_max, queue_wait)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+    def spawn_options(self) -> Dict[str, Any]:
+        """Keyword arguments for ``create_subprocess_shell``."""
+        if os.name != "posix":  # pragma: no cover - no process groups or rlimits
+            return {}
+        options: Dict[str, Any] = {"start_new_session": True}
+        rlimits = self.limits.rlimits()
+        if rlimits:
+            options["preexec_fn"] = partial(_apply_limits, rlimits)
+        return options
+
+    def record_finished(self, session: "ShellSession") -> None:
+        if session.run_time is None:
+            return
+        self.stats.completed += 1
+        self.stats.run_time_total += session.run_time
+        self.stats.run_time_max = max(self.stats.run_time_max, session.run_time)
+        if session.timed_out:
+            self.stats.timed_out += 1
+        elif session.killed:
+            self.stats.killed += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "running": self._running,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+class ShellSession:
+    """A queued, running or finished shell command and its captured output.
+
+    The command waits for a slot from ``scheduler``, runs in its own process
+    group and is stopped after ``timeout`` seconds: SIGTERM to the group
+    first, SIGKILL if it is still alive ``scheduler.kill_grace`` seconds later.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        scheduler: ShellScheduler,
+        max_bytes: int,
+        *,
+        cwd: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.command = command
+        self.cwd = cwd
+        self.scheduler = scheduler
+        self.timeout = timeout if timeout is not None else scheduler.timeout
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.output = OutputRing(max_bytes)
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.timed_out = False
+        self.killed = False
+        self.started = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._pumps: Optional[asyncio.Future] = None
+        self._ticket = scheduler.reserve()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def admitted(self) -> bool:
+        """Whether a slot was free when the session was submitted."""
+        return self._ticket is None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def run_time(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    async def _run(self) -> None:
+        slot = False
+        try:
+            try:
+                await self.scheduler.wait(self._ticket)
+            except asyncio.CancelledError:
+                if self.killed:
+                    # Removed from the queue by ``kill``.
+                    return
+                raise
+            slot = True
+            if self.killed:
+                return
+            self.queue_wait = time.monotonic() - self.created_at
+            self.scheduler.record_started(self.queue_wait)
+            self.process = await asyncio.create_subprocess_shell(
+                self.command,
+                cwd=self.cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **self.scheduler.spawn_options(),
+            )
+            self.started_at = time.monotonic()
+            self.started.set()
+            if self.killed:
+                self._signal(_SIGKILL)
+            self._pumps = asyncio.gather(
+                self._pump(self.process.stdout, "stdout"),
+                self._pump(self.process.stderr, "stderr"),
+            )
+            try:
+                await asyncio.wait_for(asyncio.shield(self._pumps), self.timeout)
+            except asyncio.TimeoutError:
+                self.timed_out = True
+                await self.terminate()
+            await self._pumps
+            self.returncode = await self.process.wait()
+        except asyncio.CancelledError:
+            if self._pumps is not None:
+                self._pumps.cancel()
+            raise
+        except Exception as exc:
+            self.error = str(exc)
+            self.scheduler.stats.failed += 1
+        finally:
+            self.started.set()
+            async with self._changed:
+                self.finished_at = time.monotonic()
+                self._changed.notify_all()
+            if slot:
+                self.scheduler.release()
+                self.scheduler.record_finished(self)
+
+    async def _pump(self, stream: Optional[asyncio.StreamReader], name: str) -> None:
+        if stream is None:
+            return
+        while True:
+            data = await stream.read(_READ_SIZE)
+            if not data:
+                return
+            async with self._changed:
+                self.output.append(name, data)
+                self._changed.notify_all()
+
+    def _signal(self, sig: int) -> None:
+        if self.process is None:
+            return
+        try:
+            if os.name == "posix":
+                # The shell leads its own group; signal its children too.
+                os.killpg(self.process.pid, sig)
+            elif self.process.returncode is None:  # pragma: no cover - non-POSIX
+                self.process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+    async def terminate(self) -> None:
+        """SIGTERM the process group, then SIGKILL it after the grace period."""
+        self._signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._pumps), self.scheduler.kill_grace)
+        except asyncio.TimeoutError:
+            self._signal(_SIGKILL)
+
+    async def wait(self) -> Optional[int]:
+        await asyncio.wait({self._task})
+        return self.returncode
+
+    def kill(self) -> None:
+        """Stop the command now, or drop it from the queue if not started."""
+        self.killed = True
+        if self.process is not None:
+            self._signal(_SIGKILL)
+        elif self._ticket is not None:
+            self._ticket.cancel()
+
+    async def close(self, grace: float = 1.0) -> None:
+        """Kill the command and stop capturing its output.
+
+        Processes that left the group can keep the pipes open, so the pumps
+        get ``grace`` seconds to drain before being cancelled.
+        """
+        if not self.finished:
+            self.kill()
+        await asyncio.wait({self._task}, timeout=grace)
+        if not self._task.done():
+            self._task.cancel()
+            await asyncio.wait({self._task})
+
+    def status(self) -> str:
+        if self.finished:
+            return "finished"
+        return "running" if self.process is not None else "queued"
+
+    def info(self) -> Dict[str, Any]:
+        """Timing and outcome fields reported alongside the output."""
+        data: Dict[str, Any] = {
+            "queue_wait": self.queue_wait,
+            "run_time": self.run_time,
+        }
+        if self.finished:
+            data["returncode"] = self.returncode
+            data["timed_out"] = self.timed_out
+            if self.error is not None:
+                data["error"] = self.error
+        return data
+
+    def view(self, cursor: int = 0) -> Dict[str, Any]:
+        """Output produced since ``cursor``, split by stream."""
+        chunks = self.output.read(cursor)
+        stdout = b"".join(data for _, stream, data in chunks if stream == "stdout")
+        stderr = b"".join(data for _, stream, data in chunks if stream == "stderr")
+        return {
+            "stdout": _decode(stdout),
+            "stderr": _decode(stderr),
+            "cursor": self.output.end,
+            # Bytes between ``cursor`` and the oldest retained output.
+            "dropped": max(0, self.output.start - cursor),
+        }
+
+    async def stream(self, cursor: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Yield output chunks as they arrive until the process exits.
+
+        Each stream is decoded incrementally, so a UTF-8 character split
+        across two reads arrives whole in the later chunk.
+        """
+        decoders = {
+            name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for name in ("stdout", "stderr")
+        }
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self.output.end > cursor or self.finished
+                )
+                chunks = self.output.read(cursor)
+                # Pumps finish before ``finished_at`` is set, so nothing
+                # can follow the chunks read here.
+                finished = self.finished
+            for position, stream, data in chunks:
+                cursor = position + len(data)
+                text = decoders[stream].decode(data)
+                if text:
+                    yield {"stream": stream, "data": text, "cursor": cursor}
+            if finished:
+                cursor = max(cursor, self.output.end)
+                for stream, decoder in decoders.items():
+                    text = decoder.decode(b"", final=True)
+                    if text:
+                        yield {"stream": stream, "data": text, "cursor": cursor}
+                yield {"status": "finished", "returncode": self.returncode, "cursor": cursor}
+                return
@@ -0,0 +1,154 @@
+"""Shared asynchronous SQLite connection pool.
+
+``StateManager`` and ``ToolManager`` frequently point at the same database
+file. Both acquire a pool from :func:`open_pool`, which hands out one shared
+instance per file: a single writer connection guarded by a lock, so each
+transaction stays atomic, plus a set of read-only connections. With WAL
+enabled, readers see the last committed state and never queue behind the
+writer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiosqlite
+
+DEFAULT_READERS = 4
+
+# Applied to every connection. ``journal_mode`` is persistent and only needs
+# to be set once by the writer.
+CONNECTION_PRAGMAS: Tuple[Tuple[str, str], ...] = (
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", "5000"),
+    ("cache_size", "-16000"),
+    ("mmap_size", str(256 * 1024 * 1024)),
+)
+
+# Weak so that pools owned by managers that were never closed can still be
+# garbage collected, which stops their connection threads.
+_POOLS: "weakref.WeakValueDictionary[str, SQLitePool]" = weakref.WeakValueDictionary()
+
+
+class SQLitePool:
+    """One writer and ``readers`` reader connections to a SQLite database.
+
+    In-memory databases cannot be shared between connections, so for
+    ``":memory:"`` the writer connection also serves reads.
+    """
+
+    def __init__(self, db_path: str, readers: int = DEFAULT_READERS) -> None:
+        self.db_path = db_path
+        self.in_memory = db_path == ":memory:"
+        self.readers = 0 if self.in_memory else max(0, readers)
+        self.writer_connection: Optional[aiosqlite.Connection] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._refs = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.writer_connection is None
+
+    async def open(self) -> "SQLitePool":
+        if not self.closed:
+            return self
+        self._loop = asyncio.get_running_loop()
+        writer = await aiosqlite.connect(self.db_path)
+        if not self.in_memory:
+            await writer.execute("PRAGMA journal_mode=WAL")
+        await self._apply_pragmas(writer)
+        self.writer_connection = writer
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.readers):
+            reader = await aiosqlite.connect(self.db_path)
+            await self._apply_pragmas(reader)
+            await reader.execute("PRAGMA query_only=ON")
+            self._reader_connections.append(reader)
+            self._idle_readers.put_nowait(reader)
+        return self
+
+    @staticmethod
+    async def _apply_pragmas(conn: aiosqlite.Connection) -> None:
+        for name, value in CONNECTION_PRAGMAS:
+            await conn.execute(f"PRAGMA {name}={value}")
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Yield the writer connection with exclusive access for a transaction."""
+        if self.closed:
+            await self.open()
+        async with self._write_lock:
+            yield self.writer_connection
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Yield a read-only connection, or the writer for in-memory pools."""
+        if self.closed:
+            await self.open()
+        if not self._reader_connections:
+            yield self.writer_connection
+            return
+        conn = await self._idle_readers.get()
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    async def close(self) -> None:
+        connections = list(self._reader_connections)
+        if self.writer_connection is not None:
+            connections.append(self.writer_connection)
+        self._reader_connections = []
+        self._idle_readers = None
+        self.writer_connection = None
+        for conn in connections:
+            await conn.close()
+
+    async def release(self) -> None:
+        """Drop one reference and close the pool once nobody uses it."""
+        self._refs -= 1
+        if self._refs > 0:
+            return
+        if _POOLS.get(self._key()) is self:
+            del _POOLS[self._key()]
+        await self.close()
+
+    def _key(self) -> str:
+        return os.path.abspath(self.db_path)
+
+
+async def open_pool(db_path: str, readers: int = DEFAULT_READERS) -> SQLitePool:
+    """Return the shared pool for ``db_path``, opening it on first use.
+
+    Every call must be paired with :meth:`SQLitePool.release`.
+    """
+    if db_path == ":memory:":
+        pool = SQLitePool(db_path, readers)
+        pool._refs = 1
+        return await pool.open()
+
+    loop = asyncio.get_running_loop()
+    key = os.path.abspath(db_path)
+
+    def _usable(candidate: Optional[SQLitePool]) -> bool:
+        # Pools are bound to the loop that opened them.
+        return candidate is not None and not candidate.closed and candidate._loop is loop
+
+    pool = _POOLS.get(key)
+    if not _usable(pool):
+        fresh = await SQLitePool(db_path, readers).open()
+        pool = _POOLS.get(key)
+        if _usable(pool):
+            # Another task opened the pool while we were connecting.
+            await fresh.close()
+        else:
+            pool = _POOLS[key] = fresh
+    pool._refs += 1
+    return pool
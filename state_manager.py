@@ -1,149 +1,763 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
 
 import aiosqlite
-import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+import graph_store
+import plan_store
+from knowledge_graph import BaseKnowledgeGraph, Change, KnowledgeGraph
+from sqlite_pool import SQLitePool, open_pool
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+
+
+@dataclass
+class FlushMetrics:
+    """Counters describing how mutations were batched into transactions."""
+
+    flushes: int = 0
+    writes: int = 0
+    max_batch: int = 0
+    last_batch: int = 0
+    total_flush_seconds: float = 0.0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    failures: int = 0
+
+    def record(self, batch: int, seconds: float) -> None:
+        self.flushes += 1
+        self.writes += batch
+        self.last_batch = batch
+        self.max_batch = max(self.max_batch, batch)
+        self.last_flush_seconds = seconds
+        self.total_flush_seconds += seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+    @property
+    def avg_batch(self) -> float:
+        return self.writes / self.flushes if self.flushes else 0.0
+
+    @property
+    def avg_flush_seconds(self) -> float:
+        return self.total_flush_seconds / self.flushes if self.flushes else 0.0
+
+
+@dataclass
+class _PendingWrites:
+    """Mutations staged since the last flush, coalesced per target row."""
+
+    state: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    truncated: Set[str] = field(default_factory=set)
+    messages: List[Tuple[Any, ...]] = field(default_factory=list)
+    long_term: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    graph: List[Change] = field(default_factory=list)
+    # Plan runs whose step rows are replaced, and per-step checkpoints.
+    runs: Dict[str, Tuple[str, List[Tuple[Any, str]]]] = field(default_factory=dict)
+    # Steps appended to a run after it started, as (session_id, run_id, step, action).
+    run_steps: List[Tuple[str, str, Any, str]] = field(default_factory=list)
+    steps: Dict[Tuple[str, Any], Dict[str, Any]] = field(default_factory=dict)
+    tool_calls: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    # Sessions whose recorded tool calls are deleted before new ones are written.
+    tool_calls_cleared: Set[str] = field(default_factory=set)
+    count: int = 0
+
+    def merge_older(self, older: "_PendingWrites") -> None:
+        """Fold a batch that failed to flush back in front of newer writes."""
+        for key, value in older.state.items():
+            self.state.setdefault(key, value)
+        self.messages = [
+            row for row in older.messages if row[0] not in self.truncated
+        ] + self.messages
+        self.truncated |= older.truncated
+        for session_id, fields in older.long_term.items():
+            merged = dict(fields)
+            merged.update(self.long_term.get(session_id, {}))
+            self.long_term[session_id] = merged
+        self.graph = older.graph + self.graph
+        # A newer run replaces the older batch's checkpoints for its session.
+        restarted = set(self.runs)
+        for session_id, run in older.runs.items():
+            self.runs.setdefault(session_id, run)
+        self.run_steps = older.run_steps + self.run_steps
+        for key, fields in older.steps.items():
+            if key[0] in restarted:
+                continue
+            merged = dict(fields)
+            merged.update(self.steps.get(key, {}))
+            self.steps[key] = merged
+        for key, value in older.tool_calls.items():
+            if value[0] not in self.tool_calls_cleared:
+                self.tool_calls.setdefault(key, value)
+        self.tool_calls_cleared |= older.tool_calls_cleared
+        self.count += older.count
 
-from knowledge_graph import KnowledgeGraph
 
 class StateManager:
-    """Persist and restore Cappuccino agent state using SQLite."""
-    def __init__(self, db_path: str = "agent_state.db") -> None:
+    """Persist and restore Cappuccino agent state using SQLite.
+
+    Conversation history lives in an append-only ``messages`` table so that
+    persisting a turn only writes the new messages instead of the whole
+    history blob. Plan, phase, history and long-term plan are all scoped by a
+    ``session_id``; callers that do not pass one share ``DEFAULT_SESSION``.
+
+    With ``write_behind=True`` mutations are staged in memory and a background
+    task commits them in one transaction every ``flush_interval_ms`` or once
+    ``flush_max_writes`` mutations are pending. Reads flush first, and
+    ``close()`` always flushes, so callers observe their own writes.
+    """
+    def __init__(
+        self,
+        db_path: str = "agent_state.db",
+        *,
+        write_behind: bool = False,
+        flush_interval_ms: int = 50,
+        flush_max_writes: int = 256,
+    ) -> None:
         self.db_path = db_path
-        self._conn: Optional[aiosqlite.Connection] = None
-
-    async def _get_conn(self) -> aiosqlite.Connection:
-        if self._conn is None:
-            self._conn = await aiosqlite.connect(self.db_path)
-            await self._conn.execute(
-                """CREATE TABLE IF NOT EXISTS agent_state (
-                        key TEXT PRIMARY KEY,
-                        value TEXT
-                )"""
-            )
-            await self._conn.execute(
-                """CREATE TABLE IF NOT EXISTS long_term_plan (
-                        id INTEGER PRIMARY KEY,
-                        plan TEXT,
-                        current_step INTEGER
-                )"""
-            )
-            await self._conn.commit()
-        return self._conn
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_writes = flush_max_writes
+        self.metrics = FlushMetrics()
+        self._pool: Optional[SQLitePool] = None
+        # Number of messages already stored per session (next ``seq``).
+        self._message_counts: Dict[str, int] = {}
+        self._pool_lock = asyncio.Lock()
+        self._pending = _PendingWrites()
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        # Multi-plan store; writes commit directly rather than via staging.
+        self.plans = plan_store.PlanStore(self._get_pool)
 
-    async def load(self) -> Dict[str, Any]:
-        conn = await self._get_conn()
-        async with conn.execute("SELECT key, value FROM agent_state") as cur:
-            rows = await cur.fetchall()
-        data = {k: v for k, v in rows}
-        task_plan = json.loads(data.get("task_plan", "[]"))
-        history = json.loads(data.get("history", "[]"))
-        phase = int(data.get("phase", "0"))
-        return {"task_plan": task_plan, "history": history, "phase": phase}
+    async def _get_pool(self) -> SQLitePool:
+        if self._pool is not None:
+            return self._pool
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = await open_pool(self.db_path)
+                async with pool.writer() as conn:
+                    await self._create_schema(conn)
+                self._pool = pool
+        return self._pool
 
-    async def save(self, task_plan: List[Dict[str, Any]], history: List[Dict[str, Any]], phase: int) -> None:
-        conn = await self._get_conn()
+    async def _create_schema(self, conn: aiosqlite.Connection) -> None:
+        await conn.execute(
+            """CREATE TABLE IF NOT EXISTS agent_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+            )"""
+        )
         await conn.execute(
-            "REPLACE INTO agent_state (key, value) VALUES (?, ?)",
-            ("task_plan", json.dumps(task_plan)),
+            """CREATE TABLE IF NOT EXISTS session_state (
+                    session_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    PRIMARY KEY (session_id, key)
+            )"""
         )
         await conn.execute(
-            "REPLACE INTO agent_state (key, value) VALUES (?, ?)",
-            ("history", json.dumps(history)),
+            """CREATE TABLE IF NOT EXISTS long_term_plan (
+                    id INTEGER PRIMARY KEY,
+                    plan TEXT,
+                    current_step INTEGER,
+                    session_id TEXT
+            )"""
         )
         await conn.execute(
-            "REPLACE INTO agent_state (key, value) VALUES (?, ?)",
-            ("phase", str(phase)),
+            """CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT,
+                    content TEXT,
+                    extra TEXT,
+                    PRIMARY KEY (session_id, seq)
+            )"""
         )
+        await conn.execute(
+            """CREATE TABLE IF NOT EXISTS plan_steps (
+                    session_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    run_id TEXT NOT NULL,
+                    action TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    output TEXT,
+                    error TEXT,
+                    idempotency_key TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (session_id, step)
+            )"""
+        )
+        await conn.execute(
+            """CREATE TABLE IF NOT EXISTS tool_calls (
+                    idempotency_key TEXT PRIMARY KEY,
+                    session_id TEXT,
+                    output TEXT,
+                    created_at REAL
+            )"""
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tool_calls_session ON tool_calls(session_id)"
+        )
+        await graph_store.create_schema(conn)
+        await plan_store.create_schema(conn)
+        await self._migrate_history_blob(conn)
+        await self._migrate_legacy_state(conn)
         await conn.commit()
 
+    async def _migrate_history_blob(self, conn: aiosqlite.Connection) -> None:
+        """Move a legacy ``agent_state.history`` JSON blob into ``messages``."""
+        async with conn.execute(
+            "SELECT value FROM agent_state WHERE key='history'"
+        ) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            return
+        async with conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE session_id=?", (DEFAULT_SESSION,)
+        ) as cur:
+            existing = (await cur.fetchone())[0]
+        if not existing:
+            history = json.loads(row[0] or "[]")
+            await conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, extra) VALUES (?, ?, ?, ?, ?)",
+                self._message_rows(DEFAULT_SESSION, 0, history),
+            )
+        await conn.execute("DELETE FROM agent_state WHERE key='history'")
+
+    async def _migrate_legacy_state(self, conn: aiosqlite.Connection) -> None:
+        """Scope pre-session ``agent_state`` keys and ``long_term_plan`` rows."""
+        await conn.execute(
+            "INSERT OR IGNORE INTO session_state (session_id, key, value) "
+            "SELECT ?, key, value FROM agent_state",
+            (DEFAULT_SESSION,),
+        )
+        await conn.execute("DELETE FROM agent_state")
+        async with conn.execute("PRAGMA table_info(long_term_plan)") as cur:
+            columns = {row[1] for row in await cur.fetchall()}
+        if "session_id" not in columns:
+            await conn.execute("ALTER TABLE long_term_plan ADD COLUMN session_id TEXT")
+        await conn.execute(
+            "UPDATE long_term_plan SET session_id=? WHERE session_id IS NULL",
+            (DEFAULT_SESSION,),
+        )
+        await conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_long_term_plan_session ON long_term_plan(session_id)"
+        )
+
+    @staticmethod
+    def _message_rows(
+        session_id: str, start_seq: int, messages: Iterable[Dict[str, Any]]
+    ) -> List[Tuple[Any, ...]]:
+        rows = []
+        for seq, message in enumerate(messages, start=start_seq):
+            extra = {k: v for k, v in message.items() if k not in ("role", "content")}
+            content = message.get("content")
+            if content is not None and not isinstance(content, str):
+                # Structured content (e.g. multimodal parts) round-trips via ``extra``.
+                extra["content"] = content
+                content = None
+            rows.append(
+                (
+                    session_id,
+                    seq,
+                    message.get("role"),
+                    content,
+                    json.dumps(extra) if extra else None,
+                )
+            )
+        return rows
+
+    @staticmethod
+    def _row_to_message(role: Optional[str], content: Optional[str], extra: Optional[str]) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"role": role, "content": content}
+        if extra:
+            message.update(json.loads(extra))
+        return message
+
+    async def _message_count(self, session_id: str) -> int:
+        count = self._message_counts.get(session_id)
+        if count is None:
+            # Read through the writer so an in-flight flush is accounted for.
+            pool = await self._get_pool()
+            async with pool.writer() as conn:
+                async with conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id=?",
+                    (session_id,),
+                ) as cur:
+                    count = (await cur.fetchone())[0]
+            self._message_counts[session_id] = count
+        return count
+
+    # ------------------------------------------------------------------
+    # Write staging and flushing
+    # ------------------------------------------------------------------
+    async def _staged(self) -> None:
+        """Account for one staged mutation and flush according to the mode."""
+        self._pending.count += 1
+        if not self.write_behind:
+            await self.flush()
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if self._pending.count >= self.flush_max_writes:
+            self._flush_wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as exc:  # pragma: no cover - logged and retried
+                LOGGER.error("Background state flush failed: %s", exc)
+
+    async def _flush_pending(self) -> None:
+        if self._pending.count:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Commit all staged mutations in a single transaction."""
+        async with self._flush_lock:
+            if not self._pending.count:
+                return
+            # Swap the batch out only once the writer is held, so a failure
+            # to open the database leaves the staged writes in place.
+            pool = await self._get_pool()
+            async with pool.writer() as conn:
+                batch, self._pending = self._pending, _PendingWrites()
+                started = time.perf_counter()
+                try:
+                    await self._write_batch(conn, batch)
+                    await conn.commit()
+                except BaseException:
+                    # Cancellation included: never leave a half-written
+                    # transaction on the shared writer or drop the batch.
+                    await conn.rollback()
+                    self.metrics.failures += 1
+                    self._pending.merge_older(batch)
+                    raise
+            self.metrics.record(batch.count, time.perf_counter() - started)
+
+    async def _write_batch(self, conn: aiosqlite.Connection, batch: _PendingWrites) -> None:
+        for session_id in batch.truncated:
+            await conn.execute("DELETE FROM messages WHERE session_id=?", (session_id,))
+        if batch.messages:
+            await conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, extra) VALUES (?, ?, ?, ?, ?)",
+                batch.messages,
+            )
+        if batch.state:
+            await conn.executemany(
+                "REPLACE INTO session_state (session_id, key, value) VALUES (?, ?, ?)",
+                [(sid, key, value) for (sid, key), value in batch.state.items()],
+            )
+        for session_id, fields in batch.long_term.items():
+            if "plan" in fields:
+                await conn.execute(
+                    """
+                    INSERT INTO long_term_plan(session_id, plan, current_step)
+                    VALUES(?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET plan=excluded.plan, current_step=excluded.current_step
+                    """,
+                    (session_id, fields["plan"], fields.get("current_step", 0)),
+                )
+            else:
+                await conn.execute(
+                    "UPDATE long_term_plan SET current_step=? WHERE session_id=?",
+                    (fields["current_step"], session_id),
+                )
+        if batch.graph:
+            await graph_store.apply_changes(conn, batch.graph)
+        for session_id, (run_id, steps) in batch.runs.items():
+            await conn.execute("DELETE FROM plan_steps WHERE session_id=?", (session_id,))
+            await conn.executemany(
+                "INSERT INTO plan_steps (session_id, step, run_id, action, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, str(step), run_id, action, time.time()) for step, action in steps],
+            )
+        if batch.run_steps:
+            # Rows of a run that a newer one in this batch replaced are ignored
+            # or left for the next ``start_run`` to delete.
+            await conn.executemany(
+                "INSERT OR IGNORE INTO plan_steps (session_id, step, run_id, action, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, str(step), run_id, action, time.time())
+                    for session_id, run_id, step, action in batch.run_steps
+                ],
+            )
+        for (session_id, step), fields in batch.steps.items():
+            columns = ", ".join(f"{name}=?" for name in fields)
+            await conn.execute(
+                f"UPDATE plan_steps SET {columns} WHERE session_id=? AND step=?",
+                (*fields.values(), session_id, str(step)),
+            )
+        if batch.tool_calls_cleared:
+            await conn.executemany(
+                "DELETE FROM tool_calls WHERE session_id=?",
+                [(session_id,) for session_id in batch.tool_calls_cleared],
+            )
+        if batch.tool_calls:
+            await conn.executemany(
+                "INSERT OR REPLACE INTO tool_calls (idempotency_key, session_id, output, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, sid, output, time.time()) for key, (sid, output) in batch.tool_calls.items()],
+            )
+
+    async def _fetchall(self, query: str, params: Iterable[Any] = ()) -> List[Tuple[Any, ...]]:
+        pool = await self._get_pool()
+        async with pool.reader() as conn:
+            async with conn.execute(query, tuple(params)) as cur:
+                return list(await cur.fetchall())
+
+    def _stage_state(self, session_id: str, **values: str) -> None:
+        for key, value in values.items():
+            self._pending.state[(session_id, key)] = value
+
+    async def load(self, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT key, value FROM session_state WHERE session_id=?", (session_id,)
+        )
+        data = {k: v for k, v in rows}
+        task_plan = json.loads(data.get("task_plan", "[]"))
+        history = [
+            {k: v for k, v in message.items() if k != "seq"}
+            for message in await self.load_history(session_id=session_id)
+        ]
+        phase = int(data.get("phase", "0"))
+        return {"task_plan": task_plan, "history": history, "phase": phase}
+
+    async def save(
+        self,
+        task_plan: List[Dict[str, Any]],
+        history: List[Dict[str, Any]],
+        phase: int,
+        session_id: str = DEFAULT_SESSION,
+    ) -> None:
+        """Persist plan and phase, writing only history messages not yet stored.
+
+        ``history`` is expected to grow append-only; if it is shorter than the
+        stored conversation it is treated as a rewrite and replaced wholesale.
+        """
+        stored = await self._message_count(session_id)
+        if len(history) < stored:
+            self._truncate_messages(session_id)
+            stored = 0
+        self._stage_messages(session_id, stored, history[stored:])
+        self._stage_state(session_id, task_plan=json.dumps(task_plan), phase=str(phase))
+        await self._staged()
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop cached bookkeeping for a session evicted by the caller."""
+        if any(row[0] == session_id for row in self._pending.messages):
+            return
+        self._message_counts.pop(session_id, None)
+
+    async def list_sessions(self) -> List[str]:
+        """Return the ids of all sessions with stored state or history."""
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT session_id FROM session_state UNION SELECT session_id FROM messages"
+        )
+        return sorted(row[0] for row in rows)
+
     async def close(self) -> None:
-        if self._conn is not None:
-            await self._conn.close()
-            self._conn = None
+        if self._flusher is not None:
+            # Let a flush that is already running finish instead of cancelling it.
+            self._closing = True
+            self._flush_wakeup.set()
+            try:
+                await self._flusher
+            finally:
+                self._closing = False
+                self._flusher = None
+        await self._flush_pending()
+        if self._pool is not None:
+            await self._pool.release()
+            self._pool = None
+        self._message_counts.clear()
+
+    # ------------------------------------------------------------------
+    # Conversation history
+    # ------------------------------------------------------------------
+    def _truncate_messages(self, session_id: str) -> None:
+        self._pending.truncated.add(session_id)
+        self._pending.messages = [
+            row for row in self._pending.messages if row[0] != session_id
+        ]
+        self._message_counts[session_id] = 0
+
+    def _stage_messages(
+        self, session_id: str, start_seq: int, messages: List[Dict[str, Any]]
+    ) -> None:
+        self._pending.messages.extend(self._message_rows(session_id, start_seq, messages))
+        self._message_counts[session_id] = start_seq + len(messages)
+
+    async def append_messages(
+        self, messages: List[Dict[str, Any]], session_id: str = DEFAULT_SESSION
+    ) -> int:
+        """Append ``messages`` to the stored history and return the next ``seq``."""
+        start = await self._message_count(session_id)
+        self._stage_messages(session_id, start, messages)
+        await self._staged()
+        return start + len(messages)
+
+    async def load_history(
+        self,
+        limit: Optional[int] = None,
+        before_seq: Optional[int] = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` messages older than ``before_seq``, oldest first.
+
+        Each message carries its ``seq`` so callers can page backwards by
+        passing the smallest ``seq`` they have seen as the next ``before_seq``.
+        """
+        await self._flush_pending()
+        query = "SELECT seq, role, content, extra FROM messages WHERE session_id=?"
+        params: List[Any] = [session_id]
+        if before_seq is not None:
+            query += " AND seq < ?"
+            params.append(before_seq)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = await self._fetchall(query, params)
+        return [
+            {"seq": seq, **self._row_to_message(role, content, extra)}
+            for seq, role, content, extra in reversed(rows)
+        ]
 
 
     # Planner convenience methods
-    async def save_plan(self, task_plan: List[Dict[str, Any]], current_step: int = 0) -> None:
+    async def save_plan(
+        self,
+        task_plan: List[Dict[str, Any]],
+        current_step: int = 0,
+        session_id: str = DEFAULT_SESSION,
+    ) -> None:
         """Persist a task plan and current step."""
-        data = await self.load()
-        history = data.get("history", [])
-        await self.save(task_plan, history, current_step)
+        self._stage_state(session_id, task_plan=json.dumps(task_plan), phase=str(current_step))
+        await self._staged()
 
-    async def load_plan(self) -> Dict[str, Any]:
+    async def load_plan(self, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """Load just the task plan and current step."""
-        data = await self.load()
-        return {"task_plan": data.get("task_plan", []), "current_step": data.get("phase", 0)}
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT key, value FROM session_state WHERE session_id=? AND key IN ('task_plan', 'phase')",
+            (session_id,),
+        )
+        data = {k: v for k, v in rows}
+        return {
+            "task_plan": json.loads(data.get("task_plan", "[]")),
+            "current_step": int(data.get("phase", "0")),
+        }
 
-    async def update_step(self, step: int) -> None:
+    async def update_step(self, step: int, session_id: str = DEFAULT_SESSION) -> None:
         """Update the current step while preserving plan and history."""
-        data = await self.load()
-        await self.save(data.get("task_plan", []), data.get("history", []), step)
+        self._stage_state(session_id, phase=str(step))
+        await self._staged()
 
     # ------------------------------------------------------------------
+    # Plan execution checkpoints
+    # ------------------------------------------------------------------
+    async def start_run(
+        self,
+        run_id: str,
+        query: str,
+        task_plan: List[Dict[str, Any]],
+        session_id: str = DEFAULT_SESSION,
+    ) -> None:
+        """Record a new plan execution, replacing the session's previous one.
+
+        Every step starts ``pending``; :meth:`checkpoint_step` moves it through
+        ``running`` to ``done`` or ``failed``. Tool calls recorded for the
+        replaced run are deleted.
+        """
+        steps = [
+            (task.get("step", index), task.get("action", ""))
+            for index, task in enumerate(task_plan, start=1)
+        ]
+        self._pending.runs[session_id] = (run_id, steps)
+        self._clear_tool_calls(session_id)
+        self._pending.steps = {
+            key: value for key, value in self._pending.steps.items() if key[0] != session_id
+        }
+        self._stage_state(
+            session_id,
+            task_plan=json.dumps(task_plan),
+            plan_run=json.dumps({"run_id": run_id, "query": query, "status": "running"}),
+        )
+        await self._staged()
+
+    async def add_run_steps(
+        self,
+        run_id: str,
+        steps: List[Dict[str, Any]],
+        task_plan: List[Dict[str, Any]],
+        session_id: str = DEFAULT_SESSION,
+    ) -> None:
+        """Add ``pending`` steps planned after :meth:`start_run` to run ``run_id``.
+
+        ``task_plan`` is the run's whole plan so far, stored for resuming.
+        """
+        self._pending.run_steps.extend(
+            (session_id, run_id, task.get("step"), task.get("action", "")) for task in steps
+        )
+        self._stage_state(session_id, task_plan=json.dumps(task_plan))
+        await self._staged()
+
+    async def checkpoint_step(
+        self,
+        step: Any,
+        status: str,
+        *,
+        output: Optional[str] = None,
+        error: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION,
+    ) -> None:
+        """Persist the status and result of one step of the current run."""
+        fields: Dict[str, Any] = {"status": status, "updated_at": time.time()}
+        if output is not None:
+            fields["output"] = output
+        if error is not None:
+            fields["error"] = error
+        if idempotency_key is not None:
+            fields["idempotency_key"] = idempotency_key
+        self._pending.steps.setdefault((session_id, str(step)), {}).update(fields)
+        await self._staged()
+
+    async def finish_run(self, run_id: str, result: str, session_id: str = DEFAULT_SESSION) -> None:
+        """Mark the current run complete so it is not resumed again.
+
+        The run's recorded tool calls are deleted: their idempotency keys
+        include the run id, so no later step can look them up.
+        """
+        self._clear_tool_calls(session_id)
+        self._stage_state(
+            session_id,
+            plan_run=json.dumps({"run_id": run_id, "status": "done", "result": result}),
+        )
+        await self._staged()
+
+    async def load_run(self, session_id: str = DEFAULT_SESSION) -> Optional[Dict[str, Any]]:
+        """Return the latest run with its plan and per-step checkpoints.
+
+        ``steps`` maps the string form of each step number to a dict with
+        ``status``, ``output``, ``error`` and ``idempotency_key``.
+        """
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT key, value FROM session_state WHERE session_id=? AND key IN ('plan_run', 'task_plan')",
+            (session_id,),
+        )
+        data = {k: v for k, v in rows}
+        if "plan_run" not in data:
+            return None
+        run = json.loads(data["plan_run"])
+        run["task_plan"] = json.loads(data.get("task_plan", "[]"))
+        step_rows = await self._fetchall(
+            "SELECT step, status, output, error, idempotency_key FROM plan_steps "
+            "WHERE session_id=? AND run_id=?",
+            (session_id, run["run_id"]),
+        )
+        run["steps"] = {
+            step: {"status": status, "output": output, "error": error, "idempotency_key": key}
+            for step, status, output, error, key in step_rows
+        }
+        return run
+
+    def _clear_tool_calls(self, session_id: str) -> None:
+        self._pending.tool_calls = {
+            key: value for key, value in self._pending.tool_calls.items() if value[0] != session_id
+        }
+        self._pending.tool_calls_cleared.add(session_id)
+
+    async def record_tool_call(
+        self, idempotency_key: str, output: str, session_id: str = DEFAULT_SESSION
+    ) -> None:
+        """Remember the output of a tool call made under ``idempotency_key``."""
+        self._pending.tool_calls[idempotency_key] = (session_id, output)
+        await self._staged()
+
+    async def get_tool_call(self, idempotency_key: str) -> Optional[str]:
+        """Return the recorded output for ``idempotency_key``, if any."""
+        pending = self._pending.tool_calls.get(idempotency_key)
+        if pending is not None:
+            return pending[1]
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT output FROM tool_calls WHERE idempotency_key=?", (idempotency_key,)
+        )
+        return rows[0][0] if rows else None
+
     # ------------------------------------------------------------------
     # Long-term planning helpers
     # ------------------------------------------------------------------
     async def save_long_term_plan(
-        self, plan: List[Dict[str, Any]], current_step: int = 0
+        self,
+        plan: List[Dict[str, Any]],
+        current_step: int = 0,
+        session_id: str = DEFAULT_SESSION,
     ) -> None:
         """Persist a long-term plan and progress."""
-        conn = await self._get_conn()
-        await conn.execute(
-            """
-            INSERT INTO long_term_plan(id, plan, current_step)
-            VALUES(1, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET plan=excluded.plan, current_step=excluded.current_step
-            """,
-            (json.dumps(plan), current_step),
-        )
-        await conn.commit()
+        self._pending.long_term[session_id] = {
+            "plan": json.dumps(plan),
+            "current_step": current_step,
+        }
+        await self._staged()
 
-    async def load_long_term_plan(self) -> Dict[str, Any]:
+    async def load_long_term_plan(self, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """Return the stored long-term plan and current progress."""
-        conn = await self._get_conn()
-        async with conn.execute(
-            "SELECT plan, current_step FROM long_term_plan WHERE id=1"
-        ) as cur:
-            row = await cur.fetchone()
+        await self._flush_pending()
+        rows = await self._fetchall(
+            "SELECT plan, current_step FROM long_term_plan WHERE session_id=?",
+            (session_id,),
+        )
+        row = rows[0] if rows else None
         if row:
             return {"plan": json.loads(row[0]), "current_step": row[1]}
         return {"plan": [], "current_step": 0}
 
-    async def update_long_term_step(self, step: int) -> None:
+    async def update_long_term_step(self, step: int, session_id: str = DEFAULT_SESSION) -> None:
         """Update progress for the long-term plan."""
-        conn = await self._get_conn()
-        await conn.execute(
-            "UPDATE long_term_plan SET current_step=? WHERE id=1",
-            (step,),
-        )
-        await conn.commit()
+        self._pending.long_term.setdefault(session_id, {})["current_step"] = step
+        await self._staged()
 
     # ------------------------------------------------------------------
     # Knowledge graph persistence
     # ------------------------------------------------------------------
 
-    async def load_graph(self) -> KnowledgeGraph:
-        """Load the persisted knowledge graph or return an empty one."""
-        conn = await self._get_conn()
-        await conn.execute(
-            "CREATE TABLE IF NOT EXISTS knowledge_graph (id INTEGER PRIMARY KEY, data TEXT)"
-        )
-        async with conn.execute(
-            "SELECT data FROM knowledge_graph WHERE id=1"
-        ) as cur:
-            row = await cur.fetchone()
-        if row and row[0]:
-            return KnowledgeGraph.from_json(row[0])
-        return KnowledgeGraph()
+    async def load_graph(
+        self, graph_class: Type[BaseKnowledgeGraph] = KnowledgeGraph
+    ) -> BaseKnowledgeGraph:
+        """Load the persisted knowledge graph or return an empty one.
 
-    async def save_graph(self, graph: KnowledgeGraph) -> None:
-        """Persist the knowledge graph."""
-        conn = await self._get_conn()
-        await conn.execute(
-            "CREATE TABLE IF NOT EXISTS knowledge_graph (id INTEGER PRIMARY KEY, data TEXT)"
-        )
-        await conn.execute(
-            "INSERT INTO knowledge_graph(id, data) VALUES(1, ?) ON CONFLICT(id) DO UPDATE SET data=excluded.data",
-            (graph.to_json(),),
-        )
-        await conn.commit()
+        ``graph_class`` selects the in-memory representation, e.g.
+        :class:`compact_graph.CompactKnowledgeGraph` for large graphs.
+        """
+        await self._flush_pending()
+        pool = await self._get_pool()
+        async with pool.reader() as conn:
+            return await graph_store.load(conn, graph_class)
+
+    async def save_graph(self, graph: BaseKnowledgeGraph) -> None:
+        """Persist changes made to ``graph`` since it was loaded or last saved.
+
+        Only the touched ``kg_nodes``/``kg_edges`` rows are written. A graph
+        that did not come from :meth:`load_graph` replaces the stored one.
+        """
+        self._pending.graph.extend(graph.drain_changes())
+        await self._staged()
@@ -22,3 +22,15 @@ async def test_analyzer_collects_results():
         {"step": 1, "result": "ok"},
         {"step": 2, "result": "done"},
     ]
+
+
+@pytest.mark.asyncio
+async def test_analyzer_orders_out_of_order_results():
+    result_q = asyncio.Queue()
+    await result_q.put({"step": 3, "result": "c"})
+    await result_q.put({"step": 1, "result": "a"})
+    await result_q.put({"step": 2, "result": "b"})
+    await result_q.put(None)
+
+    results = await AnalyzerAgent().analyze(result_q)
+    assert [r["result"] for r in results] == ["a", "b", "c"]
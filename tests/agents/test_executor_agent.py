@@ -25,3 +25,60 @@ async def test_execute_with_llm():
     end = await result_q.get()
     assert item == {"step": 1, "result": "HELLO"}
     assert end is None
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently_and_respect_dependencies():
+    order = []
+
+    async def slow_llm(text):
+        order.append(f"start {text}")
+        await asyncio.sleep(0.1)
+        order.append(f"end {text}")
+        return text
+
+    plan_q = asyncio.Queue()
+    result_q = asyncio.Queue()
+    for step in (
+        {"step": 1, "action": "a"},
+        {"step": 2, "action": "b"},
+        {"step": 3, "action": "c", "depends_on": [1]},
+    ):
+        await plan_q.put(step)
+    await plan_q.put(None)
+
+    agent = ExecutorAgent(tool_manager=None, llm=slow_llm, max_concurrency=4)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await agent.execute(plan_q, result_q)
+    elapsed = loop.time() - started
+
+    assert elapsed < 0.3
+    assert order.index("start c") > order.index("end a")
+    assert order.index("start b") < order.index("end a")
+    results = []
+    while (item := await result_q.get()) is not None:
+        results.append(item)
+    assert sorted(r["step"] for r in results) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_bounds_running_steps():
+    running = 0
+    peak = 0
+
+    async def llm(text):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return text
+
+    plan_q = asyncio.Queue()
+    for index in range(1, 7):
+        await plan_q.put({"step": index, "action": str(index)})
+    await plan_q.put(None)
+
+    await ExecutorAgent(llm=llm, max_concurrency=2).execute(plan_q, asyncio.Queue())
+    assert peak == 2
@@ -23,3 +23,15 @@ async def test_plan_queue_population():
         {"step": 1, "action": "step one"},
         {"step": 2, "action": "step two"},
     ]
+
+
+@pytest.mark.asyncio
+async def test_plan_marks_dependent_steps():
+    agent = PlannerAgent()
+    steps = await agent.plan(
+        "search the web for cats. describe the photo. then summarize the results",
+        asyncio.Queue(),
+    )
+    assert "depends_on" not in steps[0]
+    assert "depends_on" not in steps[1]
+    assert steps[2]["depends_on"] == [2]
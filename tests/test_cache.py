@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
+import asyncio
 import os
 import pytest
 
@@ -14,6 +15,7 @@ async def test_cache_methods(tmp_path):
     await tm.set_cached_result("foo", "bar")
     value = await tm.get_cached_result("foo")
     assert value == "bar"
+    await tm.close()
 
 @pytest.mark.asyncio
 async def test_agent_cache(tmp_path):
@@ -25,5 +27,47 @@ async def test_agent_cache(tmp_path):
     agent = CappuccinoAgent(tool_manager=tm, llm=fake_llm)
     response = await agent.call_llm("hello")
     assert response == "ok"
-    cached = await agent.get_cached_result("llm:hello")
+    cached = await agent.get_cached_result(agent.llm_cache_key("hello"))
     assert cached == "ok"
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_cache_ttl_and_counters(tmp_path):
+    tm = ToolManager(db_path=os.path.join(tmp_path, "db.sqlite"))
+    await tm.set_cached_result("short", "v", ttl=0.05)
+    await tm.set_cached_result("long", "v")
+    assert await tm.get_cached_result("short") == "v"
+    await asyncio.sleep(0.1)
+    assert await tm.get_cached_result("short") is None
+    assert await tm.get_cached_result("missing") is None
+
+    stats = tm.cache_stats.as_dict()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert (await tm.sweep_cache())["expired"] == 1
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_served_from_sqlite_after_memory_eviction(tmp_path):
+    tm = ToolManager(db_path=os.path.join(tmp_path, "db.sqlite"), cache_memory_bytes=64)
+    await tm.set_cached_result("a", "x" * 40)
+    await tm.set_cached_result("b", "y" * 40)
+    assert tm.cache_stats.evictions == 1
+    assert await tm.get_cached_result("a") == "x" * 40
+    assert tm.cache_stats.disk_hits == 1
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_sweeper_enforces_row_limit(tmp_path):
+    tm = ToolManager(db_path=os.path.join(tmp_path, "db.sqlite"), cache_max_rows=2)
+    for key in ("old", "popular", "new"):
+        await tm.set_cached_result(key, key)
+    await tm.get_cached_result("popular")
+    result = await tm.sweep_cache()
+    assert result["evicted"] == 1
+    tm._memory_cache.clear()
+    assert await tm.get_cached_result("old") is None
+    assert await tm.get_cached_result("popular") == "popular"
+    assert await tm.get_cached_result("new") == "new"
+    await tm.close()
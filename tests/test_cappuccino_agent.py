@@ -14,6 +14,7 @@ async def test_agent_runs_without_llm():
     agent = CappuccinoAgent(api_key=None, api_base=None)
     result = await agent.run("do this. then that")
     assert "エラー" in result or "error" in result.lower()
+    await agent.close()
 
 
 @pytest.mark.asyncio
@@ -21,3 +22,4 @@ async def test_agent_with_llm():
     agent = CappuccinoAgent(api_key="test", api_base="test")
     result = await agent.run("step one. step two")
     assert isinstance(result, str)
+    await agent.close()
@@ -0,0 +1,137 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import random
+import tracemalloc
+
+import pytest
+
+import compact_graph
+from compact_graph import CompactKnowledgeGraph
+from knowledge_graph import KnowledgeGraph
+from state_manager import StateManager
+from tool_manager import ToolManager
+
+
+def _rows(graph):
+    return sorted((s, t, r, tuple(sorted(a.items()))) for s, t, r, a in graph.relation_rows())
+
+
+def _entities(graph):
+    return sorted((name, tuple(sorted(a.items()))) for name, a in graph.entities())
+
+
+def test_matches_networkx_backend_under_random_mutations(monkeypatch):
+    # A tiny delta buffer exercises compaction, tombstones and the reverse index.
+    monkeypatch.setattr(compact_graph, "_MIN_DELTA", 16)
+    rng = random.Random(3)
+    reference, compact = KnowledgeGraph(), CompactKnowledgeGraph()
+    names = [f"n{i:02d}" for i in range(30)]
+    for step in range(2000):
+        roll = rng.random()
+        if roll < 0.6:
+            args = (rng.choice(names), rng.choice(names), rng.choice(["r1", "r2", "r3"]))
+            attrs = {"w": step} if rng.random() < 0.3 else {}
+            reference.add_relation(*args, **attrs)
+            compact.add_relation(*args, **attrs)
+        elif roll < 0.8:
+            args = (rng.choice(names), rng.choice(names), rng.choice(["r1", "r2", "r3"]))
+            reference.remove_relation(*args)
+            compact.remove_relation(*args)
+        elif roll < 0.85:
+            name = rng.choice(names)
+            reference.remove_entity(name)
+            compact.remove_entity(name)
+        else:
+            name = rng.choice(names)
+            reference.add_entity(name, group=step % 3)
+            compact.add_entity(name, group=step % 3)
+        if step % 100 == 0:
+            assert _rows(compact) == _rows(reference)
+            assert _entities(compact) == _entities(reference)
+            assert compact.number_of_relations() == reference.graph.number_of_edges()
+            for name in names:
+                assert sorted(compact.query(name)) == sorted(reference.query(name))
+                for direction in ("out", "in", "both"):
+                    assert compact.relations(name, None, direction) == reference.relations(name, None, direction)
+                assert compact.neighbourhood(name, 3, "r1", "both") == reference.neighbourhood(name, 3, "r1", "both")
+            assert compact.shortest_path("n01", "n02") == reference.shortest_path("n01", "n02")
+            assert compact.find_entities({"group": 1}) == reference.find_entities({"group": 1})
+
+
+def test_json_round_trip_between_backends():
+    graph = CompactKnowledgeGraph()
+    graph.add_entity("Alice", age=31)
+    graph.add_relation("Alice", "Bob", "knows", since=2020)
+    graph.add_relation("Alice", "Bob", "knows", trust=0.9)
+    graph.add_relation("Bob", "Alice", "cites")
+    restored = KnowledgeGraph.from_json(graph.to_json())
+    assert restored.graph.nodes["Alice"]["age"] == 31
+    assert restored.graph.edges["Alice", "Bob", "knows"] == {"since": 2020, "trust": 0.9}
+    again = CompactKnowledgeGraph.from_json(restored.to_json())
+    assert _rows(again) == _rows(graph)
+    assert again.entity_attrs("Alice") == {"age": 31}
+    assert again.query("Bob") == [("cites", "Alice")]
+
+
+def test_from_rows_collapses_duplicate_relations():
+    graph = CompactKnowledgeGraph.from_rows(
+        [("a", {"x": 1})],
+        [("a", "b", "r", {"w": 1}), ("a", "b", "r", {"v": 2}), ("b", "a", "r", {})],
+    )
+    assert graph.number_of_relations() == 2
+    assert _rows(graph) == [("a", "b", "r", (("v", 2), ("w", 1))), ("b", "a", "r", ())]
+    assert graph.relations("a", direction="in") == [("b", "r", "a")]
+
+
+def _traced_bytes(build):
+    tracemalloc.start()
+    try:
+        graph = build()
+        graph.relations("e0", direction="in")
+        return tracemalloc.get_traced_memory()[0], graph
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_per_edge_is_an_order_of_magnitude_smaller():
+    rng = random.Random(1)
+    node_count, edge_count = 4000, 20000
+    nodes = [(f"e{i}", {}) for i in range(node_count)]
+    seen = set()
+    while len(seen) < edge_count:
+        a, b = rng.randrange(node_count), rng.randrange(node_count)
+        seen.add((f"e{a}", f"e{b}", rng.choice(["knows", "likes", "cites"])))
+    edges = [(s, t, r, {}) for s, t, r in seen]
+
+    networkx_bytes, _ = _traced_bytes(lambda: KnowledgeGraph.from_rows(nodes, edges))
+    compact_bytes, graph = _traced_bytes(lambda: CompactKnowledgeGraph.from_rows(nodes, edges))
+    assert graph.number_of_relations() == edge_count
+    assert compact_bytes * 10 <= networkx_bytes
+
+
+@pytest.mark.asyncio
+async def test_tool_manager_and_state_manager_accept_compact_graphs(tmp_path):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"), graph_class=CompactKnowledgeGraph)
+    await tm.graph_add_entity("Alice", age=31)
+    await tm.graph_add_relation("Alice", "Bob", "knows")
+    assert isinstance(await tm._load_graph(), CompactKnowledgeGraph)
+    await tm.graph_add_relation("Bob", "Carol", "knows")
+    assert (await tm.graph_neighbourhood("Alice", hops=2))["neighbours"] == {"Bob": 1, "Carol": 2}
+    await tm.graph_remove_relation("Alice", "Bob", "knows")
+    assert (await tm.graph_query("Alice"))["relations"] == []
+    await tm.close()
+
+    sm = StateManager(str(tmp_path / "state.db"))
+    graph = await sm.load_graph(CompactKnowledgeGraph)
+    graph.add_relation("x", "y", "r", w=1)
+    await sm.save_graph(graph)
+    graph.remove_entity("y")
+    graph.add_relation("x", "z", "r")
+    await sm.save_graph(graph)
+    loaded = await sm.load_graph(CompactKnowledgeGraph)
+    assert loaded.query("x") == [("r", "z")]
+    assert (await sm.load_graph()).query("x") == [("r", "z")]
+    await sm.close()
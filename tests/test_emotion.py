@@ -20,6 +20,7 @@ async def test_positive_prompt_includes_emotion():
     result = await agent.call_llm('I love this product!')
     assert result == 'cheerful'
     assert 'positive' in captured['prompt']
+    await agent.close()
 
 
 @pytest.mark.asyncio
@@ -34,3 +35,4 @@ async def test_negative_prompt_includes_emotion():
     result = await agent.call_llm('I hate everything.')
     assert result == 'concerned'
     assert 'negative' in captured['prompt']
+    await agent.close()
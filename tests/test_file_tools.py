@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import os
+
+import pytest
+
+import file_ops
+from tool_manager import ToolManager
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    lines = [f"{i:05d} {'ERROR' if i % 250 == 0 else 'info'} événement {i}\n" for i in range(1, 2001)]
+    path.write_text("".join(lines), encoding="utf-8")
+    return path, lines
+
+
+@pytest.mark.asyncio
+async def test_ranged_read_pages_through_file(log_file):
+    path, lines = log_file
+    tm = ToolManager(db_path=":memory:")
+    chunks = []
+    offset = 0
+    while True:
+        # An odd page size regularly splits the two-byte "é".
+        page = await tm.file_read(str(path), offset=offset, length=997)
+        chunks.append(page["content"])
+        offset = page["next_offset"]
+        if page["eof"]:
+            break
+    assert "".join(chunks) == "".join(lines)
+    assert page["size"] == path.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_file_tail(log_file):
+    path, lines = log_file
+    tm = ToolManager(db_path=":memory:")
+    result = await tm.file_tail(str(path), lines=3)
+    assert result["content"] == "".join(lines[-3:])
+    assert result["offset"] == path.stat().st_size - len(result["content"].encode())
+    small = file_ops.tail(path, 5000, block_size=100)
+    assert small["content"] == "".join(lines) and small["offset"] == 0
+
+
+@pytest.mark.asyncio
+async def test_file_search_returns_line_numbers(log_file):
+    path, lines = log_file
+    tm = ToolManager(db_path=":memory:")
+    result = await tm.file_search(str(path), "ERROR")
+    assert [m["line"] for m in result["matches"]] == [250, 500, 750, 1000, 1250, 1500, 1750, 2000]
+    assert result["matches"][0]["text"] == lines[249].rstrip("\n")
+    limited = await tm.file_search(str(path), r"^00\d[05]0 error", regex=True, ignore_case=True, max_matches=2)
+    assert [m["line"] for m in limited["matches"]] == [250, 500]
+    assert limited["truncated"]
+    assert "error" in await tm.file_search(str(path), "(", regex=True)
+
+
+@pytest.mark.asyncio
+async def test_streaming_replace_across_blocks(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text("abcXYZ" * 1000, encoding="utf-8")
+    os.chmod(path, 0o640)
+    # Small blocks force matches to straddle block boundaries.
+    count = await asyncio.to_thread(file_ops.replace, path, "cXY", "-", 7)
+    assert count == 1000
+    assert path.read_text(encoding="utf-8") == "ab-Z" * 1000
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["big.txt"]
+
+    tm = ToolManager(db_path=":memory:")
+    result = await tm.file_replace_text(str(path), "Z", "ζ")
+    assert result["count"] == 1000
+    assert path.read_text(encoding="utf-8") == "ab-ζ" * 1000
+    assert "error" in await tm.file_replace_text(str(path), "", "x")
+
+
+@pytest.mark.asyncio
+async def test_file_tools_stay_in_sandbox(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    outside = tmp_path / "secret.txt"
+    outside.write_text("secret\n")
+    tm = ToolManager(db_path=":memory:", root_dir=str(root))
+    assert await tm.file_tail(str(outside)) == {"error": "access denied"}
+    assert await tm.file_search(str(outside), "secret") == {"error": "access denied"}
+    assert await tm.file_replace_text(str(outside), "secret", "x") == {"error": "access denied"}
+    assert await tm.file_read(str(root / "missing.txt")) == {"error": "file not found"}
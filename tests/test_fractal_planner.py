@@ -1,8 +1,14 @@
 import sys
 import pathlib
+import time
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
 
+import asyncio
+
+import pytest
+
+from agents import ExecutorAgent
 from planner import Planner
 from fractal_planner import FractalPlanner
 
@@ -24,3 +30,92 @@ def test_planner_modes_basic_vs_fractal():
     assert len(basic_plan) == 2
     assert len(fractal_plan) == 2
     assert "substeps" in fractal_plan[0]
+
+
+class CountingPlanner:
+    def __init__(self):
+        self.calls = []
+
+    def create_plan(self, context):
+        self.calls.append(context)
+        return [{"step": i + 1, "action": f"{context} / part {i}"} for i in range(2)] + [
+            {"step": 3, "action": "Review  Results"}
+        ]
+
+
+def test_fractal_decompositions_are_memoized():
+    base = CountingPlanner()
+    planner = FractalPlanner(depth=3, breadth=3, base_planner=base)
+    plan = planner.create_plan("goal")
+    assert plan[2]["action"] == "Review  Results"
+    assert plan[0]["substeps"][0]["substeps"][2]["action"] == "Review  Results"
+    # "review results" repeats at every level but is decomposed only once.
+    assert base.calls.count("Review  Results") == 1
+    assert planner.cache_hits > 0
+    planner.create_plan("goal")
+    assert len(base.calls) == planner.cache_misses
+
+
+def test_fractal_plan_tree_expands_lazily():
+    base = CountingPlanner()
+    planner = FractalPlanner(depth=3, breadth=3, base_planner=base)
+    tree = planner.plan_tree("goal")
+    assert base.calls == ["goal"]
+    assert not tree.steps[0].expanded
+    first = next(tree.walk())
+    assert first.action == "goal / part 0 / part 0 / part 0"
+    assert first.depth == 3
+    # Only the path to the first leaf has been decomposed.
+    assert tree.steps[0].expanded and not tree.steps[1].expanded
+    assert "substeps" not in tree.to_list()[1]
+
+
+def test_fractal_budgets_cap_deep_settings():
+    planner = FractalPlanner(depth=50, breadth=5, base_planner=CountingPlanner(), max_nodes=100)
+    tree = planner.plan_tree("goal")
+    tree.expand_all()
+    assert tree.nodes <= 100
+    leaves = list(tree.walk())
+    assert any(leaf.truncated for leaf in leaves)
+    assert "truncated" in str(tree.to_list())
+
+    class SlowPlanner(CountingPlanner):
+        def create_plan(self, context):
+            time.sleep(0.01)
+            return super().create_plan(context)
+
+    slow = FractalPlanner(depth=50, breadth=3, base_planner=SlowPlanner(), time_budget=0.05, max_nodes=10**6)
+    started = time.perf_counter()
+    slow.create_plan("goal")
+    assert time.perf_counter() - started < 1
+
+    # An exhausted budget still leaves the root's own steps to execute.
+    spent = FractalPlanner(depth=3, breadth=3, base_planner=CountingPlanner(), time_budget=0, max_nodes=1)
+    plan = spent.create_plan("goal")
+    assert [step["action"] for step in plan] == ["goal / part 0", "goal / part 1", "Review  Results"]
+    assert all(step["truncated"] for step in plan)
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_leaves_before_later_subtrees_expand():
+    base = CountingPlanner()
+    planner = Planner(mode="fractal", fractal_depth=3, fractal_breadth=3)
+    planner._planner.base_planner = base
+    expanded_at_first_step = []
+
+    async def llm(prompt):
+        if not expanded_at_first_step:
+            expanded_at_first_step.append(len(base.calls))
+        return f"did {prompt}"
+
+    plan_queue, result_queue = asyncio.Queue(), asyncio.Queue()
+    steps, _ = await asyncio.gather(
+        planner.stream_plan("goal", plan_queue),
+        ExecutorAgent(llm=llm).execute(plan_queue, result_queue),
+    )
+    # The first leaf ran after only its own path had been decomposed.
+    assert expanded_at_first_step == [3]
+    assert len(base.calls) > 3
+    assert steps[0] == {"step": 1, "action": "goal / part 0 / part 0 / part 0"}
+    results = [result_queue.get_nowait() for _ in range(result_queue.qsize())]
+    assert len([r for r in results if r]) == len(steps)
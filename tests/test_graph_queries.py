@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import random
+
+import pytest
+import pytest_asyncio
+
+import graph_store
+from knowledge_graph import KnowledgeGraph
+from sqlite_pool import open_pool
+from tool_manager import ToolManager
+
+
+def _random_graph(seed=7, nodes=60, edges=240):
+    rng = random.Random(seed)
+    graph = KnowledgeGraph()
+    for i in range(nodes):
+        graph.add_entity(f"n{i:02d}", group=i % 3, score=rng.random(), kind="even" if i % 2 == 0 else "odd")
+    for _ in range(edges):
+        a, b = rng.sample(range(nodes), 2)
+        graph.add_relation(f"n{a:02d}", f"n{b:02d}", rng.choice(["knows", "likes", "cites"]))
+    return graph
+
+
+@pytest_asyncio.fixture
+async def backends(tmp_path):
+    graph = _random_graph()
+    pool = await open_pool(str(tmp_path / "kg.db"))
+    async with pool.writer() as conn:
+        await graph_store.create_schema(conn)
+        await graph_store.apply_changes(conn, graph.drain_changes())
+        await conn.commit()
+    yield graph, graph_store.SQLGraph(pool.reader)
+    await pool.release()
+
+
+@pytest.mark.asyncio
+async def test_sql_and_memory_backends_agree(backends):
+    memory, sql = backends
+    for entity in ("n00", "n17", "n42", "missing"):
+        for direction in ("out", "in", "both"):
+            for relation in (None, "knows"):
+                assert await sql.relations(entity, relation, direction) == memory.relations(entity, relation, direction)
+                for hops in (1, 3):
+                    assert await sql.neighbourhood(entity, hops, relation, direction) == memory.neighbourhood(
+                        entity, hops, relation, direction
+                    )
+    for source, target in (("n00", "n59"), ("n13", "n02"), ("n05", "n05"), ("n01", "missing")):
+        for relation in (None, "likes"):
+            assert await sql.shortest_path(source, target, relation) == memory.shortest_path(source, target, relation)
+    assert await sql.shortest_path("n00", "n59", max_hops=1) == memory.shortest_path("n00", "n59", max_hops=1)
+    for where in ({"group": 1}, [("score", ">", 0.5), ("kind", "=", "odd")], [("group", "!=", 0)], {"absent": 1}):
+        assert await sql.find_entities(where) == memory.find_entities(where)
+
+
+@pytest.mark.asyncio
+async def test_multi_hop_and_path_semantics():
+    graph = KnowledgeGraph()
+    graph.add_relation("a", "b", "r")
+    graph.add_relation("b", "c", "r")
+    graph.add_relation("c", "a", "r")
+    graph.add_relation("a", "d", "s")
+    assert graph.neighbourhood("a", 2) == {"b": 1, "d": 1, "c": 2}
+    assert graph.neighbourhood("a", 2, relation="r") == {"b": 1, "c": 2}
+    assert graph.neighbourhood("c", 1, direction="in") == {"b": 1}
+    assert graph.shortest_path("a", "c") == ["a", "b", "c"]
+    assert graph.shortest_path("c", "a", direction="in") == ["c", "b", "a"]
+    assert graph.shortest_path("d", "a") is None
+    with pytest.raises(ValueError):
+        graph.relations("a", direction="sideways")
+    with pytest.raises(ValueError):
+        graph.find_entities([("x", "~", 1)])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory_edges", [0, 1000])
+async def test_tool_manager_graph_queries(tmp_path, memory_edges):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"), graph_memory_edges=memory_edges)
+    await tm.graph_add_entity("Alice", age=31)
+    await tm.graph_add_entity("Bob", age=25)
+    await tm.graph_add_relations(
+        [
+            {"source": "Alice", "target": "Bob", "relation": "knows"},
+            {"source": "Bob", "target": "Carol", "relation": "knows"},
+            {"source": "Carol", "target": "Alice", "relation": "cites"},
+        ]
+    )
+    assert (await tm.graph_query("Alice"))["relations"] == [("knows", "Bob")]
+    assert (await tm.graph_query("Alice", direction="in"))["relations"] == [("cites", "Carol")]
+    neighbours = await tm.graph_neighbourhood("Alice", hops=2, relation="knows")
+    assert neighbours["neighbours"] == {"Bob": 1, "Carol": 2}
+    assert (await tm.graph_shortest_path("Bob", "Alice"))["path"] == ["Bob", "Carol", "Alice"]
+    assert (await tm.graph_find_entities([("age", ">", 30)]))["entities"] == ["Alice"]
+    assert "error" in await tm.graph_query("Alice", direction="up")
+    # Mutations after the first query are visible to either backend.
+    await tm.graph_remove_relation("Alice", "Bob", "knows")
+    assert (await tm.graph_query("Alice"))["relations"] == []
+    assert (tm._graph is None) == (memory_edges == 0)
+    await tm.close()
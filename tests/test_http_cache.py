@@ -0,0 +1,197 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_cache import HTTPCache, parse_cache_control
+from tool_manager import ToolManager
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _serve(routes):
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _manager(tmp_path, clock):
+    tm = ToolManager(db_path=str(tmp_path / "tools.db"), http_cache=True)
+    tm.http_cache = HTTPCache(tm._ensure_pool, tm.http_session, clock=clock)
+    return tm
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('max-age=60, no-cache, stale-while-revalidate="30"') == {
+        "max-age": "60",
+        "no-cache": None,
+        "stale-while-revalidate": "30",
+    }
+
+
+@pytest.mark.asyncio
+async def test_fresh_hits_then_conditional_304(tmp_path):
+    calls = []
+
+    async def feed(request):
+        calls.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+        return web.Response(text="<rss/>", headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+
+    server = await _serve({"/feed": feed})
+    clock = Clock()
+    tm = _manager(tmp_path, clock)
+    url = str(server.make_url("/feed"))
+    try:
+        first = await tm.http_get(url)
+        assert await first.text() == "<rss/>" and not first.from_cache
+        second = await tm.http_get(url)
+        assert second.from_cache and calls == [None]
+
+        clock.now += 120
+        third = await tm.http_get(url)
+        assert await third.text() == "<rss/>"
+        assert third.from_cache
+        assert calls == [None, '"v1"']
+        assert tm.http_cache.revalidated == 1
+    finally:
+        await tm.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_serves_cache_and_refreshes(tmp_path):
+    version = {"n": 1}
+
+    async def news(request):
+        return web.Response(
+            text=f"v{version['n']}",
+            headers={"Cache-Control": "max-age=10, stale-while-revalidate=100"},
+        )
+
+    server = await _serve({"/news": news})
+    clock = Clock()
+    tm = _manager(tmp_path, clock)
+    url = str(server.make_url("/news"))
+    try:
+        assert await (await tm.http_get(url)).text() == "v1"
+        version["n"] = 2
+        clock.now += 50
+        stale = await tm.http_get(url)
+        assert await stale.text() == "v1"
+        await asyncio.gather(*tm.http_cache._refreshing.values())
+        assert await (await tm.http_get(url)).text() == "v2"
+    finally:
+        await tm.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_no_store_and_search_tools_use_cache(tmp_path):
+    hits = {"private": 0, "api": 0}
+
+    async def private(request):
+        hits["private"] += 1
+        return web.json_response({"n": hits["private"]}, headers={"Cache-Control": "no-store"})
+
+    async def api(request):
+        hits["api"] += 1
+        return web.json_response({"q": request.query["q"]}, headers={"Cache-Control": "max-age=300"})
+
+    server = await _serve({"/private": private, "/api": api})
+    tm = _manager(tmp_path, Clock())
+    try:
+        for _ in range(2):
+            await tm.http_get(str(server.make_url("/private")))
+        assert hits["private"] == 2
+
+        for _ in range(3):
+            result = await tm.info_search_api(str(server.make_url("/api")), {"q": "x"})
+            assert result["response"] == {"q": "x"}
+        assert hits["api"] == 1
+    finally:
+        await tm.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_streamed_search_page_is_cached_and_revalidated(tmp_path):
+    page = (Path(__file__).resolve().parent / "fixtures" / "ddg_results_large.html").read_bytes()
+    calls = []
+
+    async def search(request):
+        calls.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"p1"':
+            return web.Response(status=304, headers={"ETag": '"p1"', "Cache-Control": "max-age=60"})
+        return web.Response(
+            body=page,
+            content_type="text/html",
+            headers={"ETag": '"p1"', "Cache-Control": "max-age=60"},
+        )
+
+    server = await _serve({"/html": search})
+    clock = Clock()
+    tm = _manager(tmp_path, clock)
+    url = str(server.make_url("/html"))
+    try:
+        first = await tm._search_html(url, "q", 3)
+        assert len(first) == 3
+        # The parser stopped early; the rest of the page is stored in the background.
+        await asyncio.gather(*tm.http_cache._refreshing.values())
+        assert await tm._search_html(url, "q", 3) == first
+        assert calls == [None]
+
+        clock.now += 120
+        assert await tm._search_html(url, "q", 3) == first
+        assert calls == [None, '"p1"'] and tm.http_cache.revalidated == 1
+    finally:
+        await tm.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_request_headers_and_vary_separate_entries(tmp_path):
+    hits = {"greeting": 0, "any": 0}
+
+    async def greeting(request):
+        hits["greeting"] += 1
+        text = "こんにちは" if request.headers.get("Accept-Language") == "ja" else "hello"
+        return web.Response(text=text, headers={"Cache-Control": "max-age=60", "Vary": "Accept-Language"})
+
+    async def anything(request):
+        hits["any"] += 1
+        return web.Response(text="x", headers={"Cache-Control": "max-age=60", "Vary": "*"})
+
+    server = await _serve({"/greeting": greeting, "/any": anything})
+    tm = _manager(tmp_path, Clock())
+    url = str(server.make_url("/greeting"))
+    try:
+        for _ in range(2):
+            ja = await tm.http_get(url, headers={"Accept-Language": "ja"})
+            en = await tm.http_get(url, headers={"Accept-Language": "en"})
+            assert (await ja.text(), await en.text()) == ("こんにちは", "hello")
+        assert hits["greeting"] == 2
+        assert HTTPCache.key(url, headers={"Accept-Language": "ja"}) != HTTPCache.key(url)
+
+        for _ in range(2):
+            await tm.http_get(str(server.make_url("/any")))
+        assert hits["any"] == 2
+    finally:
+        await tm.close()
+        await server.close()
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_search_tools_share_one_keep_alive_session():
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"q": request.query.get("q")})
+
+    app = web.Application()
+    app.router.add_get("/api", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        async with ToolManager(db_path=":memory:") as tm:
+            session = await tm.http_session()
+            for query in ("a", "b", "c"):
+                result = await tm.info_search_api(str(server.make_url("/api")), {"q": query})
+                assert result["response"] == {"q": query}
+            assert await tm.http_session() is session
+            # Every request reused the same pooled connection.
+            assert len(peers) == 1
+        assert session.closed
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_http_tool_timeout_is_configurable():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/slow", slow)
+    server = TestServer(app)
+    await server.start_server()
+    tm = ToolManager(db_path=":memory:", tool_timeouts={"info_search_api": 0.1})
+    try:
+        result = await tm.info_search_api(str(server.make_url("/slow")), None)
+        assert "error" in result
+    finally:
+        await tm.close()
+        await server.close()
@@ -32,3 +32,76 @@ async def test_graph_remove_relation(tmp_path):
         await tm.graph_remove_relation("A", "B", "likes")
         result = await tm.graph_query("A")
         assert ("likes", "B") not in result["relations"]
+
+
+@pytest.mark.asyncio
+async def test_single_relation_touches_constant_rows(tmp_path):
+    db = tmp_path / "graph.db"
+    async with ToolManager(db_path=str(db)) as tm:
+        batch = [
+            {"source": f"n{i}", "target": f"n{i + 1}", "relation": "next", "weight": i}
+            for i in range(5000)
+        ]
+        assert (await tm.graph_add_relations(batch))["added"] == 5000
+        conn = await tm._ensure_db()
+        before = conn.total_changes
+        await tm.graph_add_relation("n0", "n42", "jumps", weight=1)
+        # Two endpoint upserts (ignored) plus one edge row.
+        assert conn.total_changes - before <= 3
+        await tm.graph_add_relation("n0", "n42", "jumps", label="x")
+
+    async with ToolManager(db_path=str(db)) as tm2:
+        graph = await tm2._load_graph()
+        assert graph.graph.number_of_edges() == 5001
+        assert graph.graph.edges["n0", "n42", "jumps"] == {"weight": 1, "label": "x"}
+        assert graph.graph.edges["n7", "n8", "next"] == {"weight": 7}
+
+
+@pytest.mark.asyncio
+async def test_state_manager_saves_graph_deltas(tmp_path):
+    from knowledge_graph import KnowledgeGraph
+    from state_manager import StateManager
+
+    sm = StateManager(str(tmp_path / "state.db"))
+    graph = KnowledgeGraph()
+    graph.add_relation("A", "B", "knows", since=2020)
+    await sm.save_graph(graph)
+
+    loaded = await sm.load_graph()
+    loaded.add_entity("C", kind="person")
+    loaded.remove_relation("A", "B", "knows")
+    loaded.add_relation("B", "C", "likes")
+    await sm.save_graph(loaded)
+    loaded.add_relation("C", "A", "knows")
+    assert loaded.drain_changes() == [("edge", "C", "A", "knows", {})]
+    loaded.add_relation("A", "C", "met")
+    await sm.save_graph(loaded)
+
+    again = await sm.load_graph()
+    assert sorted(again.graph.edges(keys=True)) == [("A", "C", "met"), ("B", "C", "likes")]
+    assert again.graph.nodes["C"] == {"kind": "person"}
+
+    # A graph that did not come from the store replaces it.
+    fresh = KnowledgeGraph()
+    fresh.add_entity("Z")
+    await sm.save_graph(fresh)
+    assert list((await sm.load_graph()).graph.nodes) == ["Z"]
+    await sm.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_graph_blob_is_migrated(tmp_path):
+    import aiosqlite
+    from knowledge_graph import KnowledgeGraph
+
+    db = tmp_path / "legacy.db"
+    legacy = KnowledgeGraph()
+    legacy.add_relation("Alice", "Bob", "knows", since=1999)
+    async with aiosqlite.connect(db) as conn:
+        await conn.execute("CREATE TABLE knowledge_graph (id INTEGER PRIMARY KEY, data TEXT)")
+        await conn.execute("INSERT INTO knowledge_graph VALUES (1, ?)", (legacy.to_json(),))
+        await conn.commit()
+
+    async with ToolManager(db_path=str(db)) as tm:
+        result = await tm.graph_query("Alice")
+        assert result["relations"] == [("knows", "Bob")]
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import pytest
+
+from cappuccino_agent import CappuccinoAgent
+from tool_manager import ToolManager
+
+
+def _counting_llm(delay: float = 0.0):
+    calls = []
+
+    async def llm(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(delay)
+        return f"answer {len(calls)}"
+
+    return llm, calls
+
+
+@pytest.mark.asyncio
+async def test_call_llm_reads_through_normalized_cache():
+    llm, calls = _counting_llm()
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"), llm=llm)
+    first = await agent.call_llm("What is  Python?")
+    second = await agent.call_llm("  what is python? ")
+    assert first == second == "answer 1"
+    assert len(calls) == 1
+
+    assert await agent.call_llm("what is python?", use_cache=False) == "answer 2"
+    agent.model = "other-model"
+    assert await agent.call_llm("what is python?") == "answer 3"
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_share_one_call():
+    llm, calls = _counting_llm(delay=0.05)
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"), llm=llm)
+    results = await asyncio.gather(*[agent.call_llm("translate this") for _ in range(5)])
+    assert results == ["answer 1"] * 5
+    assert len(calls) == 1
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_run_uses_cache_but_not_for_errors():
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"))
+    assert "error" in await agent.run("hello")
+    assert await agent.get_cached_result(agent.llm_cache_key("hello")) is None
+
+    llm, calls = _counting_llm()
+    agent.executor.llm = llm
+    assert await agent.run("hello") == "answer 1"
+    assert await agent.run("Hello") == "answer 1"
+    assert len(calls) == 1
+    assert [m["content"] for m in agent.history[-2:]] == ["Hello", "answer 1"]
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_the_call_to_a_follower():
+    llm, calls = _counting_llm(delay=0.05)
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"), llm=llm)
+    leader = asyncio.create_task(agent.call_llm("Summarise the news"))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(agent.call_llm("summarise the news"))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await follower == "answer 2"
+    assert leader.cancelled()
+    assert len(calls) == 2
+    await agent.close()
@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import json
+import re
+
+import pytest
+
+from config import settings
+from planner import Planner
+from tool_manager import ToolManager
+
+
+class FakeLLM:
+    """Answers batched prompts with two substeps per numbered task."""
+
+    def __init__(self, delay=0.0):
+        self.prompts = []
+        self.delay = delay
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        tasks = re.findall(r"^(\d+)\. (.+)$", prompt, re.MULTILINE)
+        return "Sure:\n" + json.dumps({n: [f"{task} > a", f"{task} > b"] for n, task in tasks})
+
+
+def _count(plan):
+    return sum(1 + _count(step.get("substeps", [])) for step in plan)
+
+
+@pytest.mark.asyncio
+async def test_llm_mode_batches_one_call_per_level(tmp_path):
+    llm = FakeLLM()
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"))
+    planner = Planner(mode="llm", llm=llm, tool_manager=tm, fractal_depth=3, fractal_breadth=2)
+    plan = await planner.plan("ship the release")
+    assert [step["action"] for step in plan] == ["ship the release > a", "ship the release > b"]
+    assert plan[1]["substeps"][0]["substeps"][1]["action"] == "ship the release > b > a > b"
+    assert _count(plan) == 2 + 4 + 8
+    assert len(llm.prompts) == 3
+
+    # The same context, normalized, is answered entirely from the cache.
+    again = await Planner(mode="llm", llm=llm, tool_manager=tm, fractal_depth=3, fractal_breadth=2).plan(
+        "  Ship the   RELEASE "
+    )
+    assert again == plan
+    assert len(llm.prompts) == 3
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_llm_mode_falls_back_to_sentence_split_on_timeout():
+    planner = Planner(mode="llm", llm=FakeLLM(delay=1), llm_timeout=0.05, fractal_depth=1)
+    plan = await planner.plan("fetch data. chart it")
+    assert plan == [{"step": 1, "action": "fetch data"}, {"step": 2, "action": "chart it"}]
+    assert planner.llm_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_mode_handles_partial_and_invalid_replies():
+    async def partial(prompt):
+        return '{"1": ["only first"], "7": ["ignored"]}'
+
+    planner = Planner(mode="llm", llm=partial, fractal_breadth=3)
+    assert await planner.decompose_batch(["task one", "a. b. c. d"]) == [["only first"], ["a", "b", "c"]]
+
+    async def garbage(prompt):
+        return "no json here"
+
+    planner = Planner(mode="llm", llm=garbage)
+    assert await planner.decompose_batch(["x. y"]) == [["x", "y"]]
+    # Synchronous callers get the sentence-split plan.
+    assert planner.create_plan("x. y") == [{"step": 1, "action": "x"}, {"step": 2, "action": "y"}]
+
+
+@pytest.mark.asyncio
+async def test_timeout_fallback_keeps_every_sentence_and_stops_expanding():
+    llm = FakeLLM(delay=1)
+    planner = Planner(mode="llm", llm=llm, llm_timeout=0.05, fractal_depth=2, fractal_breadth=2)
+    plan = await planner.plan("a. b. c. d. e")
+    assert plan == [{"step": i, "action": a} for i, a in enumerate("abcde", start=1)]
+    assert planner.llm_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_time_budget_covers_the_whole_plan():
+    llm = FakeLLM(delay=0.1)
+    planner = Planner(
+        mode="llm", llm=llm, llm_timeout=5, time_budget=0.15, fractal_depth=4, fractal_breadth=2
+    )
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    plan = await planner.plan("ship the release")
+    assert loop.time() - started < 0.5
+    # The first level was answered; the second ran out of budget.
+    assert [step["action"] for step in plan] == ["ship the release > a", "ship the release > b"]
+    assert all("substeps" not in step for step in plan)
+    assert planner.llm_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_default_budget_allows_one_llm_timeout_per_level(monkeypatch):
+    monkeypatch.setattr(settings, "planner_time_budget", None)
+    planner = Planner(mode="llm", llm=FakeLLM(delay=0.3), llm_timeout=1, fractal_depth=2, fractal_breadth=2)
+    assert planner.time_budget == 2
+    # A model call slower than the fractal CPU budget's share is still awaited.
+    monkeypatch.setattr(settings, "fractal_time_budget", 0.1)
+    plan = await planner.plan("ship the release")
+    assert [step["action"] for step in plan] == ["ship the release > a", "ship the release > b"]
+    assert all("substeps" in step for step in plan)
+
+    monkeypatch.setattr(settings, "planner_time_budget", 30.0)
+    assert Planner(mode="llm", llm_timeout=1).time_budget == 30.0
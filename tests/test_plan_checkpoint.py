@@ -0,0 +1,151 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import asyncio
+
+import pytest
+
+from agents import ExecutorAgent
+from cappuccino_agent import CappuccinoAgent
+from plan_checkpoint import PlanCheckpoint
+from state_manager import StateManager
+from tool_manager import ToolManager
+
+QUERY = "collect data. then clean it. then chart the result"
+
+
+class FlakyLLM:
+    def __init__(self, fail_on=None):
+        self.prompts = []
+        self.fail_on = fail_on
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("model went away")
+        return f"did {prompt}"
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_steps(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    flaky = FlakyLLM(fail_on="clean")
+    agent = CappuccinoAgent(llm=flaky, db_path=db_path, llm_cache=False)
+    with pytest.raises(RuntimeError):
+        await agent.run(QUERY)
+    await agent.close()
+
+    state = StateManager(db_path)
+    run = await state.load_run()
+    assert run["query"] == QUERY and run["status"] == "running"
+    assert run["steps"]["1"]["status"] == "done"
+    assert run["steps"]["1"]["output"] == "did collect data"
+    assert run["steps"]["2"]["status"] == "failed"
+    assert "model went away" in run["steps"]["2"]["error"]
+    assert run["steps"]["3"]["status"] == "pending"
+    await state.close()
+
+    # A fresh process picks up where the previous one stopped.
+    working = FlakyLLM()
+    agent = CappuccinoAgent(llm=working, db_path=db_path, llm_cache=False)
+    assert await agent.resume() == "did then chart the result"
+    assert working.prompts == ["then clean it", "then chart the result"]
+    assert agent.history[-2:] == [
+        {"role": "user", "content": QUERY},
+        {"role": "assistant", "content": "did then chart the result"},
+    ]
+    # A finished run is not executed again.
+    assert await agent.resume() == "did then chart the result"
+    assert len(working.prompts) == 2
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_resume_without_a_run():
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"))
+    assert await agent.resume() is None
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_idempotent_across_retries(tmp_path):
+    state = StateManager(str(tmp_path / "state.db"))
+    tm = ToolManager(db_path=":memory:")
+    calls = []
+
+    async def charge(amount, idempotency_key=None):
+        calls.append(idempotency_key)
+        return f"charged {amount}"
+
+    tm.tools["charge"] = charge
+    plan = [{"step": 1, "action": "charge", "parameters": {"amount": 5}}]
+
+    async def execute(checkpoint):
+        plan_queue, result_queue = asyncio.Queue(), asyncio.Queue()
+        for task in plan:
+            await plan_queue.put(task)
+        await plan_queue.put(None)
+        await ExecutorAgent(tool_manager=tm).execute(plan_queue, result_queue, checkpoint=checkpoint)
+        return [item for item in [result_queue.get_nowait() for _ in range(result_queue.qsize())] if item]
+
+    checkpoint = await PlanCheckpoint.start(state, "pay", plan)
+    assert await execute(checkpoint) == [{"step": 1, "result": "charged 5"}]
+    assert calls == [checkpoint.idempotency_key(1, plan[0])]
+
+    # Simulate a crash after the tool ran but before the step was marked done.
+    await state.checkpoint_step(1, "running")
+    reloaded = await PlanCheckpoint.load(state)
+    assert reloaded.completed_output(1) is None
+    assert await execute(reloaded) == [{"step": 1, "result": "charged 5"}]
+    assert len(calls) == 1
+    assert (await state.load_run())["steps"]["1"]["status"] == "done"
+    await tm.close()
+    await state.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_finished_runs_drop_their_tool_calls(tmp_path, write_behind):
+    state = StateManager(str(tmp_path / "state.db"), write_behind=write_behind, flush_interval_ms=10_000)
+    plan = [{"step": 1, "action": "charge"}]
+    done = await PlanCheckpoint.start(state, "pay", plan, session_id="a")
+    await done.record_tool("key-a", "charged")
+    other = await PlanCheckpoint.start(state, "pay", plan, session_id="b")
+    await other.record_tool("key-b", "charged")
+    await state.flush()
+    await done.finish("charged")
+    assert await state.get_tool_call("key-a") is None
+    assert await state.get_tool_call("key-b") == "charged"
+
+    # A new run in the same session discards the unfinished one's calls.
+    await PlanCheckpoint.start(state, "pay again", plan, session_id="b")
+    assert await state.get_tool_call("key-b") is None
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_feeds_lazy_plan_tree_and_checkpoints_its_leaves(tmp_path):
+    from fractal_planner import FractalPlanner
+
+    db_path = str(tmp_path / "state.db")
+    prompts = []
+
+    async def llm(prompt):
+        prompts.append(prompt)
+        return f"did {prompt}"
+
+    fractal = FractalPlanner(depth=2, breadth=2)
+    agent = CappuccinoAgent(llm=llm, db_path=db_path, llm_cache=False, fractal_planner=fractal)
+    await agent.run("collect data. chart it")
+    assert sorted(prompts) == ["chart it", "collect data"]
+    assert [step["action"] for step in agent.task_plan] == ["collect data", "chart it"]
+    await agent.close()
+
+    state = StateManager(db_path)
+    run = await state.load_run()
+    assert run["status"] == "done"
+    assert [step["action"] for step in run["task_plan"]] == ["collect data", "chart it"]
+    assert {step: record["status"] for step, record in run["steps"].items()} == {"1": "done", "2": "done"}
+    await state.close()
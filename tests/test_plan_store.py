@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import time
+
+import aiosqlite
+import pytest
+
+import plan_store
+from state_manager import StateManager
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_many_plans_per_agent_and_session(tmp_path):
+    state = StateManager(str(tmp_path / "state.db"))
+    store = state.plans
+    ids = await store.add_plans(
+        [
+            {"agent_id": "a", "session_id": "s1", "title": "first", "steps": ["fetch", "summarise"]},
+            {"agent_id": "a", "session_id": "s2", "title": "second"},
+            {"agent_id": "b", "session_id": "s1", "status": "completed"},
+        ]
+    )
+    assert len(set(ids)) == 3
+    assert [p["title"] for p in await store.list_plans(agent_id="a")] == ["first", "second"]
+    assert len(await store.list_plans(session_id="s1")) == 2
+    assert len(await store.list_plans(session_id="s1", status="pending")) == 1
+
+    plan = await store.get_plan(ids[0])
+    assert [(s["step"], s["action"], s["status"]) for s in plan["steps"]] == [
+        (1, "fetch", "pending"),
+        (2, "summarise", "pending"),
+    ]
+    await store.update_steps(ids[0], {1: {"status": "done", "output": "ok"}, 2: {"parameters": {"n": 3}}})
+    steps = await store.get_steps(ids[0])
+    assert steps[0]["output"] == "ok" and steps[1]["parameters"] == {"n": 3}
+    assert [s["step"] for s in await store.pending_steps()] == [2]
+    assert await store.count_by_status() == {"pending": 2, "completed": 1}
+    with pytest.raises(ValueError):
+        await store.update_plan(ids[0], bogus=1)
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_due_plans_use_the_status_schedule_index(tmp_path):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"))
+    now = 1_000_000.0
+    await tm.plans.add_plans(
+        [{"title": f"p{i}", "next_run_at": now + i - 5} for i in range(10)]
+        + [{"title": "done", "status": "completed", "next_run_at": now - 100}, {"title": "unscheduled"}]
+    )
+    due = await tm.plans.due_plans(now)
+    assert [p["title"] for p in due] == ["p0", "p1", "p2", "p3", "p4", "p5"]
+
+    claims = await asyncio.gather(tm.plans.claim_due(now, limit=4), tm.plans.claim_due(now, limit=4))
+    claimed = [p["title"] for batch in claims for p in batch]
+    assert sorted(claimed) == ["p0", "p1", "p2", "p3", "p4", "p5"]
+    assert await tm.plans.due_plans(now) == []
+
+    pool = await tm._ensure_pool()
+    async with pool.reader() as conn:
+        async with conn.execute(
+            "EXPLAIN QUERY PLAN SELECT plan_id FROM task_plans WHERE status=? AND next_run_at <= ? "
+            "ORDER BY next_run_at",
+            ("pending", now),
+        ) as cur:
+            detail = " ".join(row[-1] for row in await cur.fetchall())
+    assert "idx_task_plans_due" in detail
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_tools_are_schedulable(tmp_path):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"))
+    await tm.agent_update_plan("bot", ["check news", {"action": "post", "parameters": {"channel": 1}}])
+    scheduled = await tm.agent_schedule_task("bot", "every 10 minutes")
+    assert scheduled["next_run_at"] == pytest.approx(time.time() + 600, abs=5)
+    assert (await tm.agent_due_tasks())["tasks"] == []
+    due = await tm.plans.due_plans(time.time() + 601)
+    assert [p["plan_id"] for p in due] == [plan_store.agent_plan_id("bot")]
+    steps = await tm.plans.get_steps(plan_store.agent_plan_id("bot"))
+    assert steps[1]["parameters"] == {"channel": 1}
+
+    assert (await tm.agent_schedule_task("bot", "whenever"))["next_run_at"] is None
+    assert plan_store.next_run_at("daily", 0) == 86400
+    assert plan_store.next_run_at("2h", 10) == 7210
+    assert plan_store.next_run_at("2030-01-01T00:00:00+00:00") == 1893456000
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_agent_tasks_table_is_migrated(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.execute(
+            "CREATE TABLE agent_tasks (agent_id TEXT PRIMARY KEY, plan TEXT, phase INTEGER DEFAULT 0, "
+            "status TEXT DEFAULT 'pending', schedule TEXT)"
+        )
+        await conn.execute("INSERT INTO agent_tasks VALUES ('old', 'legacy plan', 2, 'pending', 'daily')")
+        await conn.commit()
+
+    tm = ToolManager(db_path=db_path)
+    plan = await tm.plans.get_plan(plan_store.agent_plan_id("old"))
+    assert (plan["description"], plan["current_step"], plan["schedule"]) == ("legacy plan", 2, "daily")
+    assert (await tm.agent_advance_phase("old"))["phase"] == 3
+    conn = await tm._get_db_connection()
+    async with conn.execute("SELECT plan, phase, status, schedule FROM agent_tasks WHERE agent_id='old'") as cur:
+        assert await cur.fetchone() == ("legacy plan", 3, "pending", "daily")
+    await tm.close()
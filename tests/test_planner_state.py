@@ -28,5 +28,6 @@ async def test_planner_and_state(tmp_path):
     await state.update_step(2)
     loaded = await state.load_plan()
     assert loaded["current_step"] == 2
+    await state.close()
 
 
@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from process_backend import ProcessToolBackend
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_parallel_worker_processes():
+    backend = ProcessToolBackend(2, warm_modules=())
+    try:
+        pids = await asyncio.gather(*(backend.run(os.getpid) for _ in range(2)))
+        assert os.getpid() not in pids
+
+        started = time.monotonic()
+        await asyncio.gather(backend.run(time.sleep, 0.5), backend.run(time.sleep, 0.5))
+        assert time.monotonic() - started < 0.9
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancellation_kill_the_worker():
+    backend = ProcessToolBackend(1, warm_modules=())
+    try:
+        first_pid = await backend.run(os.getpid)
+        with pytest.raises(asyncio.TimeoutError):
+            await backend.run(time.sleep, 30, timeout=0.2)
+        assert backend.kills == 1
+        second_pid = await backend.run(os.getpid)
+        assert second_pid != first_pid
+
+        job = asyncio.create_task(backend.run(time.sleep, 30))
+        await asyncio.sleep(0.2)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        assert backend.kills == 2
+        assert await backend.run(os.getpid) not in (first_pid, second_pid)
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_cpu_tool_timeout_returns_error(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"")
+    tm = ToolManager(db_path=":memory:", tool_timeouts={"media_describe_video": 0.05})
+
+    def slow_describe(path, sample_frames):
+        time.sleep(0.5)
+        return {"avg_color": [0.0, 0.0, 0.0]}
+
+    monkeypatch.setattr("media_workers.describe_video", slow_describe)
+    result = await tm.media_describe_video(str(video))
+    assert "timed out" in result["error"]
+    await tm.close()
@@ -0,0 +1,267 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import plan_store
+from cappuccino_agent import CappuccinoAgent
+from scheduler import CronSpec, IntervalSpec, JobStore, OnceSpec, Scheduler, parse_schedule
+from tool_manager import ToolManager
+
+
+async def eventually(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+async def settled(plans, plan_id, status="completed"):
+    while (await plans.get_plan(plan_id))["status"] != status:
+        await asyncio.sleep(0.01)
+
+
+def test_schedule_parsing():
+    friday_evening = datetime(2024, 3, 1, 17, 50).timestamp()
+    weekdays = CronSpec("*/15 9-17 * * 1-5")
+    assert weekdays.next_after(friday_evening) == datetime(2024, 3, 4, 9, 0).timestamp()
+    assert weekdays.next_after(datetime(2024, 3, 4, 9, 0).timestamp()) == datetime(2024, 3, 4, 9, 15).timestamp()
+    # Both day fields restricted: either one matches.
+    assert CronSpec("0 0 1 * 7").next_after(friday_evening) == datetime(2024, 3, 3).timestamp()
+    assert CronSpec("@monthly").next_after(friday_evening) == datetime(2024, 4, 1).timestamp()
+    assert CronSpec("0 0 30 2 *").next_after(friday_evening) is None
+
+    assert isinstance(parse_schedule("@daily"), CronSpec)
+    assert parse_schedule("every 10 minutes").seconds == 600
+    assert parse_schedule("weekly").seconds == 604800
+    assert isinstance(parse_schedule("2030-01-01T00:00:00+00:00"), OnceSpec)
+    for bad in ("whenever", "61 * * * *", "*/0 * * * *"):
+        with pytest.raises(ValueError):
+            parse_schedule(bad)
+    assert plan_store.next_run_at("0 9 * * *", friday_evening) == datetime(2024, 3, 2, 9, 0).timestamp()
+
+
+@pytest.mark.asyncio
+async def test_interval_jobs_run_and_record_failures():
+    scheduler = Scheduler()
+    calls = []
+
+    async def tick():
+        calls.append(time.monotonic())
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    await scheduler.add_job("tick", tick, IntervalSpec(0.05), run_immediately=True, jitter=0.01)
+    await scheduler.add_job("broken", broken, "0.05s", run_immediately=True)
+    await scheduler.add_job("later", tick, "daily")
+    scheduler.start()
+    scheduler.start()
+    await eventually(lambda: len(calls) >= 3 and scheduler.get_job("broken").failures >= 2)
+    await scheduler.stop()
+
+    info = {job["name"]: job for job in scheduler.jobs()}
+    assert info["tick"]["runs"] == len(calls)
+    assert info["broken"]["runs"] == 0 and info["broken"]["last_error"] == "RuntimeError: boom"
+    assert info["later"]["runs"] == 0
+    assert info["later"]["next_run_at"] == pytest.approx(time.time() + 86400, abs=5)
+    assert scheduler.jobs()[-1]["name"] == "later"
+
+    assert await scheduler.remove_job("tick")
+    assert scheduler.get_job("tick") is None
+    assert not await scheduler.remove_job("tick")
+
+
+@pytest.mark.asyncio
+async def test_next_run_is_persisted_and_misfires_are_handled(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    calls = []
+
+    async def job():
+        calls.append("run")
+
+    store = JobStore(db_path)
+    first = Scheduler(store)
+    added = await first.add_job("report", job, "every 1 hour")
+    await first.add_job("digest", job, "every 1 hour", misfire="skip")
+    start = time.time()
+    assert added.next_run_at == pytest.approx(start + 3600, abs=5)
+    await store.close()
+
+    # Two hours later the process comes back: the stored run time is long past.
+    store = JobStore(db_path)
+    later = Scheduler(store, clock=lambda: time.time() + 7200)
+    report = await later.add_job("report", job, "every 1 hour")
+    digest = await later.add_job("digest", job, "every 1 hour", misfire="skip")
+    assert report.next_run_at == added.next_run_at
+    later.start()
+    await eventually(lambda: report.misfires == 1 and digest.misfires == 1 and not report.running)
+    await later.stop()
+
+    assert calls == ["run"]
+    assert (report.runs, digest.runs) == (1, 0)
+    # Missed fires are coalesced: the next run is an hour after "now".
+    for job_state in (report, digest):
+        assert job_state.next_run_at == pytest.approx(start + 7200 + 3600, abs=5)
+    assert (await store.load("report"))["runs"] == 1
+    assert (await store.load("digest"))["misfires"] == 1
+
+    # A changed schedule starts afresh instead of reusing the stored time.
+    changed = await later.add_job("report", job, "every 2 hours")
+    assert changed.next_run_at == pytest.approx(start + 7200 + 7200, abs=5)
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_per_job_type():
+    scheduler = Scheduler(concurrency={"io": 2})
+    active = {"io": 0, "slow": 0}
+    peak = {"io": 0, "slow": 0}
+
+    def worker(kind, duration):
+        async def run():
+            active[kind] += 1
+            peak[kind] = max(peak[kind], active[kind])
+            await asyncio.sleep(duration)
+            active[kind] -= 1
+
+        return run
+
+    for i in range(5):
+        await scheduler.add_job(f"io{i}", worker("io", 0.05), "daily", job_type="io", run_immediately=True)
+    # Fires every 20ms but takes 100ms: overlapping fires are dropped.
+    slow = await scheduler.add_job("slow", worker("slow", 0.1), "0.02s", run_immediately=True)
+    scheduler.start()
+    await eventually(lambda: all(scheduler.get_job(f"io{i}").runs == 1 for i in range(5)) and slow.runs >= 2)
+    await scheduler.stop()
+
+    assert peak == {"io": 2, "slow": 1}
+    assert slow.overlaps > 0
+
+
+@pytest.mark.asyncio
+async def test_due_agent_plans_are_executed(tmp_path):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"))
+    now = time.time()
+    recurring, once, failing = await tm.plans.add_plans(
+        [
+            {"title": "recurring", "schedule": "every 1 hour", "next_run_at": now - 7300},
+            {"title": "once", "next_run_at": now - 1},
+            {"title": "failing", "next_run_at": now - 1},
+        ]
+    )
+    ran = []
+
+    async def runner(plan):
+        ran.append(plan["title"])
+        if plan["title"] == "failing":
+            raise RuntimeError("nope")
+
+    scheduler = Scheduler(concurrency={"agent": 1})
+    await plan_store.schedule_due_plans(scheduler, tm.plans, runner, poll_interval=0.05)
+    scheduler.start()
+    await eventually(lambda: len(ran) == 3)
+    await eventually(lambda: scheduler.get_job("agent-plans").runs >= 2)
+    await scheduler.stop()
+
+    assert sorted(ran) == ["failing", "once", "recurring"]
+    plans = {p["plan_id"]: p for p in await tm.plans.list_plans()}
+    assert plans[recurring]["status"] == "pending"
+    assert plans[recurring]["next_run_at"] == pytest.approx(time.time() + 3600, abs=5)
+    assert (plans[once]["status"], plans[once]["next_run_at"]) == ("completed", None)
+    assert plans[failing]["status"] == "failed"
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_runs_scheduled_tasks():
+    prompts = []
+
+    async def llm(prompt):
+        prompts.append(prompt)
+        return f"did {prompt}"
+
+    agent = CappuccinoAgent(llm=llm, llm_cache=False)
+    await agent.tool_manager.agent_update_plan("bot", ["check the news"])
+    await agent.tool_manager.agent_schedule_task("bot", "daily")
+    plan_id = plan_store.agent_plan_id("bot")
+    await agent.tool_manager.plans.update_plan(plan_id, next_run_at=time.time() - 1)
+
+    scheduler = Scheduler()
+    await agent.schedule_plans(scheduler, poll_interval=0.05)
+    scheduler.start()
+    await eventually(lambda: prompts == ["check the news"])
+    await eventually(lambda: scheduler.get_job("agent-plans").runs >= 2)
+    await scheduler.stop()
+
+    plan = await agent.tool_manager.plans.get_plan(plan_id)
+    assert plan["status"] == "pending"
+    assert plan["next_run_at"] == pytest.approx(time.time() + 86400, abs=5)
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_plan_does_not_hold_up_later_plans(tmp_path):
+    tm = ToolManager(db_path=str(tmp_path / "tm.db"))
+    release = asyncio.Event()
+    started = []
+
+    async def runner(plan):
+        started.append(plan["title"])
+        if plan["title"] == "slow":
+            await release.wait()
+
+    scheduler = Scheduler(concurrency={"agent": 2})
+    await tm.plans.create_plan(title="slow", next_run_at=time.time() - 1)
+    await plan_store.schedule_due_plans(scheduler, tm.plans, runner, poll_interval=0.05)
+    scheduler.start()
+    await eventually(lambda: started == ["slow"])
+    fast = await tm.plans.create_plan(title="fast", next_run_at=time.time() - 1)
+    await eventually(lambda: started == ["slow", "fast"], timeout=1.0)
+    await asyncio.wait_for(settled(tm.plans, fast), 3)
+
+    # Both slots taken: the poller claims nothing more.
+    blocked = await tm.plans.create_plan(title="slow", next_run_at=time.time() - 1)
+    await eventually(lambda: started.count("slow") == 2)
+    await tm.plans.create_plan(title="one", next_run_at=time.time() - 1)
+    await asyncio.sleep(0.2)
+    assert started.count("one") == 0
+    assert (await tm.plans.count_by_status())["pending"] == 1
+    release.set()
+    await eventually(lambda: "one" in started)
+    await asyncio.wait_for(settled(tm.plans, blocked), 3)
+    await scheduler.stop()
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_orphaned_running_plan_is_reclaimed_after_restart(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    tm = ToolManager(db_path=db_path)
+    plan_id = await tm.plans.create_plan(title="report", next_run_at=time.time() - 1)
+    # The previous process claimed the plan and stopped before finishing it.
+    assert [p["plan_id"] for p in await tm.plans.claim_due(lease=60)] == [plan_id]
+    await tm.close()
+
+    tm = ToolManager(db_path=db_path)
+    assert await tm.plans.claim_due(lease=60) == []
+    ran = []
+
+    async def runner(plan):
+        ran.append(plan["plan_id"])
+
+    scheduler = Scheduler(clock=lambda: time.time() + 61)
+    await plan_store.schedule_due_plans(scheduler, tm.plans, runner, poll_interval=0.05, lease=60)
+    scheduler.start()
+    await eventually(lambda: ran == [plan_id])
+    await eventually(lambda: scheduler.get_job("agent-plans").runs >= 2)
+    await scheduler.stop()
+    plan = await tm.plans.get_plan(plan_id)
+    assert (plan["status"], plan["lease_until"]) == ("completed", None)
+    await tm.close()
@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tool_manager import ToolManager
+
+
+def _html(urls):
+    links = "".join(f'<a rel="nofollow" class="result__a" href="{u}">{u}</a>' for u in urls)
+    return f"<html><body>{links}</body></html>"
+
+
+async def _start_server(delays, cancelled):
+    async def html(request):
+        await asyncio.sleep(delays["html"])
+        return web.Response(
+            text=_html(["https://a.example/1", "https://b.example/2#frag"]), content_type="text/html"
+        )
+
+    async def api(request):
+        try:
+            await asyncio.sleep(delays["api"])
+        except asyncio.CancelledError:
+            cancelled.append("api")
+            raise
+        q = request.query["q"]
+        return web.json_response(
+            {"items": [{"title": q, "url": "https://b.example/2"}, {"title": q, "link": "https://c.example/3"}]}
+        )
+
+    app = web.Application()
+    app.router.add_get("/html", html)
+    app.router.add_get("/api", api)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _backends(server, local_delay=0.0):
+    async def local(query, max_results):
+        await asyncio.sleep(local_delay)
+        return [{"title": "local", "url": "https://local.example/doc"}]
+
+    return [
+        {"name": "html", "type": "web", "url": str(server.make_url("/html"))},
+        {"name": "api", "type": "api", "url": str(server.make_url("/api")), "results_key": "items"},
+        {"name": "local", "type": "local", "search": local},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_multi_search_merges_and_deduplicates():
+    server = await _start_server({"html": 0.0, "api": 0.05}, [])
+    tm = ToolManager(db_path=":memory:", search_backends=_backends(server, local_delay=0.1))
+    try:
+        result = await tm.info_search_multi("cats", max_results=10, deadline=2)
+    finally:
+        await tm.close()
+        await server.close()
+    urls = [r["url"] for r in result["results"]]
+    assert urls == [
+        "https://a.example/1",
+        "https://b.example/2#frag",
+        "https://c.example/3",
+        "https://local.example/doc",
+    ]
+    assert result["sources"] == {"html": 2, "api": 1, "local": 1}
+
+
+@pytest.mark.asyncio
+async def test_multi_search_returns_at_max_results_and_cancels_stragglers():
+    cancelled = []
+    server = await _start_server({"html": 0.0, "api": 5.0}, cancelled)
+    tm = ToolManager(db_path=":memory:", search_backends=_backends(server))
+    try:
+        start = time.monotonic()
+        result = await tm.info_search_multi("cats", max_results=3, deadline=10)
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0.05)
+    finally:
+        await tm.close()
+        await server.close()
+    assert elapsed < 1
+    assert len(result["results"]) == 3
+    assert result["sources"]["api"] == "cancelled"
+    assert cancelled == ["api"]
+
+
+@pytest.mark.asyncio
+async def test_multi_search_deadline_bounds_slow_backends():
+    server = await _start_server({"html": 5.0, "api": 5.0}, [])
+    tm = ToolManager(db_path=":memory:", search_backends=_backends(server))
+    try:
+        start = time.monotonic()
+        result = await tm.info_search_multi("cats", max_results=10, deadline=0.2)
+        elapsed = time.monotonic() - start
+    finally:
+        await tm.close()
+        await server.close()
+    assert elapsed < 1
+    assert [r["source"] for r in result["results"]] == ["local"]
+    assert result["sources"] == {"local": 1, "html": "cancelled", "api": "cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_multi_search_reports_failing_backend():
+    async def broken(query, max_results):
+        raise RuntimeError("index offline")
+
+    backends = [
+        {"name": "broken", "type": "local", "search": broken},
+        {"name": "ok", "type": "local", "search": lambda q, n: [{"title": q, "url": "https://ok.example"}]},
+    ]
+    tm = ToolManager(db_path=":memory:", search_backends=backends)
+    result = await tm.info_search_multi("q")
+    await tm.close()
+    assert result["results"] == [{"title": "q", "url": "https://ok.example", "source": "ok"}]
+    assert result["sources"]["broken"] == "error: index offline"
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import re
+
+import pytest
+
+from search_parser import ResultLinkParser, parse_results, parse_stream
+from tool_manager import ToolManager
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def _legacy(text):
+    pattern = re.compile(r"<a[^>]+class=['\"]result__a['\"][^>]*href=['\"]([^'\"]+)['\"][^>]*>(.*?)</a>", re.IGNORECASE)
+    return [{"title": re.sub(r"<.*?>", "", title), "url": url} for url, title in pattern.findall(text)]
+
+
+@pytest.mark.parametrize("page", sorted(FIXTURES.glob("ddg_*.html")), ids=lambda p: p.name)
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 4096, 1 << 20])
+def test_chunked_parse_matches_legacy_regex(page, chunk_size):
+    text = page.read_text(encoding="utf-8")
+    parser = ResultLinkParser()
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start : start + chunk_size])
+    assert parser.results == _legacy(text)
+
+
+def test_ignores_other_anchors_and_similar_classes():
+    html = (
+        '<a class="result__url" href="/u">u</a>'
+        '<a class="result__about" href="/x">x</a>'
+        "<a rel='nofollow' class='big result__a' href='/ok'>A <b>b</b></a>"
+    )
+    assert parse_results(html) == [{"title": "A b", "url": "/ok"}]
+
+
+@pytest.mark.asyncio
+async def test_parse_stream_stops_reading_at_max_results():
+    data = (FIXTURES / "ddg_results_large.html").read_bytes()
+    consumed = []
+
+    async def chunks():
+        for start in range(0, len(data), 1024):
+            consumed.append(start)
+            yield data[start : start + 1024]
+
+    results = await parse_stream(chunks(), max_results=5)
+    assert len(results) == 5
+    assert len(consumed) * 1024 < len(data) / 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("http_cache", [False, True])
+async def test_info_search_web_streams_response(monkeypatch, http_cache):
+    data = (FIXTURES / "ddg_results_large.html").read_bytes()
+    consumed = []
+
+    class Content:
+        async def iter_chunked(self, size):
+            for start in range(0, len(data), size):
+                consumed.append(size)
+                yield data[start : start + size]
+
+    class Resp:
+        content = Content()
+        charset = "utf-8"
+        status = 200
+        headers = {}
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+
+    class Session:
+        closed = False
+
+        def get(self, url, params=None, timeout=None, headers=None):
+            return Resp()
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr("aiohttp.ClientSession", lambda: Session())
+    tm = ToolManager(db_path=":memory:", http_cache=http_cache)
+    result = await tm.info_search_web("query", max_results=3)
+    assert [r["url"] for r in result["results"]] == [r["url"] for r in _legacy(data.decode())[:3]]
+    # The page is parsed as it arrives and the rest is never read.
+    assert sum(consumed) < len(data) / 2
+    await tm.close()
@@ -52,6 +52,8 @@ async def test_self_improver_generates_tool(monkeypatch, tmp_path):
     assert hasattr(tm, 'auto_tool')
     out = await getattr(tm, 'auto_tool')(1)
     assert out['result'] == 2
+    await tm.close()
+    await state.close()
 
 
 @pytest.mark.asyncio
@@ -67,4 +69,5 @@ async def test_advance_phase_calls_improver(monkeypatch):
     monkeypatch.setattr(agent.self_improver, 'improve', dummy)
     await agent.advance_phase()
     assert called
+    await agent.close()
 
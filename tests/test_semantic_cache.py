@@ -0,0 +1,143 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from cappuccino_agent import CappuccinoAgent
+from semantic_cache import HashingEmbedder, SemanticCache
+from tool_manager import ToolManager
+
+
+def test_hashing_embedder_is_normalized_and_similarity_tracks_wording():
+    embed = HashingEmbedder(dim=128)
+    a = embed("How do I reverse a list in Python?")
+    b = embed("how do i reverse a python list")
+    c = embed("Weather forecast for Tokyo tomorrow")
+    assert a.shape == (128,)
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert a @ b > a @ c
+
+
+def test_lookup_respects_threshold_prefix_and_persists(tmp_path):
+    path = tmp_path / "semantic.npy"
+    cache = SemanticCache(str(path), threshold=0.7, capacity=4)
+    cache.add("llm:gpt-4o:how do i reverse a list in python?", "How do I reverse a list in Python?")
+    cache.add("llm:gpt-4o:weather in tokyo", "weather in tokyo")
+    cache.add("llm:other:how do i reverse a list in python?", "How do I reverse a list in Python?")
+    assert len(cache) == 3
+
+    key, score = cache.lookup("how do I reverse a list in python", prefix="llm:gpt-4o:")
+    assert key == "llm:gpt-4o:how do i reverse a list in python?"
+    assert score >= 0.7
+    assert cache.lookup("best sushi restaurants", prefix="llm:gpt-4o:") is None
+    cache.flush()
+
+    reopened = SemanticCache(str(path), threshold=0.7)
+    assert len(reopened) == 3
+    key, _ = reopened.lookup("reverse a list in python how do I", prefix="llm:other:")
+    assert key == "llm:other:how do i reverse a list in python?"
+
+
+def test_ivf_scan_finds_same_match_as_flat_scan():
+    cache = SemanticCache(threshold=0.8, ivf_threshold=64, n_lists=8, n_probe=2)
+    for i in range(200):
+        cache.add(f"llm:m:{i}", f"question number {i} about topic {i % 17}")
+    assert cache._centroids is not None
+    key, _ = cache.lookup("question number 123 about topic 4", prefix="llm:m:")
+    assert key == "llm:m:123"
+
+
+@pytest.mark.asyncio
+async def test_agent_serves_paraphrased_prompt_from_semantic_cache():
+    calls = []
+
+    async def llm(prompt):
+        calls.append(prompt)
+        return f"answer {len(calls)}"
+
+    agent = CappuccinoAgent(
+        tool_manager=ToolManager(db_path=":memory:"),
+        llm=llm,
+        semantic_cache=SemanticCache(threshold=0.75),
+    )
+    first = await agent.call_llm("Please explain how Python decorators work")
+    second = await agent.call_llm("please explain how python decorators work!")
+    assert first == second == "answer 1"
+    assert len(calls) == 1
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_index_survives_restart_and_is_never_truncated(tmp_path):
+    path = tmp_path / "semantic.npy"
+
+    async def llm(prompt):
+        return "decorators wrap functions"
+
+    agent = CappuccinoAgent(
+        tool_manager=ToolManager(db_path=":memory:"),
+        llm=llm,
+        semantic_cache=SemanticCache(str(path), threshold=0.75),
+    )
+    await agent.call_llm("Please explain how Python decorators work")
+    await agent.close()
+    reopened = SemanticCache(str(path), threshold=0.75)
+    assert len(reopened) == 1
+
+    # The key list is also written periodically, without an explicit close.
+    cache = SemanticCache(str(path), flush_every=2)
+    cache.add("llm:m:a", "first prompt")
+    cache.add("llm:m:b", "second prompt")
+    assert len(SemanticCache(str(path))) == 3
+
+    # Losing the key list must not wipe the stored vectors.
+    stored = np.load(path).copy()
+    path.with_suffix(".keys.json").unlink()
+    assert len(SemanticCache(str(path))) == 0
+    assert np.array_equal(np.load(path), stored)
+    with pytest.raises(ValueError):
+        SemanticCache(str(path), dim=64)
+
+
+def test_capacity_is_a_hard_limit_with_lru_eviction(tmp_path):
+    path = tmp_path / "semantic.npy"
+    cache = SemanticCache(str(path), threshold=0.7, capacity=2)
+    cache.add("llm:m:python", "How do I reverse a list in Python?")
+    cache.add("llm:m:weather", "weather in tokyo")
+    assert cache.lookup("how do I reverse a list in python", prefix="llm:m:")[0] == "llm:m:python"
+    # Full: the least recently used prompt makes room.
+    cache.add("llm:m:sushi", "best sushi restaurants")
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.lookup("weather in tokyo", prefix="llm:m:") is None
+    # A removed row is reused rather than appended.
+    cache.remove("llm:m:sushi")
+    cache.add("llm:m:ramen", "best ramen restaurants")
+    assert np.load(path, mmap_mode="r").shape[0] == 2
+    cache.close()
+
+    reopened = SemanticCache(str(path), threshold=0.7, capacity=1)
+    assert len(reopened) == 1 and reopened.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_large_index_is_scanned_off_the_event_loop(monkeypatch):
+    cache = SemanticCache(threshold=0.7, offload_rows=2)
+    cache.add("llm:m:python", "How do I reverse a list in Python?")
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def spy(func, *args):
+        threaded.append(func)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", spy)
+    assert (await cache.alookup("reverse a python list", prefix="llm:m:"))[0] == "llm:m:python"
+    assert threaded == []
+    cache.add("llm:m:weather", "weather in tokyo")
+    assert (await cache.alookup("reverse a python list", prefix="llm:m:"))[0] == "llm:m:python"
+    assert len(threaded) == 1
@@ -0,0 +1,89 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import asyncio
+import pytest
+
+from cappuccino_agent import CappuccinoAgent
+from state_manager import StateManager
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_isolated_and_persisted(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    agent = CappuccinoAgent(db_path=db_path)
+    await agent.add_message("user", "hello a", session_id="a")
+    await agent.add_message("user", "hello b", session_id="b")
+    await agent.set_task_plan([{"task": "b"}], session_id="b")
+    await agent.close()
+
+    state = StateManager(db_path)
+    a = await state.load("a")
+    b = await state.load("b")
+    assert a["history"][-1]["content"] == "hello a"
+    assert b["history"][-1]["content"] == "hello b"
+    assert a["task_plan"] == [] and b["task_plan"] == [{"task": "b"}]
+    assert set(await state.list_sessions()) == {"a", "b"}
+
+    await state.save_long_term_plan([{"step": "x"}], session_id="a")
+    assert (await state.load_long_term_plan("b"))["plan"] == []
+    assert (await state.load_long_term_plan("a"))["plan"] == [{"step": "x"}]
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_unrelated_sessions_run_in_parallel():
+    started = 0
+    both_started = asyncio.Event()
+
+    async def slow_llm(prompt):
+        nonlocal started
+        started += 1
+        if started == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        return "ok"
+
+    agent = CappuccinoAgent(llm=slow_llm, tool_manager=ToolManager(db_path=":memory:"))
+    results = await asyncio.gather(
+        agent.run("hi from a", session_id="a"), agent.run("hi from b", session_id="b")
+    )
+    assert results == ["ok", "ok"]
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_evicted_and_reloaded(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    agent = CappuccinoAgent(db_path=db_path, max_sessions=2)
+    for name in ("a", "b", "c"):
+        await agent.add_message("user", f"from {name}", session_id=name)
+    assert "a" not in agent._sessions
+    assert len(agent._sessions) == 2
+
+    await agent.add_message("user", "again", session_id="a")
+    state = await agent.state_manager.load("a")
+    assert [m["content"] for m in state["history"][1:]] == ["from a", "again"]
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_session_with_waiting_callers_is_not_evicted(tmp_path):
+    agent = CappuccinoAgent(db_path=str(tmp_path / "state.db"), max_sessions=1)
+    await agent.add_message("user", "first", session_id="a")
+    session = agent._sessions["a"]
+    async with session.lock:
+        waiter = asyncio.create_task(agent.add_message("user", "queued", session_id="a"))
+        await asyncio.sleep(0)
+    # The lock is free but "a" still has a caller waiting for it.
+    await agent.add_message("user", "hello", session_id="b")
+    assert agent._sessions.get("a") is session
+    await waiter
+    assert [m["content"] for m in session.history[1:]] == ["first", "queued"]
+
+    await agent.add_message("user", "hello", session_id="c")
+    assert "a" not in agent._sessions
+    await agent.close()
@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import time
+
+import pytest
+
+from shell_sessions import ShellLimits, ShellScheduler
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_scheduler_admits_waiters_in_fifo_order():
+    scheduler = ShellScheduler(1)
+    order = []
+
+    async def job(name):
+        await scheduler.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        scheduler.release()
+
+    await scheduler.acquire()
+    tasks = [asyncio.create_task(job(n)) for n in "abc"]
+    await asyncio.sleep(0)
+    assert scheduler.queued == 3
+    tasks[1].cancel()
+    scheduler.release()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert order == ["a", "c"]
+    assert (scheduler.running, scheduler.queued) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_shell_sessions_queue_beyond_concurrency_limit():
+    tm = ToolManager(db_path=":memory:", shell_max_concurrent=2)
+    statuses = [await tm.shell_exec("sleep 0.2", f"s{i}") for i in range(4)]
+    assert [s["status"] for s in statuses] == ["running", "running", "queued", "queued"]
+    assert tm.shell_metrics()["queued"] == 2
+    killed = await tm.shell_kill("s3")
+    assert killed["status"] == "killed"
+    result = await tm.shell_wait("s2")
+    assert result["returncode"] == 0
+    assert result["queue_wait"] >= 0.15
+    metrics = tm.shell_metrics()
+    assert metrics["started"] == 3 and metrics["completed"] == 3
+    assert metrics["running"] == 0 and metrics["queued"] == 0
+    assert metrics["queue_wait_max"] >= 0.15
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_escalates_to_sigkill_on_process_group():
+    tm = ToolManager(db_path=":memory:", shell_kill_grace=0.2)
+    # The shell ignores SIGTERM and its child holds the pipes open.
+    await tm.shell_exec("trap '' TERM; sleep 30 & sleep 30; wait", "stuck", timeout=0.2)
+    start = time.monotonic()
+    result = await tm.shell_wait("stuck")
+    assert time.monotonic() - start < 5
+    assert result["timed_out"] is True
+    assert result["returncode"] == -9
+    assert tm.shell_metrics()["timed_out"] == 1
+
+    await tm.shell_exec("sleep 30 & sleep 30", "polite", timeout=0.1)
+    result = await tm.shell_wait("polite")
+    assert result["timed_out"] is True and result["returncode"] == -15
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_resource_limits_apply_to_sessions():
+    limits = ShellLimits(cpu_seconds=7, address_space=None, open_files=64)
+    tm = ToolManager(db_path=":memory:", shell_limits=limits)
+    await tm.shell_exec("ulimit -n; ulimit -t", "limits")
+    result = await tm.shell_wait("limits")
+    assert result["stdout"].split() == ["64", "7"]
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_spawn_failure_is_reported():
+    tm = ToolManager(db_path=":memory:")
+    result = await tm.shell_exec("true", "bad", working_dir="/nonexistent/dir")
+    assert "error" in result
+    assert tm.shell_metrics()["failed"] == 1
+    await tm.close()
@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from shell_sessions import OutputRing
+from tool_manager import ToolManager
+
+
+def test_output_ring_keeps_newest_bytes():
+    ring = OutputRing(10)
+    ring.append("stdout", b"0123456")
+    ring.append("stderr", b"abcdef")
+    assert (ring.start, ring.end) == (3, 13)
+    assert ring.read(0) == [(3, "stdout", b"3456"), (7, "stderr", b"abcdef")]
+    assert ring.read(9) == [(9, "stderr", b"cdef")]
+    ring.append("stdout", b"x" * 25)
+    assert ring.read(0) == [(28, "stdout", b"x" * 10)]
+
+
+@pytest.mark.asyncio
+async def test_shell_view_returns_output_since_cursor():
+    tm = ToolManager(db_path=":memory:")
+    await tm.shell_exec("echo one; sleep 0.3; echo two >&2", "s")
+    first = {}
+    for _ in range(100):
+        first = await tm.shell_view("s")
+        if first["stdout"]:
+            break
+        await asyncio.sleep(0.02)
+    assert first["status"] == "running"
+    assert first["stdout"] == "one\n"
+    await tm.shell_wait("s")
+    second = await tm.shell_view("s", cursor=first["cursor"])
+    assert {k: second[k] for k in ("status", "stdout", "stderr", "cursor", "dropped", "returncode")} == {
+        "status": "finished",
+        "stdout": "",
+        "stderr": "two\n",
+        "cursor": 8,
+        "dropped": 0,
+        "returncode": 0,
+    }
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_output_is_capped_per_session():
+    tm = ToolManager(db_path=":memory:", shell_output_bytes=1000)
+    await tm.shell_exec("head -c 100000 /dev/zero | tr '\\0' a; echo", "big")
+    result = await tm.shell_wait("big")
+    assert result["stdout"] == "a" * 999 + "\n"
+    assert result["truncated"]
+    view = await tm.shell_view("big")
+    assert view["dropped"] == 100001 - 1000
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_shell_stream_yields_incrementally():
+    tm = ToolManager(db_path=":memory:")
+    await tm.shell_exec("for i in 1 2 3; do echo $i; sleep 0.05; done; exit 3", "loop")
+    items = [item async for item in tm.shell_stream("loop")]
+    assert "".join(i["data"] for i in items if "data" in i) == "1\n2\n3\n"
+    assert len([i for i in items if "data" in i]) == 3
+    assert items[-1] == {"session": "loop", "status": "finished", "returncode": 3, "cursor": 6}
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_shell_stream_keeps_characters_split_across_reads():
+    tm = ToolManager(db_path=":memory:")
+    # "こん" with the first character split between two writes, then a stray lead byte.
+    await tm.shell_exec("printf '\\343\\201'; sleep 0.1; printf '\\223\\343\\202\\223\\n\\343'", "ja")
+    items = [item async for item in tm.shell_stream("ja")]
+    data = [i["data"] for i in items if "data" in i]
+    assert len(data) >= 2
+    assert "".join(data) == "こん\n\ufffd"
+    await tm.close()
+
+
+@pytest.mark.asyncio
+async def test_finished_sessions_are_evicted_by_age():
+    tm = ToolManager(db_path=":memory:", shell_max_age=0.05)
+    await tm.shell_exec("true", "old")
+    await tm.shell_wait("old")
+    await tm.shell_exec("sleep 5", "running")
+    await asyncio.sleep(0.1)
+    assert "error" in await tm.shell_view("old")
+    assert set(tm._shell_sessions) == {"running"}
+    await tm.close()
+    assert tm._shell_sessions == {}
+
+
+def test_shell_stream_websocket():
+    client = TestClient(api.app)
+
+    async def start():
+        await api.agent.tool_manager.shell_exec("echo hi", "ws")
+
+    with client:
+        client.portal.call(start)
+        with client.websocket_connect("/shell/ws/stream") as ws:
+            assert ws.receive_json() == {"session": "ws", "stream": "stdout", "data": "hi\n", "cursor": 3}
+            assert ws.receive_json()["status"] == "finished"
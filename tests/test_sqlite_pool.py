@@ -0,0 +1,54 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import asyncio
+import pytest
+
+from sqlite_pool import open_pool
+from state_manager import StateManager
+from tool_manager import ToolManager
+
+
+@pytest.mark.asyncio
+async def test_managers_share_one_pool(tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    state = StateManager(db_path)
+    tm = ToolManager(db_path=db_path)
+    await state.save([], [{"role": "user", "content": "hi"}], 0)
+    await tm.set_cached_result("k", "v")
+    assert state._pool is tm._pool
+
+    async with state._pool.reader() as conn:
+        async with conn.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+        async with conn.execute("PRAGMA synchronous") as cur:
+            assert (await cur.fetchone())[0] == 1  # NORMAL
+
+    await tm.close()
+    assert not state._pool.closed
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_writer(tmp_path):
+    pool = await open_pool(str(tmp_path / "db.sqlite"))
+    async with pool.writer() as conn:
+        await conn.execute("CREATE TABLE t (v INTEGER)")
+        await conn.execute("INSERT INTO t VALUES (1)")
+        await conn.commit()
+
+    async with pool.writer() as conn:
+        await conn.execute("INSERT INTO t VALUES (2)")
+        # The writer is busy with an open transaction; a reader still sees
+        # the last committed snapshot without blocking.
+        async def read():
+            async with pool.reader() as reader:
+                async with reader.execute("SELECT COUNT(*) FROM t") as cur:
+                    return (await cur.fetchone())[0]
+
+        assert await asyncio.wait_for(read(), timeout=1) == 1
+        await conn.commit()
+    await pool.release()
+    assert pool.closed
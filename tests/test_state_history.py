@@ -0,0 +1,64 @@
+import sys
+import pathlib
+import json
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import aiosqlite
+import pytest
+
+from state_manager import StateManager
+
+
+@pytest.mark.asyncio
+async def test_append_and_paginate_history(tmp_path):
+    state = StateManager(db_path=str(tmp_path / "state.db"))
+    next_seq = await state.append_messages(
+        [{"role": "user", "content": f"m{i}"} for i in range(5)]
+    )
+    assert next_seq == 5
+    await state.append_messages([{"role": "tool", "content": {"ok": True}, "name": "calc"}])
+
+    latest = await state.load_history(limit=2)
+    assert [m["seq"] for m in latest] == [4, 5]
+    assert latest[-1]["content"] == {"ok": True}
+    assert latest[-1]["name"] == "calc"
+
+    older = await state.load_history(limit=10, before_seq=latest[0]["seq"])
+    assert [m["content"] for m in older] == ["m0", "m1", "m2", "m3"]
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_save_only_appends_new_messages(tmp_path):
+    state = StateManager(db_path=str(tmp_path / "state.db"))
+    history = [{"role": "user", "content": "a"}]
+    await state.save([], history, 0)
+    history.append({"role": "assistant", "content": "b"})
+    await state.save([], history, 1)
+    await state.close()
+
+    state = StateManager(db_path=str(tmp_path / "state.db"))
+    data = await state.load()
+    assert data["history"] == history
+    assert data["phase"] == 1
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_history_blob_is_migrated(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    history = [{"role": "user", "content": "old"}, {"role": "assistant", "content": "reply"}]
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.execute("CREATE TABLE agent_state (key TEXT PRIMARY KEY, value TEXT)")
+        await conn.execute(
+            "INSERT INTO agent_state (key, value) VALUES ('history', ?)", (json.dumps(history),)
+        )
+        await conn.commit()
+
+    state = StateManager(db_path=db_path)
+    data = await state.load()
+    assert data["history"] == history
+    rows = await state._fetchall("SELECT COUNT(*) FROM agent_state WHERE key='history'")
+    assert rows[0][0] == 0
+    await state.close()
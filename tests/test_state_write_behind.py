@@ -0,0 +1,123 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import asyncio
+import pytest
+
+from state_manager import StateManager
+
+
+@pytest.mark.asyncio
+async def test_write_behind_coalesces_into_one_flush(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    state = StateManager(db_path, write_behind=True, flush_interval_ms=10_000)
+    for i in range(20):
+        await state.append_messages([{"role": "user", "content": str(i)}])
+        await state.update_step(i)
+    assert state.metrics.flushes == 0
+
+    await state.flush()
+    assert state.metrics.flushes == 1
+    assert state.metrics.last_batch == 40
+    assert (await state.load_plan())["current_step"] == 19
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_on_size_and_close(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    state = StateManager(db_path, write_behind=True, flush_interval_ms=10_000, flush_max_writes=5)
+    for i in range(5):
+        await state.append_messages([{"role": "user", "content": str(i)}])
+    for _ in range(50):
+        if state.metrics.flushes:
+            break
+        await asyncio.sleep(0.01)
+    assert state.metrics.flushes == 1
+
+    await state.save_long_term_plan([{"step": 1}])
+    await state.update_long_term_step(3)
+    await state.close()
+
+    reopened = StateManager(db_path)
+    assert await reopened.load_long_term_plan() == {"plan": [{"step": 1}], "current_step": 3}
+    assert len(await reopened.load_history()) == 5
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_observe_staged_writes(tmp_path):
+    state = StateManager(str(tmp_path / "state.db"), write_behind=True, flush_interval_ms=10_000)
+    await state.save([{"task": "x"}], [{"role": "user", "content": "hi"}], 2)
+    data = await state.load()
+    assert data == {"task_plan": [{"task": "x"}], "history": [{"role": "user", "content": "hi"}], "phase": 2}
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_staged_writes_survive_a_failure_to_open_the_database(tmp_path):
+    state = StateManager(str(tmp_path / "state.db"), write_behind=True, flush_interval_ms=10_000)
+    get_pool = state._get_pool
+
+    async def broken():
+        raise OSError("disk unavailable")
+
+    await state.append_messages([{"role": "user", "content": "keep me"}])
+    state._get_pool = broken
+    with pytest.raises(OSError):
+        await state.flush()
+    state._get_pool = get_pool
+    await state.flush()
+    assert [m["content"] for m in await state.load_history()] == ["keep me"]
+    await state.close()
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_a_running_flush(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    state = StateManager(db_path, write_behind=True, flush_interval_ms=10_000, flush_max_writes=1)
+    write_batch = state._write_batch
+    writing = asyncio.Event()
+
+    async def slow_write(conn, batch):
+        await write_batch(conn, batch)
+        writing.set()
+        await asyncio.sleep(0.1)
+
+    state._write_batch = slow_write
+    await state.append_messages([{"role": "user", "content": "keep me"}])
+    await asyncio.wait_for(writing.wait(), 1)
+    await state.close()
+
+    reopened = StateManager(db_path)
+    assert [m["content"] for m in await reopened.load_history()] == ["keep me"]
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_rolls_back_and_keeps_the_batch(tmp_path):
+    state = StateManager(str(tmp_path / "state.db"), write_behind=True, flush_interval_ms=10_000)
+    write_batch = state._write_batch
+    writing = asyncio.Event()
+
+    async def stalled_write(conn, batch):
+        await write_batch(conn, batch)
+        writing.set()
+        await asyncio.Event().wait()
+
+    await state.append_messages([{"role": "user", "content": "keep me"}])
+    state._write_batch = stalled_write
+    flush = asyncio.create_task(state.flush())
+    await writing.wait()
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    state._write_batch = write_batch
+    pool = await state._get_pool()
+    async with pool.writer() as conn:
+        assert not conn.in_transaction
+    await state.flush()
+    assert [m["content"] for m in await state.load_history()] == ["keep me"]
+    await state.close()
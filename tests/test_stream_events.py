@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import asyncio
+import json
+import pytest
+
+from agents import BaseAgent
+from cappuccino_agent import CappuccinoAgent
+from tool_manager import ToolManager
+
+
+async def _streaming_llm(prompt):
+    for token in ("Hel", "lo", "!"):
+        await asyncio.sleep(0)
+        yield token
+
+
+@pytest.mark.asyncio
+async def test_call_llm_accepts_async_iterator_and_openai_chunks():
+    seen = []
+
+    async def on_token(delta):
+        seen.append(delta)
+
+    assert await BaseAgent(_streaming_llm).call_llm("hi", on_token=on_token) == "Hello!"
+    assert seen == ["Hel", "lo", "!"]
+
+    async def chunked(prompt):
+        async def gen():
+            yield {"choices": [{"delta": {"role": "assistant"}}]}
+            yield {"choices": [{"delta": {"content": "ok"}}]}
+
+        return gen()
+
+    assert await BaseAgent(chunked).call_llm("hi") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_stream_events_yields_structured_events_before_final():
+    agent = CappuccinoAgent(tool_manager=ToolManager(db_path=":memory:"), llm=_streaming_llm)
+    events = [event async for event in agent.stream_events("say hello")]
+    types = [event.type for event in events]
+    assert types == ["plan_created", "step_started", "token", "token", "token", "final"]
+    assert events[0].data == [{"step": 1, "action": "say hello"}]
+    assert events[-1].data == "Hello!"
+    assert json.loads(events[2].to_json()) == {"type": "token", "data": "Hel", "step": 1}
+
+    # A cached answer is still delivered as a final event.
+    cached = [event async for event in agent.stream_events("say hello")]
+    assert [(e.type, e.data) for e in cached] == [("final", "Hello!")]
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_events_reports_tool_calls():
+    tm = ToolManager(db_path=":memory:")
+    agent = CappuccinoAgent(tool_manager=tm)
+
+    async def echo_tool(**kwargs):
+        return "pong"
+
+    tm.get_tool_by_name = lambda name: echo_tool if name == "ping" else None
+    events = [event async for event in agent.stream_events("ping")]
+    assert [e.type for e in events] == [
+        "plan_created",
+        "step_started",
+        "tool_call",
+        "tool_result",
+        "final",
+    ]
+    assert events[3].data == {"name": "ping", "output": "pong"}
+    await agent.close()
@@ -40,3 +40,4 @@ async def test_generate_tool_from_failure(monkeypatch):
     async with conn.execute("SELECT code FROM tools WHERE name=?", ('auto_tool',)) as cur:
         row = await cur.fetchone()
     assert row is not None
+    await tm.close()
@@ -15,8 +15,7 @@ from tool_manager import ToolManager
 async def tm(tmp_path):
     manager = ToolManager(db_path=os.path.join(tmp_path, "db.sqlite"))
     yield manager
-    if manager.db_connection:
-        await manager.db_connection.close()
+    await manager.close()
 
 
 @pytest.mark.asyncio
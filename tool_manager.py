@@ -7,9 +7,12 @@ import json
 import logging
 import re
 import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
 from functools import wraps
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Type, Union
 
 import aiohttp
 import aiosqlite
@@ -17,11 +20,80 @@ import importlib
 import importlib.util
 import openai
 import subprocess
-
-from knowledge_graph import KnowledgeGraph
+from yarl import URL
+
+import file_ops
+import graph_store
+import media_workers
+import plan_store
+from http_cache import CachedResponse, HTTPCache
+from knowledge_graph import BaseKnowledgeGraph, Change, KnowledgeGraph, Predicates
+from memory_cache import CacheStats, MemoryCache
+from process_backend import ProcessToolBackend
+from search_parser import parse_results, parse_stream
+from shell_sessions import ShellLimits, ShellScheduler, ShellSession
+from sqlite_pool import SQLitePool, open_pool
 
 LOGGER = logging.getLogger(__name__)
 
+# CPU-bound tools and their default time limits in seconds. These run in the
+# process backend when ``process_workers`` is set, otherwise in a thread.
+CPU_TOOL_TIMEOUTS: Dict[str, float] = {
+    "media_analyze_image": 120.0,
+    "media_recognize_speech": 300.0,
+    "media_analyze_video": 60.0,
+    "media_describe_video": 120.0,
+}
+
+# Total request time limits for the HTTP-backed tools, in seconds.
+HTTP_TOOL_TIMEOUTS: Dict[str, float] = {
+    "info_search_web": 15.0,
+    "info_search_api": 15.0,
+    "info_search_image": 10.0,
+    "info_search_multi": 5.0,
+}
+
+DUCKDUCKGO_URL = "https://duckduckgo.com/html/"
+
+# Backends queried by ``info_search_multi`` unless configured otherwise. Each
+# entry has a ``type``: ``"web"`` scrapes a DuckDuckGo-style HTML page
+# (optional ``url``), ``"api"`` calls a JSON endpoint (``url``, optional
+# ``params``, ``query_param`` and ``results_key``) and ``"local"`` calls
+# ``search(query, max_results)``, which may be a coroutine function.
+DEFAULT_SEARCH_BACKENDS: List[Dict[str, Any]] = [{"name": "duckduckgo", "type": "web"}]
+
+
+def _result_key(url: Any) -> Optional[str]:
+    """Normalise a result URL for de-duplication."""
+    if not url:
+        return None
+    try:
+        target = URL(str(url)).with_fragment(None)
+    except (TypeError, ValueError):
+        return str(url)
+    text = str(target)
+    return text[:-1] if text.endswith("/") and target.path != "/" else text
+
+
+def _extract_results(payload: Any, results_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Normalise a backend payload into ``[{"title", "url"}, ...]``."""
+    if isinstance(payload, dict):
+        if results_key is not None:
+            payload = payload.get(results_key, [])
+        else:
+            payload = next(
+                (payload[key] for key in ("results", "items", "data") if isinstance(payload.get(key), list)),
+                [],
+            )
+    results: List[Dict[str, Any]] = []
+    for item in payload or []:
+        if not isinstance(item, dict):
+            continue
+        url = item.get("url") or item.get("link") or item.get("href")
+        if url:
+            results.append({"title": item.get("title") or item.get("name") or "", "url": url})
+    return results
+
 
 def _import_optional(name: str):
     if name in sys.modules:
@@ -49,20 +121,80 @@ class ToolManager:
     services.
     """
 
-    def __init__(self, db_path: str = ":memory:", root_dir: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        root_dir: Optional[str] = None,
+        *,
+        cache_ttl: Optional[float] = None,
+        cache_memory_bytes: int = 8 * 1024 * 1024,
+        cache_max_rows: Optional[int] = 10_000,
+        cache_max_bytes: Optional[int] = 64 * 1024 * 1024,
+        cache_sweep_interval: float = 60.0,
+        process_workers: int = 0,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        http_limit: int = 100,
+        http_limit_per_host: int = 8,
+        http_cache: bool = False,
+        http_cache_max_rows: Optional[int] = 2_000,
+        search_backends: Optional[List[Dict[str, Any]]] = None,
+        file_read_limit: int = 4 * 1024 * 1024,
+        shell_output_bytes: int = 1024 * 1024,
+        shell_max_age: float = 600.0,
+        shell_max_concurrent: int = 4,
+        shell_timeout: Optional[float] = 600.0,
+        shell_kill_grace: float = 5.0,
+        shell_limits: Optional[ShellLimits] = None,
+        graph_memory_edges: int = 50_000,
+        graph_class: Type[BaseKnowledgeGraph] = KnowledgeGraph,
+    ) -> None:
         self.db_path = db_path
         self.root_dir = Path(root_dir).expanduser().resolve() if root_dir else None
         self.db_connection: Optional[aiosqlite.Connection] = None
-        self._shell_processes: Dict[str, asyncio.subprocess.Process] = {}
-        self._shell_tasks: Dict[str, asyncio.Task[tuple[bytes, bytes]]] = {}
-        self._shell_results: Dict[str, Dict[str, Any]] = {}
-        self._graph: Optional[KnowledgeGraph] = None
+        self._pool: Optional[SQLitePool] = None
+        self._pool_lock = asyncio.Lock()
+        self.cache_ttl = cache_ttl
+        self.cache_max_rows = cache_max_rows
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_sweep_interval = cache_sweep_interval
+        self.cache_stats = CacheStats()
+        self._memory_cache = MemoryCache(cache_memory_bytes, stats=self.cache_stats)
+        # Hit counts are accumulated in memory and written by the sweeper so
+        # that reads never take the writer connection.
+        self._cache_hit_deltas: Counter[str] = Counter()
+        self._cache_sweeper: Optional[asyncio.Task] = None
+        self.tool_timeouts = {**CPU_TOOL_TIMEOUTS, **HTTP_TOOL_TIMEOUTS, **(tool_timeouts or {})}
+        self._process_backend = ProcessToolBackend(process_workers) if process_workers > 0 else None
+        self.http_limit = http_limit
+        self.http_limit_per_host = http_limit_per_host
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.http_cache_max_rows = http_cache_max_rows
+        self.http_cache = HTTPCache(self._ensure_pool, self.http_session) if http_cache else None
+        self.search_backends = list(search_backends or DEFAULT_SEARCH_BACKENDS)
+        self.file_read_limit = file_read_limit
+        self.shell_output_bytes = shell_output_bytes
+        self.shell_max_age = shell_max_age
+        self._shell_sessions: Dict[str, ShellSession] = {}
+        self._shell_scheduler = ShellScheduler(
+            shell_max_concurrent,
+            limits=shell_limits,
+            timeout=shell_timeout,
+            kill_grace=shell_kill_grace,
+        )
+        self._graph: Optional[BaseKnowledgeGraph] = None
+        self._graph_sql: Optional[graph_store.SQLGraph] = None
+        self.graph_memory_edges = graph_memory_edges
+        self.graph_class = graph_class
+        self.plans = plan_store.PlanStore(self._ensure_pool)
         self.tools = {
             "respond_to_user": self.respond_to_user,
             "generate_image": self.generate_image,
             "simple_math": self.simple_math,
             "get_current_time": self.get_current_time,
             "file_read": self.file_read,
+            "file_tail": self.file_tail,
+            "file_search": self.file_search,
             "file_append_text": self.file_append_text,
             "file_replace_text": self.file_replace_text,
             "shell_exec": self.shell_exec,
@@ -78,88 +210,122 @@ class ToolManager:
             "info_search_web": self.info_search_web,
             "info_search_api": self.info_search_api,
             "info_search_image": self.info_search_image,
+            "info_search_multi": self.info_search_multi,
             "slide_initialize": self.slide_initialize,
             "slide_present": self.slide_present,
         }
 
     async def __aenter__(self) -> "ToolManager":
         await self._ensure_db()
+        await self.http_session()
         return self
 
     async def __aexit__(self, exc_type, exc, tb) -> None:  # type: ignore[override]
         await self.close()
 
     async def close(self) -> None:
-        if self.db_connection is not None:
-            await self.db_connection.close()
-            self.db_connection = None
+        if self._cache_sweeper is not None:
+            self._cache_sweeper.cancel()
+            try:
+                await self._cache_sweeper
+            except asyncio.CancelledError:
+                pass
+            self._cache_sweeper = None
+        if self._process_backend is not None:
+            await self._process_backend.close()
+        sessions, self._shell_sessions = list(self._shell_sessions.values()), {}
+        await asyncio.gather(*(session.close() for session in sessions))
+        if self.http_cache is not None:
+            await self.http_cache.close()
+        await self._close_http_session()
+        if self._pool is not None:
+            await self._pool.release()
+            self._pool = None
+        self.db_connection = None
         self._graph = None
+        self._graph_sql = None
+
+    async def _ensure_pool(self) -> SQLitePool:
+        if self._pool is not None:
+            return self._pool
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = await open_pool(self.db_path)
+                async with pool.writer() as conn:
+                    await self._create_schema(conn)
+                self._pool = pool
+                self.db_connection = pool.writer_connection
+        return self._pool
 
     async def _ensure_db(self) -> aiosqlite.Connection:
-        if self.db_connection is None:
-            self.db_connection = await aiosqlite.connect(self.db_path)
-            await self.db_connection.execute("PRAGMA journal_mode=WAL")
-            await self.db_connection.execute(
-                """
-                CREATE TABLE IF NOT EXISTS cache (
-                    cache_key TEXT PRIMARY KEY,
-                    cache_value TEXT
-                )
-                """
-            )
-            await self.db_connection.execute(
-                """
-                CREATE TABLE IF NOT EXISTS agent_tasks (
-                    agent_id TEXT PRIMARY KEY,
-                    plan TEXT,
-                    phase INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'pending',
-                    schedule TEXT
-                )
-                """
+        """Return the shared writer connection, creating the schema on first use."""
+        pool = await self._ensure_pool()
+        return pool.writer_connection
+
+    async def _create_schema(self, conn: aiosqlite.Connection) -> None:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                cache_key TEXT PRIMARY KEY,
+                cache_value TEXT,
+                created_at REAL,
+                expires_at REAL,
+                hits INTEGER DEFAULT 0,
+                size INTEGER DEFAULT 0
             )
-            await self.db_connection.execute(
-                """
-                CREATE TABLE IF NOT EXISTS knowledge_graph (
-                    id INTEGER PRIMARY KEY,
-                    data TEXT
-                )
-                """
+            """
+        )
+        async with conn.execute("PRAGMA table_info(cache)") as cursor:
+            cache_columns = {row[1] for row in await cursor.fetchall()}
+        if "size" not in cache_columns:
+            # Upgrade caches created before TTL and size accounting existed.
+            await conn.execute("ALTER TABLE cache ADD COLUMN created_at REAL")
+            await conn.execute("ALTER TABLE cache ADD COLUMN expires_at REAL")
+            await conn.execute("ALTER TABLE cache ADD COLUMN hits INTEGER DEFAULT 0")
+            await conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER DEFAULT 0")
+            await conn.execute(
+                "UPDATE cache SET created_at=?, size=length(cache_key) + length(cache_value)",
+                (time.time(),),
             )
-            await self.db_connection.execute(
-                """
-                CREATE TABLE IF NOT EXISTS tools (
-                    name TEXT PRIMARY KEY,
-                    code TEXT
-                )
-                """
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at)"
+        )
+        await conn.execute(HTTPCache.create_schema_sql())
+        await plan_store.create_schema(conn)
+        await graph_store.create_schema(conn)
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tools (
+                name TEXT PRIMARY KEY,
+                code TEXT
             )
-            await self.db_connection.commit()
-        return self.db_connection
+            """
+        )
+        await conn.commit()
 
     async def _get_db_connection(self) -> aiosqlite.Connection:
         return await self._ensure_db()
 
-    async def _load_graph(self) -> KnowledgeGraph:
+    async def _load_graph(self) -> BaseKnowledgeGraph:
+        """Return the in-memory graph, rebuilding it from the tables on first use."""
         if self._graph is not None:
             return self._graph
-        conn = await self._ensure_db()
-        async with conn.execute("SELECT data FROM knowledge_graph WHERE id=1") as cursor:
-            row = await cursor.fetchone()
-        if row and row[0]:
-            self._graph = KnowledgeGraph.from_json(row[0])
-        else:
-            self._graph = KnowledgeGraph()
+        pool = await self._ensure_pool()
+        # Load under the writer lock so no mutation lands between the read
+        # and installing the graph that later mutations are mirrored into.
+        async with pool.writer() as conn:
+            if self._graph is None:
+                self._graph = await graph_store.load(conn, self.graph_class)
         return self._graph
 
-    async def _save_graph(self, graph: KnowledgeGraph) -> None:
-        conn = await self._ensure_db()
-        await conn.execute(
-            "INSERT INTO knowledge_graph(id, data) VALUES(1, ?) ON CONFLICT(id) DO UPDATE SET data=excluded.data",
-            (graph.to_json(),),
-        )
-        await conn.commit()
-        self._graph = graph
+    async def _write_graph_changes(self, changes: List[Change]) -> None:
+        """Persist ``changes`` row by row and mirror them in the loaded graph."""
+        pool = await self._ensure_pool()
+        async with pool.writer() as conn:
+            await graph_store.apply_changes(conn, changes)
+            await conn.commit()
+        if self._graph is not None:
+            self._graph.apply_changes(changes)
 
     # ------------------------------------------------------------------
     # Utility helpers
@@ -180,6 +346,97 @@ class ToolManager:
                 return None
         return resolved
 
+    async def http_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, opening it on first use.
+
+        One keep-alive connector serves every search tool (and any caller that
+        borrows the session), so repeated requests to a host reuse DNS
+        results and TLS connections instead of paying for them per call.
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is not None and not getattr(self._http, "closed", False):
+            if self._http_loop is loop:
+                return self._http
+            # Sessions are bound to the loop that created them.
+            await self._close_http_session()
+        connector = aiohttp.TCPConnector(
+            limit=self.http_limit,
+            limit_per_host=self.http_limit_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+        )
+        try:
+            session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=60)
+            )
+        except TypeError:
+            # Simplified session factories (as used in tests) take no options.
+            await connector.close()
+            session = aiohttp.ClientSession()
+        self._http, self._http_loop = session, loop
+        return session
+
+    async def _close_http_session(self) -> None:
+        session, self._http, self._http_loop = self._http, None, None
+        close = getattr(session, "close", None)
+        if close is not None:
+            try:
+                await close()
+            except RuntimeError:  # pragma: no cover - owning loop already closed
+                pass
+
+    def _http_timeout(self, tool: str) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=self.tool_timeouts.get(tool))
+
+    async def http_get(
+        self, url: str, *, tool: Optional[str] = None, **kwargs: Any
+    ) -> CachedResponse:
+        """GET ``url`` through the HTTP cache when enabled and return the full response.
+
+        ``tool`` selects the timeout from ``tool_timeouts``. Keyword arguments
+        such as ``params``, ``headers``, ``ssl`` and ``stale_while_revalidate``
+        are passed on to :meth:`HTTPCache.get`.
+        """
+        if tool is not None:
+            kwargs.setdefault("timeout", self._http_timeout(tool))
+        if self.http_cache is not None:
+            return await self.http_cache.get(url, **kwargs)
+        kwargs.pop("stale_while_revalidate", None)
+        session = await self.http_session()
+        async with session.get(url, **kwargs) as resp:
+            return CachedResponse(str(resp.url), resp.status, dict(resp.headers), await resp.read())
+
+    @asynccontextmanager
+    async def _http_request(
+        self,
+        tool: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        stream: bool = False,
+    ) -> AsyncIterator[Any]:
+        """Yield a response for a search tool, cached when the HTTP cache is on.
+
+        ``stream=True`` yields a response whose ``content.iter_chunked`` the
+        caller can consume incrementally; with the cache on, the streamed body
+        is still stored (see :meth:`HTTPCache.stream`).
+        """
+        if self.http_cache is not None:
+            if stream:
+                async with self.http_cache.stream(
+                    url, params=params, timeout=self._http_timeout(tool)
+                ) as resp:
+                    yield resp
+            else:
+                yield await self.http_get(url, tool=tool, params=params)
+            return
+        session = await self.http_session()
+        request = self._session_get(
+            session, url, params=params, timeout=self._http_timeout(tool)
+        )
+        async with request as resp:
+            yield resp
+
     @staticmethod
     def _session_get(session: Any, url: str, **kwargs: Any):
         try:
@@ -190,119 +447,274 @@ class ToolManager:
     # ------------------------------------------------------------------
     # Cache management
     # ------------------------------------------------------------------
-    async def set_cached_result(self, key: str, value: Any) -> None:
-        conn = await self._ensure_db()
+    async def set_cached_result(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value`` in both cache tiers, expiring after ``ttl`` seconds.
+
+        ``ttl`` defaults to the manager's ``cache_ttl``; ``None`` never expires.
+        """
+        pool = await self._ensure_pool()
         payload = json.dumps(value)
-        await conn.execute(
-            """
-            INSERT INTO cache(cache_key, cache_value)
-            VALUES(?, ?)
-            ON CONFLICT(cache_key) DO UPDATE SET cache_value=excluded.cache_value
-            """,
-            (key, payload),
-        )
-        await conn.commit()
+        ttl = self.cache_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._memory_cache.set(key, payload, expires_at)
+        async with pool.writer() as conn:
+            await conn.execute(
+                """
+                INSERT INTO cache(cache_key, cache_value, created_at, expires_at, hits, size)
+                VALUES(?, ?, ?, ?, 0, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    cache_value=excluded.cache_value,
+                    created_at=excluded.created_at,
+                    expires_at=excluded.expires_at,
+                    size=excluded.size
+                """,
+                (key, payload, now, expires_at, len(key) + len(payload)),
+            )
+            await conn.commit()
+        self._ensure_cache_sweeper()
 
     async def get_cached_result(self, key: str) -> Any:
-        conn = await self._ensure_db()
-        async with conn.execute("SELECT cache_value FROM cache WHERE cache_key = ?", (key,)) as cursor:
-            row = await cursor.fetchone()
-        if row is None:
+        payload = self._memory_cache.get(key)
+        if payload is not None:
+            self.cache_stats.hits += 1
+            self.cache_stats.memory_hits += 1
+            self._cache_hit_deltas[key] += 1
+            return self._decode_cached(payload)
+
+        pool = await self._ensure_pool()
+        async with pool.reader() as conn:
+            async with conn.execute(
+                "SELECT cache_value, expires_at FROM cache WHERE cache_key = ?", (key,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            # Expired rows are removed by the sweeper.
+            self.cache_stats.misses += 1
             return None
+        self.cache_stats.hits += 1
+        self.cache_stats.disk_hits += 1
+        self._cache_hit_deltas[key] += 1
+        self._memory_cache.set(key, row[0], row[1])
+        return self._decode_cached(row[0])
+
+    @staticmethod
+    def _decode_cached(payload: str) -> Any:
         try:
-            return json.loads(row[0])
+            return json.loads(payload)
         except json.JSONDecodeError:
-            return row[0]
+            return payload
+
+    def _ensure_cache_sweeper(self) -> None:
+        if self._cache_sweeper is None or self._cache_sweeper.done():
+            self._cache_sweeper = asyncio.create_task(self._cache_sweep_loop())
+
+    async def _cache_sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.cache_sweep_interval)
+            try:
+                await self.sweep_cache()
+            except Exception as exc:  # pragma: no cover - logged and retried
+                LOGGER.warning("Cache sweep failed: %s", exc)
+
+    async def sweep_cache(self) -> Dict[str, int]:
+        """Persist hit counts, drop expired rows and enforce the size limits.
+
+        Rows are evicted least-hit first, then oldest first.
+        """
+        pool = await self._ensure_pool()
+        hit_deltas, self._cache_hit_deltas = self._cache_hit_deltas, Counter()
+        evicted: List[str] = []
+        async with pool.writer() as conn:
+            if hit_deltas:
+                await conn.executemany(
+                    "UPDATE cache SET hits = hits + ? WHERE cache_key = ?",
+                    [(count, key) for key, count in hit_deltas.items()],
+                )
+            cursor = await conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+            expired = max(cursor.rowcount, 0)
+            await cursor.close()
+
+            async with conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache") as cursor:
+                rows, total_bytes = await cursor.fetchone()
+            over_rows = rows - self.cache_max_rows if self.cache_max_rows is not None else 0
+            over_bytes = total_bytes - self.cache_max_bytes if self.cache_max_bytes is not None else 0
+            if over_rows > 0 or over_bytes > 0:
+                async with conn.execute(
+                    "SELECT cache_key, size FROM cache ORDER BY hits ASC, created_at ASC"
+                ) as cursor:
+                    async for key, size in cursor:
+                        if over_rows <= 0 and over_bytes <= 0:
+                            break
+                        evicted.append(key)
+                        over_rows -= 1
+                        over_bytes -= size or 0
+                await conn.executemany(
+                    "DELETE FROM cache WHERE cache_key = ?", [(key,) for key in evicted]
+                )
+            await conn.commit()
+        for key in evicted:
+            self._memory_cache.delete(key)
+        self.cache_stats.expirations += expired
+        self.cache_stats.disk_evictions += len(evicted)
+        result = {"expired": expired, "evicted": len(evicted)}
+        if self.http_cache is not None and self.http_cache_max_rows is not None:
+            result["http_evicted"] = await self.http_cache.prune(self.http_cache_max_rows)
+        return result
 
     # ------------------------------------------------------------------
     # Agent task management helpers
     # ------------------------------------------------------------------
-    async def agent_update_plan(self, agent_id: str, plan: str) -> Dict[str, Any]:
-        conn = await self._ensure_db()
-        await conn.execute(
-            """
-            INSERT INTO agent_tasks(agent_id, plan, phase, status)
-            VALUES(?, ?, 0, 'pending')
-            ON CONFLICT(agent_id) DO UPDATE SET plan=excluded.plan
-            """,
-            (agent_id, plan),
-        )
-        await conn.commit()
+    async def agent_update_plan(
+        self, agent_id: str, plan: Union[str, List[Union[str, Dict[str, Any]]]]
+    ) -> Dict[str, Any]:
+        """Set the agent's plan: free text, or a list of steps stored as rows."""
+        plan_id = plan_store.agent_plan_id(agent_id)
+        if isinstance(plan, str):
+            await self.plans.upsert_plan(plan_id, agent_id=agent_id, description=plan)
+        else:
+            await self.plans.upsert_plan(plan_id, agent_id=agent_id)
+            await self.plans.replace_steps(plan_id, plan)
         return {"agent_id": agent_id, "plan": plan}
 
-    async def _ensure_agent_task_row(
-        self, conn: aiosqlite.Connection, agent_id: str
-    ) -> None:
-        await conn.execute(
-            """
-            INSERT INTO agent_tasks(agent_id, plan, phase, status, schedule)
-            VALUES(?, '', 0, 'pending', NULL)
-            ON CONFLICT(agent_id) DO NOTHING
-            """,
-            (agent_id,),
-        )
-
     async def agent_advance_phase(self, agent_id: str) -> Dict[str, Any]:
-        conn = await self._ensure_db()
-        await self._ensure_agent_task_row(conn, agent_id)
-        await conn.execute(
-            "UPDATE agent_tasks SET phase = phase + 1 WHERE agent_id = ?",
-            (agent_id,),
-        )
-        async with conn.execute(
-            "SELECT phase FROM agent_tasks WHERE agent_id = ?", (agent_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-        await conn.commit()
-        phase = row[0] if row else 0
-        return {"agent_id": agent_id, "phase": phase}
+        plan_id = plan_store.agent_plan_id(agent_id)
+        await self.plans.upsert_plan(plan_id, agent_id=agent_id)
+        phase = await self.plans.advance_plan(plan_id)
+        return {"agent_id": agent_id, "phase": phase or 0}
 
     async def agent_end_task(self, agent_id: str) -> Dict[str, Any]:
-        conn = await self._ensure_db()
-        await self._ensure_agent_task_row(conn, agent_id)
-        await conn.execute(
-            "UPDATE agent_tasks SET status = 'completed' WHERE agent_id = ?",
-            (agent_id,),
+        await self.plans.upsert_plan(
+            plan_store.agent_plan_id(agent_id), agent_id=agent_id, status=plan_store.COMPLETED
         )
-        await conn.commit()
-        return {"agent_id": agent_id, "status": "completed"}
+        return {"agent_id": agent_id, "status": plan_store.COMPLETED}
 
     async def agent_schedule_task(self, agent_id: str, schedule: str) -> Dict[str, Any]:
-        conn = await self._ensure_db()
-        await self._ensure_agent_task_row(conn, agent_id)
-        await conn.execute(
-            "UPDATE agent_tasks SET schedule = ? WHERE agent_id = ?",
-            (schedule, agent_id),
+        """Schedule the agent's plan; ``next_run_at`` is computed from ``schedule``.
+
+        Due plans are returned by ``self.plans.due_plans()``; schedules that
+        cannot be parsed are stored with no next run.
+        """
+        next_run = plan_store.next_run_at(schedule)
+        await self.plans.upsert_plan(
+            plan_store.agent_plan_id(agent_id),
+            agent_id=agent_id,
+            schedule=schedule,
+            next_run_at=next_run,
         )
-        await conn.commit()
-        return {"agent_id": agent_id, "schedule": schedule}
+        return {"agent_id": agent_id, "schedule": schedule, "next_run_at": next_run}
+
+    async def agent_due_tasks(self, limit: int = 100) -> Dict[str, Any]:
+        """Pending plans whose next run time has passed."""
+        return {"tasks": await self.plans.due_plans(limit=limit)}
 
     # ------------------------------------------------------------------
     # Knowledge graph helpers
     # ------------------------------------------------------------------
     async def graph_add_entity(self, name: str, **attrs: Any) -> Dict[str, Any]:
-        graph = await self._load_graph()
-        graph.add_entity(name, **attrs)
-        await self._save_graph(graph)
+        await self._write_graph_changes([("node", name, attrs)])
         return {"entity": name}
 
     async def graph_add_relation(self, source: str, target: str, relation: str, **attrs: Any) -> Dict[str, Any]:
-        graph = await self._load_graph()
-        graph.add_relation(source, target, relation, **attrs)
-        await self._save_graph(graph)
+        await self._write_graph_changes([("edge", source, target, relation, attrs)])
         return {"relation": relation, "source": source, "target": target}
 
+    async def graph_add_relations(self, relations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add many relations in one transaction.
+
+        Each item has ``source``, ``target`` and ``relation`` keys; any other
+        keys become edge attributes.
+        """
+        changes: List[Change] = []
+        for item in relations:
+            attrs = dict(item)
+            source, target, relation = attrs.pop("source"), attrs.pop("target"), attrs.pop("relation")
+            changes.append(("edge", source, target, relation, attrs))
+        await self._write_graph_changes(changes)
+        return {"added": len(changes)}
+
     async def graph_remove_relation(self, source: str, target: str, relation: str) -> Dict[str, Any]:
-        graph = await self._load_graph()
-        graph.remove_relation(source, target, relation)
-        await self._save_graph(graph)
+        await self._write_graph_changes([("remove_edge", source, target, relation)])
         return {"removed": (source, target, relation)}
 
-    async def graph_query(self, entity: str) -> Dict[str, Any]:
-        graph = await self._load_graph()
-        relations = graph.query(entity)
+    async def _graph_engine(self) -> Any:
+        """Pick the query backend: the in-memory graph or :class:`SQLGraph`.
+
+        Graphs up to ``graph_memory_edges`` edges are loaded and queried in
+        memory; larger ones are queried through the indexed tables.
+        """
+        if self._graph is not None:
+            return self._graph
+        if self._graph_sql is None:
+            pool = await self._ensure_pool()
+            sql = graph_store.SQLGraph(pool.reader)
+            if await sql.edge_count() <= self.graph_memory_edges:
+                return await self._load_graph()
+            self._graph_sql = sql
+        return self._graph_sql
+
+    async def _graph_call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        result = getattr(await self._graph_engine(), method)(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    async def graph_query(
+        self, entity: str, relation: Optional[str] = None, direction: str = "out"
+    ) -> Dict[str, Any]:
+        """Relations of ``entity`` as ``(relation, other entity)`` pairs."""
+        try:
+            edges = await self._graph_call("relations", entity, relation, direction)
+        except ValueError as exc:
+            return {"error": str(exc)}
+        relations = [(rel, target if source == entity else source) for source, rel, target in edges]
         return {"entity": entity, "relations": relations}
 
+    async def graph_neighbourhood(
+        self,
+        entity: str,
+        hops: int = 1,
+        relation: Optional[str] = None,
+        direction: str = "out",
+    ) -> Dict[str, Any]:
+        """Entities within ``hops`` steps of ``entity`` and their distance."""
+        try:
+            found = await self._graph_call("neighbourhood", entity, hops, relation, direction)
+        except ValueError as exc:
+            return {"error": str(exc)}
+        return {"entity": entity, "neighbours": found}
+
+    async def graph_shortest_path(
+        self,
+        source: str,
+        target: str,
+        relation: Optional[str] = None,
+        direction: str = "out",
+        max_hops: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        try:
+            path = await self._graph_call(
+                "shortest_path", source, target, relation, direction, max_hops
+            )
+        except ValueError as exc:
+            return {"error": str(exc)}
+        return {"source": source, "target": target, "path": path}
+
+    async def graph_find_entities(self, where: Optional[Predicates] = None) -> Dict[str, Any]:
+        """Entities whose attributes match ``where``.
+
+        ``where`` is ``{"key": value}`` for equality or a list of
+        ``(key, op, value)`` with ``op`` one of ``= != < <= > >=``.
+        """
+        try:
+            entities = await self._graph_call("find_entities", where)
+        except ValueError as exc:
+            return {"error": str(exc)}
+        return {"entities": entities}
+
     # ------------------------------------------------------------------
     # Tool generation helpers
     # ------------------------------------------------------------------
@@ -331,12 +743,13 @@ class ToolManager:
         setattr(self, func.__name__, func)
         self.tools[func.__name__] = func
 
-        conn = await self._ensure_db()
-        await conn.execute(
-            "INSERT INTO tools(name, code) VALUES(?, ?) ON CONFLICT(name) DO UPDATE SET code=excluded.code",
-            (func.__name__, code),
-        )
-        await conn.commit()
+        pool = await self._ensure_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "INSERT INTO tools(name, code) VALUES(?, ?) ON CONFLICT(name) DO UPDATE SET code=excluded.code",
+                (func.__name__, code),
+            )
+            await conn.commit()
         try:
             subprocess.run(["python", "-m", "compileall", "-"], input=code.encode(), check=False)
         except Exception:  # pragma: no cover - optional best effort
@@ -355,71 +768,159 @@ class ToolManager:
     # ------------------------------------------------------------------
     # Shell helpers
     # ------------------------------------------------------------------
-    async def shell_exec(self, command: str, session_id: str, working_dir: Optional[str] = None) -> Dict[str, Any]:
-        process = await asyncio.create_subprocess_shell(
+    async def shell_exec(
+        self,
+        command: str,
+        session_id: str,
+        working_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Start ``command`` or queue it until a shell slot is free.
+
+        ``timeout`` overrides the manager's ``shell_timeout`` for this
+        session. The result's ``status`` is ``"running"`` or ``"queued"``.
+        """
+        self._prune_shell_sessions()
+        session = ShellSession(
             command,
+            self._shell_scheduler,
+            self.shell_output_bytes,
             cwd=working_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+            timeout=timeout,
         )
-        self._shell_processes[session_id] = process
-        self._shell_tasks[session_id] = asyncio.create_task(process.communicate())
-        self._shell_results.pop(session_id, None)
-        return {"session": session_id, "status": "running"}
+        self._shell_sessions[session_id] = session
+        if session.admitted:
+            await session.started.wait()
+            if session.error is not None:
+                return {"session": session_id, "error": session.error}
+        return {"session": session_id, "status": session.status()}
 
     async def shell_wait(self, session_id: str) -> Dict[str, Any]:
-        if session_id in self._shell_results:
-            return self._shell_results[session_id]
-
-        process = self._shell_processes.get(session_id)
-        task = self._shell_tasks.get(session_id)
-        if not process or not task:
+        session = self._shell_sessions.get(session_id)
+        if session is None:
             LOGGER.error("shell_wait: session '%s' not found", session_id)
             return {"error": "session not found"}
-
-        stdout, stderr = await task
-        returncode = process.returncode
-        if returncode is None:
-            returncode = await process.wait()
-        result = {
-            "stdout": stdout.decode(errors="ignore"),
-            "stderr": stderr.decode(errors="ignore"),
-            "returncode": returncode,
+        await session.wait()
+        output = session.view()
+        return {
+            "stdout": output["stdout"],
+            "stderr": output["stderr"],
+            "truncated": output["dropped"] > 0,
+            **session.info(),
         }
-        self._shell_results[session_id] = result
-        return result
 
     async def shell_kill(self, session_id: str) -> Dict[str, Any]:
-        process = self._shell_processes.get(session_id)
-        if not process:
+        session = self._shell_sessions.get(session_id)
+        if session is None:
             return {"error": "session not found"}
-        if process.returncode is None:
-            process.kill()
-            await process.wait()
-            return {"session": session_id, "status": "killed"}
-        return {"session": session_id, "status": "finished"}
-
-    async def shell_view(self, session_id: str) -> Dict[str, Any]:
-        if session_id in self._shell_results:
-            result = self._shell_results[session_id]
-            return {"status": "finished", **result}
-        process = self._shell_processes.get(session_id)
-        if not process:
+        if session.finished:
+            return {"session": session_id, "status": "finished"}
+        session.kill()
+        await session.wait()
+        return {"session": session_id, "status": "killed"}
+
+    async def shell_view(self, session_id: str, cursor: int = 0) -> Dict[str, Any]:
+        """Return output of ``session_id`` produced since byte ``cursor``.
+
+        Pass the returned ``cursor`` back to receive only newer output.
+        ``dropped`` counts bytes that fell out of the output buffer before
+        they could be viewed.
+        """
+        self._prune_shell_sessions()
+        session = self._shell_sessions.get(session_id)
+        if session is None:
             return {"error": "session not found"}
-        status = "running" if process.returncode is None else "finished"
-        return {"session": session_id, "status": status}
+        return {
+            "session": session_id,
+            "status": session.status(),
+            **session.view(cursor),
+            **session.info(),
+        }
+
+    def shell_metrics(self) -> Dict[str, Any]:
+        """Queue-wait and run-time statistics of the shell scheduler."""
+        return self._shell_scheduler.metrics()
+
+    async def shell_stream(self, session_id: str, cursor: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``{"stream", "data", "cursor"}`` items as the command writes
+        output, then a final ``{"status": "finished", "returncode"}`` item."""
+        session = self._shell_sessions.get(session_id)
+        if session is None:
+            yield {"error": "session not found"}
+            return
+        async for item in session.stream(cursor):
+            yield {"session": session_id, **item}
+
+    def _prune_shell_sessions(self) -> None:
+        """Forget sessions that finished more than ``shell_max_age`` seconds ago."""
+        cutoff = time.monotonic() - self.shell_max_age
+        expired = [
+            session_id
+            for session_id, session in self._shell_sessions.items()
+            if session.finished_at is not None and session.finished_at < cutoff
+        ]
+        for session_id in expired:
+            del self._shell_sessions[session_id]
 
     # ------------------------------------------------------------------
     # File helpers
     # ------------------------------------------------------------------
-    async def file_read(self, path: str) -> Dict[str, Any]:
+    def _resolve_file(self, path: str) -> tuple[Optional[Path], Optional[Dict[str, Any]]]:
         resolved = self._resolve_path(path)
         if resolved is None:
-            return {"error": "access denied"}
-        if not resolved.exists():
-            return {"error": "file not found"}
-        content = await asyncio.to_thread(resolved.read_text)
-        return {"path": str(resolved), "content": content}
+            return None, {"error": "access denied"}
+        if not resolved.is_file():
+            return None, {"error": "file not found"}
+        return resolved, None
+
+    async def file_read(
+        self, path: str, offset: int = 0, length: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Read ``length`` bytes of ``path`` starting at byte ``offset``.
+
+        ``length`` defaults to ``file_read_limit``. Pass ``next_offset`` from
+        the result back as ``offset`` to continue until ``eof`` is true.
+        """
+        resolved, error = self._resolve_file(path)
+        if error:
+            return error
+        if length is None:
+            length = self.file_read_limit
+        result = await asyncio.to_thread(file_ops.read_range, resolved, offset, length)
+        return {"path": str(resolved), **result}
+
+    async def file_tail(self, path: str, lines: int = 20) -> Dict[str, Any]:
+        """Return the last ``lines`` lines of ``path`` without reading the rest."""
+        resolved, error = self._resolve_file(path)
+        if error:
+            return error
+        result = await asyncio.to_thread(file_ops.tail, resolved, lines)
+        return {"path": str(resolved), **result}
+
+    async def file_search(
+        self,
+        path: str,
+        pattern: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        max_matches: int = 100,
+    ) -> Dict[str, Any]:
+        """Return the numbered lines of ``path`` that contain ``pattern``."""
+        resolved, error = self._resolve_file(path)
+        if error:
+            return error
+        try:
+            result = await asyncio.to_thread(
+                file_ops.search,
+                resolved,
+                pattern,
+                regex=regex,
+                ignore_case=ignore_case,
+                max_matches=max_matches,
+            )
+        except re.error as exc:
+            return {"error": f"invalid pattern: {exc}"}
+        return {"path": str(resolved), **result}
 
     async def file_append_text(self, path: str, text: str) -> Dict[str, Any]:
         resolved = self._resolve_path(path)
@@ -435,15 +936,13 @@ class ToolManager:
             handle.write(text)
 
     async def file_replace_text(self, path: str, target: str, replacement: str) -> Dict[str, Any]:
-        resolved = self._resolve_path(path)
-        if resolved is None:
-            return {"error": "access denied"}
-        if not resolved.exists():
-            return {"error": "file not found"}
-        content = await asyncio.to_thread(resolved.read_text)
-        new_content = content.replace(target, replacement)
-        await asyncio.to_thread(resolved.write_text, new_content)
-        return {"path": str(resolved), "status": "replaced"}
+        resolved, error = self._resolve_file(path)
+        if error:
+            return error
+        if not target:
+            return {"error": "target must not be empty"}
+        count = await asyncio.to_thread(file_ops.replace, resolved, target, replacement)
+        return {"path": str(resolved), "status": "replaced", "count": count}
 
     # ------------------------------------------------------------------
     # Media helpers
@@ -473,6 +972,21 @@ class ToolManager:
 
         return {"path": str(resolved), "prompt": prompt}
 
+    async def _run_cpu_bound(self, tool: str, func: Any, *args: Any) -> Any:
+        """Run a CPU-heavy job under the tool's timeout.
+
+        Jobs go to the process backend when one is configured so they can use
+        several cores; otherwise they fall back to a thread.
+        """
+        timeout = self.tool_timeouts.get(tool)
+        if self._process_backend is not None:
+            return await self._process_backend.run(func, *args, timeout=timeout)
+        return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+
+    def _timeout_message(self, tool: str) -> str:
+        LOGGER.error("%s timed out", tool)
+        return f"{tool} timed out after {self.tool_timeouts.get(tool)}s"
+
     async def media_generate_speech(self, text: str, output_path: str) -> Dict[str, Any]:
         return {"error": "text-to-speech is not available in this environment", "path": output_path}
 
@@ -486,17 +1000,10 @@ class ToolManager:
         if pytesseract_module is None or image_module is None:
             return {"error": "OCR dependencies not available"}
 
-        def _ocr() -> str:
-            image = image_module.open(resolved)
-            try:
-                return pytesseract_module.image_to_string(image)
-            finally:
-                close = getattr(image, "close", None)
-                if close:
-                    close()
-
         try:
-            text = await asyncio.to_thread(_ocr)
+            text = await self._run_cpu_bound("media_analyze_image", media_workers.ocr_image, str(resolved))
+        except asyncio.TimeoutError:
+            return {"error": self._timeout_message("media_analyze_image")}
         except Exception as exc:  # pragma: no cover - defensive
             LOGGER.error("media_analyze_image failed: %s", exc)
             return {"error": str(exc)}
@@ -511,15 +1018,12 @@ class ToolManager:
         if sr_module is None:
             return {"error": "speech recognition library not available"}
 
-        recognizer = sr_module.Recognizer()
-
-        def _recognise() -> str:
-            with sr_module.AudioFile(str(resolved)) as source:
-                audio = recognizer.record(source)
-            return recognizer.recognize_sphinx(audio)
-
         try:
-            text = await asyncio.to_thread(_recognise)
+            text = await self._run_cpu_bound(
+                "media_recognize_speech", media_workers.recognize_speech, str(resolved)
+            )
+        except asyncio.TimeoutError:
+            return {"error": self._timeout_message("media_recognize_speech")}
         except Exception as exc:  # pragma: no cover - defensive
             LOGGER.error("media_recognize_speech failed: %s", exc)
             return {"error": str(exc)}
@@ -534,31 +1038,12 @@ class ToolManager:
         if cv2_module is None:
             return {"error": "video analysis dependencies not available"}
 
-        def _analyse() -> Optional[Dict[str, Any]]:
-            capture = cv2_module.VideoCapture(str(resolved))
-            try:
-                if not capture.isOpened():
-                    return None
-                frame_prop = getattr(cv2_module, "CAP_PROP_FRAME_COUNT", 7)
-                fps_prop = getattr(cv2_module, "CAP_PROP_FPS", 5)
-                width_prop = getattr(cv2_module, "CAP_PROP_FRAME_WIDTH", 3)
-                height_prop = getattr(cv2_module, "CAP_PROP_FRAME_HEIGHT", 4)
-                frames = int(capture.get(frame_prop) or 0)
-                fps = float(capture.get(fps_prop) or 0.0)
-                width = int(capture.get(width_prop) or 0)
-                height = int(capture.get(height_prop) or 0)
-            finally:
-                capture.release()
-            duration = frames / fps if fps else 0.0
-            return {
-                "frames": frames,
-                "fps": fps,
-                "duration": duration,
-                "width": width,
-                "height": height,
-            }
-
-        details = await asyncio.to_thread(_analyse)
+        try:
+            details = await self._run_cpu_bound(
+                "media_analyze_video", media_workers.analyze_video, str(resolved)
+            )
+        except asyncio.TimeoutError:
+            return {"error": self._timeout_message("media_analyze_video")}
         if details is None:
             return {"error": "unable to open video"}
         return details
@@ -572,28 +1057,12 @@ class ToolManager:
         if cv2_module is None:
             return {"error": "video analysis dependencies not available"}
 
-        def _describe() -> Optional[Dict[str, Any]]:
-            capture = cv2_module.VideoCapture(str(resolved))
-            try:
-                if not capture.isOpened():
-                    return None
-                collected: List[List[float]] = []
-                count = 0
-                while count < sample_frames:
-                    ret, frame = capture.read()
-                    if not ret:
-                        break
-                    mean = frame.mean(axis=(0, 1)) if hasattr(frame, "mean") else [0.0, 0.0, 0.0]
-                    collected.append([float(x) for x in mean])
-                    count += 1
-            finally:
-                capture.release()
-            if not collected:
-                return {"avg_color": [0.0, 0.0, 0.0]}
-            avg = [sum(channel) / len(collected) for channel in zip(*collected)]
-            return {"avg_color": [float(x) for x in avg]}
-
-        description = await asyncio.to_thread(_describe)
+        try:
+            description = await self._run_cpu_bound(
+                "media_describe_video", media_workers.describe_video, str(resolved), sample_frames
+            )
+        except asyncio.TimeoutError:
+            return {"error": self._timeout_message("media_describe_video")}
         if description is None:
             return {"error": "unable to open video"}
         return description
@@ -601,34 +1070,38 @@ class ToolManager:
     # ------------------------------------------------------------------
     # Information search helpers
     # ------------------------------------------------------------------
-    async def info_search_web(self, query: str) -> Dict[str, Any]:
-        params = {"q": query}
+    async def info_search_web(self, query: str, max_results: int = 10) -> Dict[str, Any]:
+        """Search DuckDuckGo and return up to ``max_results`` result links.
+
+        The page is parsed while it streams in and reading stops as soon as
+        enough results have been seen.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                request = self._session_get(session, "https://duckduckgo.com/html/", params=params)
-                async with request as resp:
-                    text = await resp.text()
+            results = await self._search_html(DUCKDUCKGO_URL, query, max_results)
         except Exception as exc:
             LOGGER.warning("info_search_web failed: %s", exc)
             return {"results": [], "error": str(exc)}
-
-        pattern = re.compile(r"<a[^>]+class=['\"]result__a['\"][^>]*href=['\"]([^'\"]+)['\"][^>]*>(.*?)</a>", re.IGNORECASE)
-        results = []
-        for url, title in pattern.findall(text):
-            clean_title = re.sub(r"<.*?>", "", title)
-            results.append({"title": clean_title, "url": url})
         return {"results": results}
 
+    async def _search_html(self, url: str, query: str, max_results: int) -> List[Dict[str, str]]:
+        async with self._http_request("info_search_web", url, {"q": query}, stream=True) as resp:
+            content = getattr(resp, "content", None)
+            if hasattr(content, "iter_chunked"):
+                return await parse_stream(
+                    content.iter_chunked(16 * 1024),
+                    max_results,
+                    getattr(resp, "charset", None) or "utf-8",
+                )
+            return parse_results(await resp.text(), max_results)
+
     async def info_search_api(self, url: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         response_payload: Optional[Any] = None
         try:
-            async with aiohttp.ClientSession() as session:
-                request = self._session_get(session, url, params=params)
-                async with request as resp:
-                    try:
-                        response_payload = await resp.json(content_type=None)
-                    except TypeError:
-                        response_payload = await resp.json()
+            async with self._http_request("info_search_api", url, params) as resp:
+                try:
+                    response_payload = await resp.json(content_type=None)
+                except TypeError:
+                    response_payload = await resp.json()
         except Exception as exc:
             LOGGER.warning("info_search_api failed: %s", exc)
             return {"response": response_payload, "error": str(exc)}
@@ -637,13 +1110,13 @@ class ToolManager:
     async def info_search_image(self, query: str) -> Dict[str, Any]:
         params = {"query": query, "per_page": 5}
         try:
-            async with aiohttp.ClientSession() as session:
-                request = self._session_get(session, "https://api.unsplash.com/search/photos", params=params)
-                async with request as resp:
-                    try:
-                        data = await resp.json(content_type=None)
-                    except TypeError:
-                        data = await resp.json()
+            async with self._http_request(
+                "info_search_image", "https://api.unsplash.com/search/photos", params
+            ) as resp:
+                try:
+                    data = await resp.json(content_type=None)
+                except TypeError:
+                    data = await resp.json()
         except Exception as exc:
             LOGGER.warning("info_search_image failed: %s", exc)
             return {"results": [], "error": str(exc)}
@@ -662,6 +1135,92 @@ class ToolManager:
             return {"results": [], "error": "no results"}
         return {"results": formatted}
 
+    async def info_search_multi(
+        self,
+        query: str,
+        max_results: int = 10,
+        deadline: Optional[float] = None,
+        backends: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Query several search backends at once and merge their results.
+
+        Results are de-duplicated by URL in arrival order. The call returns as
+        soon as ``max_results`` results are in or ``deadline`` seconds have
+        passed, whichever comes first; backends still running are cancelled.
+        ``sources`` reports, per backend, the number of results it delivered
+        or why it delivered none (``"error: ..."``, ``"cancelled"``).
+        """
+        backends = backends if backends is not None else self.search_backends
+        if deadline is None:
+            deadline = self.tool_timeouts.get("info_search_multi")
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + deadline if deadline is not None else None
+
+        pending: Dict[asyncio.Task, str] = {}
+        for index, backend in enumerate(backends):
+            name = backend.get("name") or f"{backend.get('type')}-{index}"
+            task = asyncio.create_task(self._search_backend(backend, query, max_results))
+            pending[task] = name
+
+        results: List[Dict[str, Any]] = []
+        seen: set[str] = set()
+        sources: Dict[str, Any] = {}
+        try:
+            while pending and len(results) < max_results:
+                timeout = None if stop_at is None else stop_at - loop.time()
+                if timeout is not None and timeout <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        found = task.result()
+                    except Exception as exc:
+                        LOGGER.warning("info_search_multi backend %s failed: %s", name, exc)
+                        sources[name] = f"error: {exc}"
+                        continue
+                    added = 0
+                    for item in found:
+                        key = _result_key(item.get("url"))
+                        if key is None or key in seen:
+                            continue
+                        seen.add(key)
+                        results.append({**item, "source": name})
+                        added += 1
+                    sources[name] = added
+        finally:
+            for task, name in pending.items():
+                task.cancel()
+                sources[name] = "cancelled"
+            await asyncio.gather(*pending, return_exceptions=True)
+        return {"results": results[:max_results], "sources": sources}
+
+    async def _search_backend(
+        self, backend: Dict[str, Any], query: str, max_results: int
+    ) -> List[Dict[str, Any]]:
+        """Run one ``search_backends`` entry and return its results."""
+        kind = backend.get("type")
+        if kind == "web":
+            return await self._search_html(
+                backend.get("url", DUCKDUCKGO_URL), query, max_results
+            )
+        if kind == "api":
+            params = {**backend.get("params", {}), backend.get("query_param", "q"): query}
+            response = await self.info_search_api(backend["url"], params)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return _extract_results(response["response"], backend.get("results_key"))
+        if kind == "local":
+            found = backend["search"](query, max_results)
+            if asyncio.iscoroutine(found):
+                found = await found
+            return _extract_results(found, backend.get("results_key"))
+        raise ValueError(f"unknown search backend type: {kind!r}")
+
     # ------------------------------------------------------------------
     # Browser/service placeholders
     # ------------------------------------------------------------------